@@ -6,6 +6,8 @@ from typing import List
 from app.core.database import get_db
 from app.models.api_key import APIKey, KeyStatus
 from app.schemas.api_key import APIKeyCreate, APIKeyUpdate, APIKeyResponse
+from app.services.routing_cache import routing_cache
+from app.services.quota import quota_ledger
 
 router = APIRouter()
 
@@ -42,6 +44,7 @@ async def create_api_key(
     db.add(db_key)
     await db.commit()
     await db.refresh(db_key)
+    await routing_cache.invalidate(db)
     return db_key
 
 
@@ -78,6 +81,9 @@ async def update_api_key(
     
     await db.commit()
     await db.refresh(api_key)
+    if "quota_used" in update_data:
+        quota_ledger.reset({key_id: api_key.quota_used})
+    await routing_cache.invalidate(db)
     return api_key
 
 
@@ -95,6 +101,7 @@ async def delete_api_key(
     
     await db.delete(api_key)
     await db.commit()
+    await routing_cache.invalidate(db)
     return {"message": "API key deleted successfully"}
 
 
@@ -115,6 +122,7 @@ async def enable_api_key(
     
     await db.commit()
     await db.refresh(api_key)
+    await routing_cache.invalidate(db)
     return api_key
 
 
@@ -134,4 +142,5 @@ async def disable_api_key(
     
     await db.commit()
     await db.refresh(api_key)
+    await routing_cache.invalidate(db)
     return api_key
@@ -11,6 +11,7 @@ from app.core.database import get_db
 from app.models.api_key import APIKey
 from app.models.upstream import Upstream
 from app.schemas.api_key import APIKeyCreate
+from app.services.routing_cache import routing_cache
 
 router = APIRouter()
 
@@ -87,6 +88,7 @@ async def import_keys_csv(
                 failed_count += 1
         
         await db.commit()
+        await routing_cache.invalidate(db)
         
         return {
             "success_count": success_count,
@@ -135,6 +137,7 @@ async def import_keys_json(
             failed_count += 1
     
     await db.commit()
+    await routing_cache.invalidate(db)
     
     return {
         "success_count": success_count,
@@ -211,6 +214,7 @@ async def batch_update_key_status(
         key.status = status
     
     await db.commit()
+    await routing_cache.invalidate(db)
     
     return {
         "updated_count": len(keys),
@@ -233,6 +237,7 @@ async def batch_delete_keys(
         await db.delete(key)
     
     await db.commit()
+    await routing_cache.invalidate(db)
     
     return {
         "deleted_count": len(keys)
@@ -314,6 +319,7 @@ async def import_keys_txt(
                 failed_count += 1
         
         await db.commit()
+        await routing_cache.invalidate(db)
         
         return {
             "success_count": success_count,
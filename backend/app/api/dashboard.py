@@ -7,6 +7,21 @@ from app.core.database import get_db
 from app.models.upstream import Upstream
 from app.models.api_key import APIKey, KeyStatus
 from app.models.request_log import RequestLog
+from app.services.post_response import post_response_pipeline
+from app.services.logger import request_log_writer
+from app.services.key_pool import key_pools
+from app.services.quota import quota_ledger
+from app.services.key_pacing import key_pacer
+from app.services.rate_limiter import rate_limiter
+from app.services.counter_backend import counter_backend
+from app.services.retry_budget import retry_budget
+from app.services.hedging import hedge_tracker
+from app.services.circuit_breaker import circuit_breakers
+from app.services.bulkhead import bulkheads
+from app.services.response_cache import response_cache
+from app.services.coalescer import request_coalescer
+from app.services.endpoint_selector import endpoint_selector
+from app.services.fallback import fallback_router
 
 router = APIRouter()
 
@@ -83,3 +98,25 @@ async def get_realtime_data(
             for log in recent_logs
         ]
     }
+
+
+@router.get("/runtime")
+async def get_runtime_metrics():
+    """网关进程内运行指标"""
+    return {
+        "post_response": post_response_pipeline.stats(),
+        "request_log": request_log_writer.stats(),
+        "key_pools": key_pools.stats(),
+        "quota": quota_ledger.stats(),
+        "pacing": key_pacer.stats(),
+        "rate_limits": rate_limiter.stats(),
+        "counters": counter_backend.stats(),
+        "retry_budget": retry_budget.stats(),
+        "hedging": hedge_tracker.stats(),
+        "circuit_breakers": circuit_breakers.stats(),
+        "bulkheads": bulkheads.stats(),
+        "response_cache": response_cache.stats(),
+        "coalescing": request_coalescer.stats(),
+        "endpoints": endpoint_selector.stats(),
+        "fallbacks": fallback_router.stats(),
+    }
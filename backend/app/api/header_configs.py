@@ -6,6 +6,7 @@ from typing import List
 from app.core.database import get_db
 from app.models.header_config import HeaderConfig
 from app.schemas.header_config import HeaderConfigCreate, HeaderConfigUpdate, HeaderConfigResponse
+from app.services.routing_cache import routing_cache
 
 router = APIRouter()
 
@@ -38,6 +39,7 @@ async def create_header_config(
     db.add(db_header)
     await db.commit()
     await db.refresh(db_header)
+    await routing_cache.invalidate(db)
     return db_header
 
 
@@ -74,6 +76,7 @@ async def update_header_config(
     
     await db.commit()
     await db.refresh(header)
+    await routing_cache.invalidate(db)
     return header
 
 
@@ -91,4 +94,5 @@ async def delete_header_config(
     
     await db.delete(header)
     await db.commit()
+    await routing_cache.invalidate(db)
     return {"message": "Header config deleted successfully"}
@@ -1,11 +1,16 @@
 from fastapi import APIRouter, Depends, Request, HTTPException
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
+from app.core.config import settings
 from app.core.database import get_db
-from app.models.upstream import Upstream
+from app.core.exceptions import ProxyError
 from app.services.proxy import ProxyService
+from app.services.rule_engine import ProxyResponse
+from app.services.request_body import StreamedRequestBody
+from app.services.routing_cache import routing_cache
+from app.services.rate_limiter import check_request_rate_limit, client_identity, WINDOW_LABELS
 
 router = APIRouter()
 
@@ -26,13 +31,7 @@ async def proxy_request(
     路由格式: /proxy/{upstream_name}/{path}
     例如: /proxy/openai/v1/chat/completions
     """
-    result = await db.execute(
-        select(Upstream).where(
-            Upstream.name == upstream_name,
-            Upstream.is_enabled == True
-        )
-    )
-    upstream = result.scalar_one_or_none()
+    upstream = routing_cache.snapshot.get_upstream(upstream_name)
     
     if not upstream:
         raise HTTPException(
@@ -40,10 +39,33 @@ async def proxy_request(
             detail=f"上游API '{upstream_name}' 不存在或已禁用"
         )
     
-    headers = dict(request.headers)
-    body = await request.body()
     client_ip = request.client.host if request.client else "unknown"
     
+    # 频率限制在选择密钥之前检查，被拒绝的请求不读取请求体、不访问数据库
+    rate_limit = check_request_rate_limit(upstream, client_identity(upstream, request.headers, client_ip))
+    if rate_limit is not None and not rate_limit.allowed:
+        window = rate_limit.key.rsplit(":", 1)[-1]
+        scope = "客户端" if ":client:" in rate_limit.key else "上游"
+        raise HTTPException(
+            status_code=429,
+            detail=f"超过{scope}每{WINDOW_LABELS[window]}请求限制（{rate_limit.limit}次）",
+            headers=rate_limit.headers()
+        )
+    
+    headers = dict(request.headers)
+    
+    has_body = "content-length" in request.headers or "transfer-encoding" in request.headers
+    
+    if upstream.stream_request_body and has_body:
+        body = StreamedRequestBody(
+            request.stream(),
+            capture_limit=settings.REQUEST_BODY_LOG_MAX_BYTES if upstream.log_request_body else 0,
+            replayable=(upstream.retry_count or 0) > 0 or bool(upstream.enable_failover),
+            spool_max_memory=settings.REQUEST_BODY_SPOOL_MAX_MEMORY
+        )
+    else:
+        body = await request.body() or None
+    
     proxy_service = ProxyService(db)
     
     try:
@@ -52,19 +74,40 @@ async def proxy_request(
             method=request.method,
             path=path,
             headers=headers,
-            body=body if body else None,
+            body=body,
             client_ip=client_ip
         )
         
-        return Response(
-            content=proxy_response.body,
+        response_headers = dict(proxy_response.headers)
+        if rate_limit is not None:
+            response_headers.update(rate_limit.headers())
+        
+        if isinstance(proxy_response, ProxyResponse):
+            return Response(
+                content=proxy_response.content,
+                status_code=proxy_response.status_code,
+                headers=response_headers
+            )
+        
+        # 流式响应（含合并请求的分发流）
+        return StreamingResponse(
+            content=proxy_response.iter_bytes(),
             status_code=proxy_response.status_code,
-            headers=dict(proxy_response.headers),
-            media_type="application/json"
+            headers=response_headers,
+            background=BackgroundTask(proxy_response.finalize)
         )
         
+    except ProxyError as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers=e.headers
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"代理请求失败: {str(e)}"
         )
+    finally:
+        if isinstance(body, StreamedRequestBody):
+            body.close()
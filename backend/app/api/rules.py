@@ -6,6 +6,7 @@ from typing import List
 from app.core.database import get_db
 from app.models.rule import Rule
 from app.schemas.rule import RuleCreate, RuleUpdate, RuleResponse
+from app.services.routing_cache import routing_cache
 
 router = APIRouter()
 
@@ -38,6 +39,7 @@ async def create_rule(
     db.add(db_rule)
     await db.commit()
     await db.refresh(db_rule)
+    await routing_cache.invalidate(db)
     return db_rule
 
 
@@ -74,6 +76,7 @@ async def update_rule(
     
     await db.commit()
     await db.refresh(rule)
+    await routing_cache.invalidate(db)
     return rule
 
 
@@ -91,4 +94,5 @@ async def delete_rule(
     
     await db.delete(rule)
     await db.commit()
+    await routing_cache.invalidate(db)
     return {"message": "Rule deleted successfully"}
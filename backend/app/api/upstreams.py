@@ -6,6 +6,12 @@ from typing import List
 from app.core.database import get_db
 from app.models.upstream import Upstream
 from app.schemas.upstream import UpstreamCreate, UpstreamUpdate, UpstreamResponse
+from app.services.routing_cache import routing_cache
+from app.services.http_client import client_registry
+from app.services.circuit_breaker import circuit_breakers, BreakerState
+from app.services.bulkhead import bulkheads
+from app.services.response_cache import response_cache
+from app.services.endpoint_selector import endpoint_selector
 
 router = APIRouter()
 
@@ -32,6 +38,7 @@ async def create_upstream(
     db.add(db_upstream)
     await db.commit()
     await db.refresh(db_upstream)
+    await routing_cache.invalidate(db)
     return db_upstream
 
 
@@ -68,6 +75,8 @@ async def update_upstream(
     
     await db.commit()
     await db.refresh(upstream)
+    await routing_cache.invalidate(db)
+    await response_cache.invalidate(upstream_id)
     return upstream
 
 
@@ -85,4 +94,94 @@ async def delete_upstream(
     
     await db.delete(upstream)
     await db.commit()
+    await routing_cache.invalidate(db)
+    client_registry.discard(upstream_id)
+    circuit_breakers.discard(upstream_id)
+    bulkheads.discard(upstream_id)
+    endpoint_selector.discard(upstream_id)
+    await response_cache.invalidate(upstream_id)
     return {"message": "Upstream deleted successfully"}
+
+
+@router.get("/{upstream_id}/breaker")
+async def get_upstream_breaker(
+    upstream_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """上游熔断器状态、窗口计数和最近的状态变更"""
+    result = await db.execute(
+        select(Upstream).where(Upstream.id == upstream_id)
+    )
+    upstream = result.scalar_one_or_none()
+    if not upstream:
+        raise HTTPException(status_code=404, detail="Upstream not found")
+    
+    breaker = circuit_breakers.for_upstream(upstream)
+    if breaker is None:
+        return {"enabled": False}
+    return {"enabled": True, **breaker.snapshot()}
+
+
+@router.post("/{upstream_id}/breaker/{action}")
+async def set_upstream_breaker(
+    upstream_id: int,
+    action: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """手动操作熔断器：reset 关闭，open 打开"""
+    states = {"reset": BreakerState.CLOSED, "open": BreakerState.OPEN}
+    if action not in states:
+        raise HTTPException(status_code=400, detail="Unsupported breaker action")
+    
+    result = await db.execute(
+        select(Upstream).where(Upstream.id == upstream_id)
+    )
+    upstream = result.scalar_one_or_none()
+    if not upstream:
+        raise HTTPException(status_code=404, detail="Upstream not found")
+    
+    breaker = circuit_breakers.for_upstream(upstream)
+    if breaker is None:
+        raise HTTPException(status_code=400, detail="Circuit breaker is disabled for this upstream")
+    
+    breaker.force(states[action])
+    return {"enabled": True, **breaker.snapshot()}
+
+
+@router.get("/{upstream_id}/concurrency")
+async def get_upstream_concurrency(
+    upstream_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """上游隔离舱状态，启用自适应并发时包含上限变更记录"""
+    result = await db.execute(
+        select(Upstream).where(Upstream.id == upstream_id)
+    )
+    upstream = result.scalar_one_or_none()
+    if not upstream:
+        raise HTTPException(status_code=404, detail="Upstream not found")
+    
+    bulkhead = bulkheads.for_upstream(upstream)
+    if bulkhead is None:
+        return {"enabled": False}
+    
+    stats = bulkhead.stats()
+    if bulkhead.limiter is not None:
+        stats["adaptive"] = bulkhead.limiter.snapshot(with_history=True)
+    return {"enabled": True, **stats}
+
+
+@router.delete("/{upstream_id}/cache")
+async def clear_upstream_cache(
+    upstream_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """清除上游的响应缓存"""
+    result = await db.execute(
+        select(Upstream).where(Upstream.id == upstream_id)
+    )
+    if not result.scalar_one_or_none():
+        raise HTTPException(status_code=404, detail="Upstream not found")
+    
+    await response_cache.invalidate(upstream_id)
+    return {"message": "Upstream cache cleared"}
@@ -24,6 +24,83 @@ class Settings(BaseSettings):
     DEFAULT_RETRY_COUNT: int = 1
     DEFAULT_CONNECTION_POOL_SIZE: int = 10
     
+    ROUTING_SNAPSHOT_POLL_SECONDS: int = 5
+    QUOTA_FLUSH_INTERVAL_SECONDS: int = 2
+    KEY_EWMA_ALPHA: float = 0.3
+    KEY_ERROR_PENALTY: float = 10.0
+    
+    KEY_PACING_ENABLED: bool = True
+    KEY_PACING_DEFAULT_COOLDOWN_SECONDS: float = 5.0
+    KEY_PACING_MAX_DEFER_MS: int = 1000
+    
+    RETRY_BUDGET_RATIO: float = 0.2
+    RETRY_BUDGET_MIN_PER_SECOND: int = 10
+    RETRY_BUDGET_WINDOW_SECONDS: int = 10
+    
+    HEDGE_LATENCY_SAMPLES: int = 200
+    HEDGE_MIN_SAMPLES: int = 20
+    HEDGE_PERCENTILE: float = 95
+    
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_BREAKER_ERROR_RATE: float = 0.5
+    CIRCUIT_BREAKER_MIN_REQUESTS: int = 20
+    CIRCUIT_BREAKER_WINDOW_SECONDS: int = 30
+    CIRCUIT_BREAKER_OPEN_SECONDS: float = 30
+    CIRCUIT_BREAKER_HALF_OPEN_PROBES: int = 3
+    CIRCUIT_BREAKER_PER_KEY: bool = False
+    
+    ADAPTIVE_CONCURRENCY_INITIAL_LIMIT: int = 10
+    ADAPTIVE_CONCURRENCY_MIN_LIMIT: int = 1
+    ADAPTIVE_CONCURRENCY_MAX_LIMIT: int = 200
+    ADAPTIVE_CONCURRENCY_BACKOFF_RATIO: float = 0.9
+    ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE: float = 2.0
+    
+    # 公平排队：每个隔离舱保留统计的客户端数，以及每个客户端用于计算等待时间分位数的样本数
+    FAIR_QUEUE_MAX_CLIENTS: int = 1000
+    FAIR_QUEUE_WAIT_SAMPLES: int = 500
+    
+    ENDPOINT_HEALTH_CHECK_INTERVAL_SECONDS: int = 10
+    ENDPOINT_HEALTH_CHECK_TIMEOUT_SECONDS: float = 5
+    ENDPOINT_UNHEALTHY_THRESHOLD: int = 3
+    ENDPOINT_HEALTHY_THRESHOLD: int = 2
+    ENDPOINT_SLOW_START_SECONDS: float = 30
+    
+    # 上游因延迟超过预算被跳过时，仍放行到该上游的请求比例
+    FALLBACK_PROBE_RATIO: float = 0.1
+    
+    # 频率限制和配额计数后端：local（进程内）、shared_memory（同机多工作进程）、redis（跨主机）
+    COUNTER_BACKEND: str = "local"
+    COUNTER_SHM_NAME: str = "api_gateway_counters"
+    COUNTER_SHM_SLOTS: int = 65536
+    COUNTER_REDIS_URL: str = "redis://127.0.0.1:6379/0"
+    COUNTER_SYNC_INTERVAL_MS: int = 100
+    # redis 后端每个键在本地累积多少次增量后提前同步
+    COUNTER_LEASE_SIZE: int = 10
+    # local 后端最多跟踪的键数（超出时按 LRU 淘汰频率限制窗口等带过期时间的键）
+    COUNTER_LOCAL_MAX_KEYS: int = 200000
+    COUNTER_PURGE_INTERVAL_SECONDS: int = 5
+    COUNTER_PURGE_BATCH_SIZE: int = 1000
+    
+    POST_RESPONSE_PIPELINE_ENABLED: bool = True
+    POST_RESPONSE_QUEUE_SIZE: int = 10000
+    POST_RESPONSE_WORKERS: int = 2
+    
+    REQUEST_LOG_BATCH_SIZE: int = 500
+    REQUEST_LOG_FLUSH_INTERVAL_MS: int = 200
+    REQUEST_LOG_QUEUE_SIZE: int = 50000
+    REQUEST_LOG_OVERFLOW_POLICY: str = "drop_bodies"
+    REQUEST_LOG_SAMPLE_RATE: int = 10
+    
+    STREAM_TEE_BUFFER_BYTES: int = 1024 * 1024
+    REQUEST_BODY_LOG_MAX_BYTES: int = 64 * 1024
+    REQUEST_BODY_SPOOL_MAX_MEMORY: int = 1024 * 1024
+    
+    RESPONSE_CACHE_MEMORY_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_MAX_ENTRY_BYTES: int = 1024 * 1024
+    # 为空时不启用磁盘缓存层
+    RESPONSE_CACHE_DISK_PATH: str = ""
+    RESPONSE_CACHE_DISK_BYTES: int = 512 * 1024 * 1024
+    
     MAX_SCRIPT_TIMEOUT_MS: int = 1000
     ENABLE_PYTHON_SCRIPTS: bool = False
     
@@ -1,5 +1,6 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from sqlalchemy import text
 from .config import settings
 
 engine = create_async_engine(
@@ -28,3 +29,7 @@ async def get_db():
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # 预置配置版本行，之后只做原子递增，避免并发首次失效时重复插入
+        await conn.execute(text(
+            "INSERT INTO config_versions (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING"
+        ))
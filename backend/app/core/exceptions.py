@@ -0,0 +1,42 @@
+from typing import Dict, Optional
+
+
+class ProxyError(Exception):
+    """代理请求错误 - 携带返回给客户端的状态码和响应头"""
+    
+    status_code = 502
+    
+    def __init__(self, detail: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(detail)
+        self.detail = detail
+        self.headers = headers or {}
+
+
+class ServiceUnavailableError(ProxyError):
+    """上游暂时不可用（熔断、限流等），客户端可在 Retry-After 秒后重试"""
+    
+    status_code = 503
+    
+    def __init__(self, detail: str, retry_after: Optional[int] = None):
+        headers = {"Retry-After": str(retry_after)} if retry_after is not None else None
+        super().__init__(detail, headers)
+        self.retry_after = retry_after
+
+
+class TooManyRequestsError(ProxyError):
+    """网关侧过载（并发和等待队列已满），请求被直接拒绝"""
+    
+    status_code = 429
+    
+    def __init__(self, detail: str, retry_after: Optional[int] = None):
+        headers = {"Retry-After": str(retry_after)} if retry_after is not None else None
+        super().__init__(detail, headers)
+        self.retry_after = retry_after
+
+
+class NoAvailableKeyError(ServiceUnavailableError):
+    """上游没有可用的API密钥（全部禁用、冷却或额度耗尽）"""
+
+
+class CircuitOpenError(ServiceUnavailableError):
+    """上游熔断器处于打开状态"""
@@ -6,14 +6,34 @@ from app.core.config import settings
 from app.core.database import init_db
 from app.api import upstreams, api_keys, header_configs, rules, request_logs, dashboard, proxy, scripts, batch, auth
 from app.services.scheduler import task_scheduler
+from app.services.http_client import client_registry
+from app.services.routing_cache import routing_cache
+from app.services.post_response import post_response_pipeline
+from app.services.logger import request_log_writer
+from app.services.quota import quota_ledger
+from app.services.response_cache import response_cache
+from app.services.counter_backend import counter_backend
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    await routing_cache.load()
+    if settings.RESPONSE_CACHE_DISK_PATH:
+        response_cache.open_disk(settings.RESPONSE_CACHE_DISK_PATH, settings.RESPONSE_CACHE_DISK_BYTES)
+    counter_backend.start()
+    request_log_writer.start()
+    if settings.POST_RESPONSE_PIPELINE_ENABLED:
+        post_response_pipeline.start()
     task_scheduler.start()
     yield
     task_scheduler.shutdown()
+    await post_response_pipeline.drain()
+    await quota_ledger.flush()
+    await counter_backend.close()
+    await request_log_writer.stop()
+    await client_registry.aclose()
+    response_cache.close()
 
 
 app = FastAPI(
@@ -4,6 +4,7 @@ from .header_config import HeaderConfig
 from .rule import Rule
 from .request_log import RequestLog
 from .admin_user import AdminUser
+from .config_version import ConfigVersion
 
 __all__ = [
     "Upstream",
@@ -12,4 +13,5 @@ __all__ = [
     "Rule",
     "RequestLog",
     "AdminUser",
+    "ConfigVersion",
 ]
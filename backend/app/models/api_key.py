@@ -37,6 +37,11 @@ class APIKey(Base):
     quota_used = Column(Integer, default=0)
     quota_reset_at = Column(DateTime(timezone=True), nullable=True)
     
+    # 频率限制：为空表示不限制，超过限制的密钥暂停到窗口允许为止
+    rate_limit_per_minute = Column(Integer, nullable=True)
+    rate_limit_per_hour = Column(Integer, nullable=True)
+    rate_limit_per_day = Column(Integer, nullable=True)
+    
     auto_disable_on_failure = Column(Boolean, default=True)
     auto_enable_delay_hours = Column(Integer, nullable=True)
     auto_enable_at = Column(DateTime(timezone=True), nullable=True)
@@ -32,6 +32,7 @@ class Rule(Base):
     cooldown_seconds = Column(Integer, default=0)
     
     priority = Column(Integer, default=0)
+    run_synchronously = Column(Boolean, default=False)
     is_enabled = Column(Boolean, default=True)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,7 +1,21 @@
-from sqlalchemy import Column, Integer, String, Boolean, Text, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Boolean, Text, DateTime, JSON, Enum as SQLEnum
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
+import enum
+
+
+# 默认触发换密钥重试的状态码（鉴权失败、限流和上游错误）
+DEFAULT_FAILOVER_STATUS_CODES = [401, 403, 429, 500, 502, 503, 504]
+
+
+class KeySelectionStrategy(str, enum.Enum):
+    ROUND_ROBIN = "round_robin"
+    RANDOM = "random"
+    WEIGHTED = "weighted"
+    LEAST_IN_FLIGHT = "least_in_flight"
+    EWMA = "ewma"
+    P2C = "p2c"
 
 
 class Upstream(Base):
@@ -16,10 +30,69 @@ class Upstream(Base):
     timeout = Column(Integer, default=30)
     retry_count = Column(Integer, default=1)
     connection_pool_size = Column(Integer, default=10)
+    connect_timeout = Column(Integer, default=10)
+    pool_timeout = Column(Integer, default=10)
+    keepalive_expiry = Column(Integer, default=30)
     
     log_request_body = Column(Boolean, default=False)
     log_response_body = Column(Boolean, default=False)
     
+    stream_response = Column(Boolean, default=True)
+    stream_request_body = Column(Boolean, default=False)
+    
+    key_selection_strategy = Column(
+        SQLEnum(KeySelectionStrategy),
+        default=KeySelectionStrategy.ROUND_ROBIN,
+        nullable=False
+    )
+    
+    enable_failover = Column(Boolean, default=False)
+    failover_status_codes = Column(JSON, default=lambda: list(DEFAULT_FAILOVER_STATUS_CODES))
+    failover_max_attempts = Column(Integer, default=2)
+    failover_cooldown_seconds = Column(Integer, default=30)
+    
+    enable_hedging = Column(Boolean, default=False)
+    hedge_delay_ms = Column(Integer, default=0)
+    
+    enable_circuit_breaker = Column(Boolean, default=False)
+    
+    # 隔离舱：max_concurrency 为 0 表示不限制并发；启用自适应并发时作为上限的上界
+    max_concurrency = Column(Integer, default=0)
+    max_queue_size = Column(Integer, default=100)
+    queue_timeout_ms = Column(Integer, default=5000)
+    enable_adaptive_concurrency = Column(Boolean, default=False)
+    # 公平排队：隔离舱的等待队列按客户端（与频率限制相同的客户端标识）加权轮询放行
+    # fair_queue_clients: [{"client": 请求头的值或IP, "weight": ..., "priority": ...}]，未列出的客户端权重为1、优先级为0
+    enable_fair_queue = Column(Boolean, default=False)
+    fair_queue_clients = Column(JSON, default=list)
+    
+    # 响应缓存：cache_vary_headers 中的请求头也参与缓存键（如按 Accept-Language 区分响应）
+    enable_response_cache = Column(Boolean, default=False)
+    cache_ttl_seconds = Column(Integer, default=300)
+    cache_vary_headers = Column(JSON, default=list)
+    
+    # 请求合并：coalesce_headers 中的请求头也参与判断请求是否相同
+    enable_coalescing = Column(Boolean, default=False)
+    coalesce_headers = Column(JSON, default=list)
+    
+    # 多地址：[{"url": ..., "weight": ...}]，非空时代替 base_url 参与负载均衡
+    endpoints = Column(JSON, default=list)
+    health_check_path = Column(String(255), default="")
+    
+    # 降级链：[{"upstream_id": ..., "path_map": {...}, "set_headers": {...}, "remove_headers": [...]}]
+    fallbacks = Column(JSON, default=list)
+    fallback_latency_budget_ms = Column(Integer, default=0)
+    
+    # 频率限制：0 表示不限制；client_* 按客户端（rate_limit_client_header 指定的请求头，未指定时为IP）分别计数
+    enable_rate_limit = Column(Boolean, default=False)
+    rate_limit_per_minute = Column(Integer, default=0)
+    rate_limit_per_hour = Column(Integer, default=0)
+    rate_limit_per_day = Column(Integer, default=0)
+    client_rate_limit_per_minute = Column(Integer, default=0)
+    client_rate_limit_per_hour = Column(Integer, default=0)
+    client_rate_limit_per_day = Column(Integer, default=0)
+    rate_limit_client_header = Column(String(255), default="")
+    
     tags = Column(JSON, default=list)
     
     is_enabled = Column(Boolean, default=True)
@@ -13,6 +13,9 @@ class APIKeyBase(BaseModel):
     value_prefix: Optional[str] = "Bearer "
     enable_quota: bool = False
     quota_total: Optional[int] = Field(None, ge=0)
+    rate_limit_per_minute: Optional[int] = Field(None, ge=1)
+    rate_limit_per_hour: Optional[int] = Field(None, ge=1)
+    rate_limit_per_day: Optional[int] = Field(None, ge=1)
     auto_disable_on_failure: bool = True
     auto_enable_delay_hours: Optional[int] = Field(None, ge=0)
 
@@ -31,6 +34,9 @@ class APIKeyUpdate(BaseModel):
     enable_quota: Optional[bool] = None
     quota_total: Optional[int] = Field(None, ge=0)
     quota_used: Optional[int] = Field(None, ge=0)
+    rate_limit_per_minute: Optional[int] = Field(None, ge=1)
+    rate_limit_per_hour: Optional[int] = Field(None, ge=1)
+    rate_limit_per_day: Optional[int] = Field(None, ge=1)
     auto_disable_on_failure: Optional[bool] = None
     auto_enable_delay_hours: Optional[int] = Field(None, ge=0)
 
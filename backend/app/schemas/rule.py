@@ -14,6 +14,7 @@ class RuleBase(BaseModel):
     time_window_seconds: Optional[int] = Field(None, ge=1)
     cooldown_seconds: int = Field(0, ge=0)
     priority: int = 0
+    run_synchronously: bool = False
     is_enabled: bool = True
 
 
@@ -31,6 +32,7 @@ class RuleUpdate(BaseModel):
     time_window_seconds: Optional[int] = Field(None, ge=1)
     cooldown_seconds: Optional[int] = Field(None, ge=0)
     priority: Optional[int] = None
+    run_synchronously: Optional[bool] = None
     is_enabled: Optional[bool] = None
 
 
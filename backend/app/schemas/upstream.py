@@ -1,7 +1,27 @@
 from pydantic import BaseModel, HttpUrl, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 
+from app.models.upstream import KeySelectionStrategy, DEFAULT_FAILOVER_STATUS_CODES
+
+
+class UpstreamEndpoint(BaseModel):
+    url: str = Field(..., min_length=1, max_length=512)
+    weight: int = Field(1, ge=1, le=1000)
+
+
+class UpstreamFallback(BaseModel):
+    upstream_id: int
+    path_map: Dict[str, str] = Field(default_factory=dict)
+    set_headers: Dict[str, str] = Field(default_factory=dict)
+    remove_headers: List[str] = Field(default_factory=list)
+
+
+class FairQueueClient(BaseModel):
+    client: str = Field(..., min_length=1, max_length=512)
+    weight: int = Field(1, ge=1, le=1000)
+    priority: int = Field(0, ge=0, le=100)
+
 
 class UpstreamBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=255)
@@ -11,8 +31,44 @@ class UpstreamBase(BaseModel):
     timeout: int = Field(30, ge=1, le=300)
     retry_count: int = Field(1, ge=0, le=5)
     connection_pool_size: int = Field(10, ge=1, le=100)
+    connect_timeout: int = Field(10, ge=1, le=300)
+    pool_timeout: int = Field(10, ge=1, le=300)
+    keepalive_expiry: int = Field(30, ge=1, le=3600)
     log_request_body: bool = False
     log_response_body: bool = False
+    stream_response: bool = True
+    stream_request_body: bool = False
+    key_selection_strategy: KeySelectionStrategy = KeySelectionStrategy.ROUND_ROBIN
+    enable_failover: bool = False
+    failover_status_codes: List[int] = Field(default_factory=lambda: list(DEFAULT_FAILOVER_STATUS_CODES))
+    failover_max_attempts: int = Field(2, ge=0, le=10)
+    failover_cooldown_seconds: int = Field(30, ge=0, le=86400)
+    enable_hedging: bool = False
+    hedge_delay_ms: int = Field(0, ge=0, le=60000)
+    enable_circuit_breaker: bool = False
+    max_concurrency: int = Field(0, ge=0, le=10000)
+    max_queue_size: int = Field(100, ge=0, le=100000)
+    queue_timeout_ms: int = Field(5000, ge=0, le=300000)
+    enable_adaptive_concurrency: bool = False
+    enable_fair_queue: bool = False
+    fair_queue_clients: List[FairQueueClient] = Field(default_factory=list)
+    enable_response_cache: bool = False
+    cache_ttl_seconds: int = Field(300, ge=0, le=604800)
+    cache_vary_headers: List[str] = Field(default_factory=list)
+    enable_coalescing: bool = False
+    coalesce_headers: List[str] = Field(default_factory=list)
+    endpoints: List[UpstreamEndpoint] = Field(default_factory=list)
+    health_check_path: str = Field("", max_length=255)
+    fallbacks: List[UpstreamFallback] = Field(default_factory=list)
+    fallback_latency_budget_ms: int = Field(0, ge=0, le=600000)
+    enable_rate_limit: bool = False
+    rate_limit_per_minute: int = Field(0, ge=0)
+    rate_limit_per_hour: int = Field(0, ge=0)
+    rate_limit_per_day: int = Field(0, ge=0)
+    client_rate_limit_per_minute: int = Field(0, ge=0)
+    client_rate_limit_per_hour: int = Field(0, ge=0)
+    client_rate_limit_per_day: int = Field(0, ge=0)
+    rate_limit_client_header: str = Field("", max_length=255)
     tags: List[str] = Field(default_factory=list)
     is_enabled: bool = True
 
@@ -29,8 +85,44 @@ class UpstreamUpdate(BaseModel):
     timeout: Optional[int] = Field(None, ge=1, le=300)
     retry_count: Optional[int] = Field(None, ge=0, le=5)
     connection_pool_size: Optional[int] = Field(None, ge=1, le=100)
+    connect_timeout: Optional[int] = Field(None, ge=1, le=300)
+    pool_timeout: Optional[int] = Field(None, ge=1, le=300)
+    keepalive_expiry: Optional[int] = Field(None, ge=1, le=3600)
     log_request_body: Optional[bool] = None
     log_response_body: Optional[bool] = None
+    stream_response: Optional[bool] = None
+    stream_request_body: Optional[bool] = None
+    key_selection_strategy: Optional[KeySelectionStrategy] = None
+    enable_failover: Optional[bool] = None
+    failover_status_codes: Optional[List[int]] = None
+    failover_max_attempts: Optional[int] = Field(None, ge=0, le=10)
+    failover_cooldown_seconds: Optional[int] = Field(None, ge=0, le=86400)
+    enable_hedging: Optional[bool] = None
+    hedge_delay_ms: Optional[int] = Field(None, ge=0, le=60000)
+    enable_circuit_breaker: Optional[bool] = None
+    max_concurrency: Optional[int] = Field(None, ge=0, le=10000)
+    max_queue_size: Optional[int] = Field(None, ge=0, le=100000)
+    queue_timeout_ms: Optional[int] = Field(None, ge=0, le=300000)
+    enable_adaptive_concurrency: Optional[bool] = None
+    enable_fair_queue: Optional[bool] = None
+    fair_queue_clients: Optional[List[FairQueueClient]] = None
+    enable_response_cache: Optional[bool] = None
+    cache_ttl_seconds: Optional[int] = Field(None, ge=0, le=604800)
+    cache_vary_headers: Optional[List[str]] = None
+    enable_coalescing: Optional[bool] = None
+    coalesce_headers: Optional[List[str]] = None
+    endpoints: Optional[List[UpstreamEndpoint]] = None
+    health_check_path: Optional[str] = Field(None, max_length=255)
+    fallbacks: Optional[List[UpstreamFallback]] = None
+    fallback_latency_budget_ms: Optional[int] = Field(None, ge=0, le=600000)
+    enable_rate_limit: Optional[bool] = None
+    rate_limit_per_minute: Optional[int] = Field(None, ge=0)
+    rate_limit_per_hour: Optional[int] = Field(None, ge=0)
+    rate_limit_per_day: Optional[int] = Field(None, ge=0)
+    client_rate_limit_per_minute: Optional[int] = Field(None, ge=0)
+    client_rate_limit_per_hour: Optional[int] = Field(None, ge=0)
+    client_rate_limit_per_day: Optional[int] = Field(None, ge=0)
+    rate_limit_client_header: Optional[str] = Field(None, max_length=255)
     tags: Optional[List[str]] = None
     is_enabled: Optional[bool] = None
 
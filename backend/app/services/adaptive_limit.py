@@ -0,0 +1,145 @@
+from typing import Dict, Any, Optional
+from collections import deque
+from datetime import datetime
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveLimiter:
+    """
+    自适应并发上限（AIMD）
+    
+    延迟保持在基线附近且上限确实被用到时加性增长（每个请求 +1/limit，约每轮 +1）；
+    超时、429 或短期延迟超过基线的 latency_tolerance 倍时乘性收缩。
+    基线取最小延迟并缓慢上漂，以适应上游容量随时间的变化；
+    收缩后的一个短期平均延迟内既不再收缩也不增长，避免同一批失败把上限压到底。
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 200,
+        backoff_ratio: float = 0.9,
+        latency_tolerance: float = 2.0,
+        smoothing: float = 0.2,
+        baseline_drift: float = 0.01,
+        max_history: int = 50
+    ):
+        """
+        Args:
+            name: 名称（用于日志）
+            initial_limit: 初始并发上限
+            min_limit: 并发上限下界
+            max_limit: 并发上限上界
+            backoff_ratio: 收缩时乘以的系数
+            latency_tolerance: 短期延迟超过基线多少倍视为延迟膨胀
+            smoothing: 短期延迟EWMA的平滑系数
+            baseline_drift: 基线向当前延迟上漂的速度
+            max_history: 保留的上限变更记录条数
+        """
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self.baseline_drift = baseline_drift
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._baseline_ms: Optional[float] = None
+        self._recent_ms: Optional[float] = None
+        self._last_decrease = 0.0
+        self._history: deque = deque(maxlen=max_history)
+        self._stats = {"samples": 0, "drops": 0, "increases": 0, "decreases": 0}
+    
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+    
+    def record(self, latency_ms: float, dropped: bool, in_flight: int) -> int:
+        """
+        记录一次请求结果并调整上限
+        
+        Args:
+            latency_ms: 响应头延迟（毫秒）
+            dropped: 是否超时或被上游限流
+            in_flight: 当前进行中的请求数
+        
+        Returns:
+            调整后的并发上限
+        """
+        self._stats["samples"] += 1
+        if dropped:
+            self._stats["drops"] += 1
+            self._decrease("超时或被限流")
+            return self.limit
+        
+        if self._recent_ms is None:
+            self._recent_ms = latency_ms
+        else:
+            self._recent_ms += (latency_ms - self._recent_ms) * self.smoothing
+        
+        if self._baseline_ms is None or latency_ms < self._baseline_ms:
+            self._baseline_ms = latency_ms
+        else:
+            self._baseline_ms += (latency_ms - self._baseline_ms) * self.baseline_drift
+        
+        if self._recent_ms > self._baseline_ms * self.latency_tolerance:
+            self._decrease(f"延迟 {self._recent_ms:.0f}ms 超过基线 {self._baseline_ms:.0f}ms")
+        elif (
+            in_flight * 2 >= self._limit
+            and self._limit < self.max_limit
+            and not self._cooling_down()
+        ):
+            self._set(min(self.max_limit, self._limit + 1 / self._limit), "延迟正常，增加上限")
+            self._stats["increases"] += 1
+        
+        return self.limit
+    
+    def set_bounds(self, max_limit: int) -> None:
+        """更新上限的上界（上游配置变化时调用）"""
+        self.max_limit = max(self.min_limit, max_limit)
+        if self._limit > self.max_limit:
+            self._set(self.max_limit, "配置上界变化")
+    
+    def snapshot(self, with_history: bool = False) -> Dict[str, Any]:
+        """当前上限、延迟基线和计数"""
+        snapshot = {
+            **self._stats,
+            "limit": self.limit,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "baseline_ms": round(self._baseline_ms, 2) if self._baseline_ms is not None else None,
+            "recent_ms": round(self._recent_ms, 2) if self._recent_ms is not None else None,
+        }
+        if with_history:
+            snapshot["history"] = list(self._history)
+        return snapshot
+    
+    def _cooling_down(self) -> bool:
+        """距上次收缩是否还不到一个短期平均延迟（期间不再收缩也不增长）"""
+        return time.monotonic() - self._last_decrease < (self._recent_ms or 0) / 1000
+    
+    def _decrease(self, reason: str) -> None:
+        if self._cooling_down():
+            return
+        
+        self._last_decrease = time.monotonic()
+        self._stats["decreases"] += 1
+        self._set(max(self.min_limit, self._limit * self.backoff_ratio), reason)
+    
+    def _set(self, limit: float, reason: str) -> None:
+        previous = self.limit
+        self._limit = limit
+        if self.limit == previous:
+            return
+        
+        self._history.append({
+            "limit": self.limit,
+            "reason": reason,
+            "at": datetime.now().isoformat(),
+        })
+        logger.debug(f"自适应并发 {self.name}: {previous} -> {self.limit}（{reason}）")
@@ -0,0 +1,274 @@
+from typing import Dict, Any, Optional
+import asyncio
+import time
+
+from app.core.config import settings
+from app.core.exceptions import ServiceUnavailableError, TooManyRequestsError
+from app.services.adaptive_limit import AdaptiveLimiter
+from app.services.fair_queue import FairQueue, DEFAULT_CLIENT
+
+
+class Bulkhead:
+    """
+    隔离舱 - 限制单个上游的并发请求数
+    
+    超出并发上限的请求进入有界等待队列，队列已满时立即拒绝（429），
+    等待超过 queue_timeout 秒时拒绝（503），避免慢上游占满所有协程和连接。
+    配置了自适应限制器时，并发上限随请求结果动态调整。
+    
+    未启用公平排队时所有请求属于同一个客户端，等待队列即FIFO；
+    启用后按客户端加权轮询放行，队列已满时挤出排队最多的客户端的请求。
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        max_queue: int,
+        queue_timeout: float,
+        limiter: Optional[AdaptiveLimiter] = None,
+        fair: bool = False
+    ):
+        """
+        Args:
+            name: 名称（用于错误信息）
+            limit: 最大并发数（有自适应限制器时以限制器的上限为准）
+            max_queue: 等待队列长度上限
+            queue_timeout: 排队超时（秒）
+            limiter: 自适应并发限制器
+            fair: 是否按客户端公平排队
+        """
+        self.name = name
+        self.limit = limiter.limit if limiter is not None else limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.limiter = limiter
+        self.fair = fair
+        self._active = 0
+        self._queue = FairQueue(
+            max_clients=settings.FAIR_QUEUE_MAX_CLIENTS,
+            max_samples=settings.FAIR_QUEUE_WAIT_SAMPLES
+        )
+        self._stats = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected_full": 0,
+            "rejected_timeout": 0,
+            "max_wait_ms": 0.0,
+            "total_wait_ms": 0.0,
+        }
+    
+    @property
+    def active(self) -> int:
+        return self._active
+    
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+    
+    async def acquire(self, client_id: str = DEFAULT_CLIENT, weight: float = 1, priority: int = 0) -> None:
+        """
+        获取一个并发名额，必要时排队等待
+        
+        Args:
+            client_id: 客户端标识（未启用公平排队时忽略）
+            weight: 客户端权重，同一优先级内按权重比例放行
+            priority: 客户端优先级，高优先级先放行
+        
+        Raises:
+            TooManyRequestsError: 等待队列已满（或被其他客户端挤出）
+            ServiceUnavailableError: 排队超时
+        """
+        if not self.fair:
+            client_id, weight, priority = DEFAULT_CLIENT, 1, 0
+        
+        if self._active < self.limit and not len(self._queue):
+            self._active += 1
+            self._stats["admitted"] += 1
+            self._queue.touch(client_id, weight, priority)
+            self._queue.record_wait(client_id, 0.0)
+            return
+        
+        if len(self._queue) >= self.max_queue:
+            evicted = self._queue.drop_longest(client_id, priority) if self.fair and self.max_queue else None
+            if evicted is None:
+                self._stats["rejected_full"] += 1
+                self._queue.record_drop(client_id)
+                raise TooManyRequestsError(f"上游API '{self.name}' 并发已满", retry_after=1)
+            evicted.set_exception(TooManyRequestsError(f"上游API '{self.name}' 并发已满", retry_after=1))
+        
+        waiter = asyncio.get_running_loop().create_future()
+        self._queue.push(client_id, waiter, weight, priority)
+        self._stats["queued"] += 1
+        started = time.monotonic()
+        
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not self._abandon(client_id, waiter):
+                self._record_wait(client_id, started)
+                return
+            self._stats["rejected_timeout"] += 1
+            raise ServiceUnavailableError(
+                f"上游API '{self.name}' 排队超时",
+                retry_after=max(1, int(self.queue_timeout))
+            )
+        except TooManyRequestsError:
+            self._stats["rejected_full"] += 1
+            raise
+        except asyncio.CancelledError:
+            if not self._abandon(client_id, waiter):
+                self.release()
+            raise
+        
+        self._record_wait(client_id, started)
+    
+    def release(self) -> None:
+        """释放名额；队列中有等待者时直接转交给下一个等待者"""
+        if self._active <= self.limit:
+            waiter = self._queue.pop()
+            if waiter is not None:
+                waiter.set_result(None)
+                self._stats["admitted"] += 1
+                return
+        
+        self._active = max(0, self._active - 1)
+    
+    def set_limit(self, limit: int) -> None:
+        """调整并发上限；上限提高时立即放行等待者"""
+        self.limit = max(1, limit)
+        while self._active < self.limit:
+            waiter = self._queue.pop()
+            if waiter is None:
+                break
+            waiter.set_result(None)
+            self._active += 1
+            self._stats["admitted"] += 1
+    
+    def record(self, latency_ms: float, dropped: bool) -> None:
+        """将请求结果反馈给自适应限制器并应用新的上限"""
+        if self.limiter is None:
+            return
+        
+        limit = self.limiter.record(latency_ms, dropped, self._active)
+        if limit != self.limit:
+            self.set_limit(limit)
+    
+    def stats(self) -> Dict[str, Any]:
+        """运行指标（并发数、队列深度、等待时间和拒绝计数）"""
+        stats = dict(self._stats)
+        total_wait = stats.pop("total_wait_ms")
+        waited = stats["queued"] - stats["rejected_timeout"]
+        stats["avg_wait_ms"] = round(total_wait / waited, 2) if waited > 0 else 0
+        stats["max_wait_ms"] = round(stats["max_wait_ms"], 2)
+        stats.update({
+            "name": self.name,
+            "limit": self.limit,
+            "active": self._active,
+            "queue_depth": len(self._queue),
+            "max_queue": self.max_queue,
+            "fair": self.fair,
+        })
+        if self.limiter is not None:
+            stats["adaptive"] = self.limiter.snapshot()
+        if self.fair:
+            stats["clients"] = self._queue.stats()
+        return stats
+    
+    def _abandon(self, client_id: str, waiter: asyncio.Future) -> bool:
+        """
+        放弃排队
+        
+        Returns:
+            是否成功放弃（False表示名额已在超时前转交给了该等待者）
+        """
+        if waiter.done():
+            return False
+        waiter.cancel()
+        self._queue.remove(client_id, waiter)
+        return True
+    
+    def _record_wait(self, client_id: str, started: float) -> None:
+        waited_ms = (time.monotonic() - started) * 1000
+        self._stats["total_wait_ms"] += waited_ms
+        self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], waited_ms)
+        self._queue.record_wait(client_id, waited_ms)
+
+
+class BulkheadRegistry:
+    """
+    隔离舱注册表 - 每个配置了并发上限或启用自适应并发的上游一个隔离舱，
+    配置变化时原地调整
+    """
+    
+    def __init__(self):
+        self._bulkheads: Dict[int, Bulkhead] = {}
+    
+    def for_upstream(self, upstream: Any) -> Optional[Bulkhead]:
+        """
+        获取上游的隔离舱（未配置并发上限且未启用自适应并发时返回None）
+        
+        启用自适应并发时，max_concurrency 作为自适应上限的上界
+        （为0时使用全局默认上界）
+        """
+        adaptive = bool(upstream.enable_adaptive_concurrency)
+        if not upstream.max_concurrency and not adaptive:
+            self._bulkheads.pop(upstream.id, None)
+            return None
+        
+        max_limit = upstream.max_concurrency or settings.ADAPTIVE_CONCURRENCY_MAX_LIMIT
+        bulkhead = self._bulkheads.get(upstream.id)
+        if bulkhead is None or adaptive != (bulkhead.limiter is not None):
+            bulkhead = self._bulkheads[upstream.id] = Bulkhead(
+                name=upstream.name,
+                limit=upstream.max_concurrency,
+                max_queue=upstream.max_queue_size or 0,
+                queue_timeout=(upstream.queue_timeout_ms or 0) / 1000,
+                limiter=self._create_limiter(upstream.name, max_limit) if adaptive else None,
+                fair=bool(upstream.enable_fair_queue)
+            )
+            return bulkhead
+        
+        bulkhead.fair = bool(upstream.enable_fair_queue)
+        bulkhead.max_queue = upstream.max_queue_size or 0
+        bulkhead.queue_timeout = (upstream.queue_timeout_ms or 0) / 1000
+        if bulkhead.limiter is not None:
+            if bulkhead.limiter.max_limit != max_limit:
+                bulkhead.limiter.set_bounds(max_limit)
+            limit = bulkhead.limiter.limit
+        else:
+            limit = upstream.max_concurrency
+        if bulkhead.limit != limit:
+            bulkhead.set_limit(limit)
+        return bulkhead
+    
+    def get(self, upstream_id: int) -> Optional[Bulkhead]:
+        """按上游ID获取已创建的隔离舱"""
+        return self._bulkheads.get(upstream_id)
+    
+    def record(self, upstream_id: int, latency_ms: float, dropped: bool) -> None:
+        """记录上游请求结果（仅自适应并发的隔离舱会使用）"""
+        bulkhead = self._bulkheads.get(upstream_id)
+        if bulkhead is not None:
+            bulkhead.record(latency_ms, dropped)
+    
+    def discard(self, upstream_id: int) -> None:
+        """上游删除时丢弃其隔离舱"""
+        self._bulkheads.pop(upstream_id, None)
+    
+    def stats(self) -> Dict[int, Dict[str, Any]]:
+        """各上游隔离舱的运行指标"""
+        return {upstream_id: bulkhead.stats() for upstream_id, bulkhead in self._bulkheads.items()}
+    
+    def _create_limiter(self, name: str, max_limit: int) -> AdaptiveLimiter:
+        return AdaptiveLimiter(
+            name=name,
+            initial_limit=settings.ADAPTIVE_CONCURRENCY_INITIAL_LIMIT,
+            min_limit=settings.ADAPTIVE_CONCURRENCY_MIN_LIMIT,
+            max_limit=max_limit,
+            backoff_ratio=settings.ADAPTIVE_CONCURRENCY_BACKOFF_RATIO,
+            latency_tolerance=settings.ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE
+        )
+
+
+bulkheads = BulkheadRegistry()
@@ -0,0 +1,272 @@
+from typing import Dict, Any, Optional, Tuple
+from collections import deque
+from datetime import datetime
+import enum
+import logging
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class BreakerState(str, enum.Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    熔断器 - 连续失败或窗口错误率超过阈值时打开，快速失败
+    
+    打开 open_seconds 后进入半开状态，只放行有限个探测请求：
+    探测全部成功则关闭，任一失败则重新打开。
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        error_rate_threshold: float = 0.5,
+        min_requests: int = 20,
+        window_seconds: int = 30,
+        open_seconds: float = 30,
+        half_open_probes: int = 3,
+        max_transitions: int = 20
+    ):
+        """
+        Args:
+            name: 名称（用于日志）
+            failure_threshold: 连续失败多少次后打开
+            error_rate_threshold: 窗口内错误率超过该值时打开
+            min_requests: 按错误率判断所需的最少请求数
+            window_seconds: 错误率统计窗口（秒）
+            open_seconds: 打开后等待多久进入半开
+            half_open_probes: 半开状态下放行的探测请求数
+            max_transitions: 保留的状态变更记录条数
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.min_requests = min_requests
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._state = BreakerState.CLOSED
+        self._opened_at = 0.0
+        self._consecutive_failures = 0
+        self._buckets: deque = deque()
+        self._window_requests = 0
+        self._window_failures = 0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        # 每次进入半开状态加一，用于识别探测名额属于哪一轮探测
+        self._probe_round = 0
+        self._rejected = 0
+        self._transitions: deque = deque(maxlen=max_transitions)
+    
+    @property
+    def state(self) -> BreakerState:
+        """当前状态（打开超时后自动转为半开）"""
+        if self._state == BreakerState.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._transition(BreakerState.HALF_OPEN, "冷却结束，开始探测")
+        return self._state
+    
+    def acquire(self) -> Optional[int]:
+        """
+        请求是否可以通过；通过后需在请求结束时以返回值调用 release
+        
+        Returns:
+            打开时（或半开且探测名额已满时）返回None；
+            否则返回探测名额的轮次，关闭状态下通过的请求不占探测名额，返回0
+        """
+        state = self.state
+        if state == BreakerState.CLOSED:
+            return 0
+        
+        if state == BreakerState.HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+            self._probes_in_flight += 1
+            return self._probe_round
+        
+        self._rejected += 1
+        return None
+    
+    def release(self, probe: int) -> None:
+        """
+        请求结束，释放 acquire 占用的探测名额
+        
+        熔断前放行的请求和上一轮探测的请求不占用当前轮次的名额，不会多放行探测请求
+        """
+        if probe and probe == self._probe_round and self._probes_in_flight:
+            self._probes_in_flight -= 1
+    
+    def record_success(self, probe: Optional[int] = None) -> None:
+        """
+        记录一次成功
+        
+        Args:
+            probe: acquire 返回的探测轮次；半开状态下只有本轮探测请求的成功计入关闭条件，
+                熔断前放行的请求不算。不经 acquire 放行的调用方（如由密钥池暂停控制放行的密钥熔断）传None
+        """
+        self._count(failed=False)
+        self._consecutive_failures = 0
+        
+        if self._state == BreakerState.HALF_OPEN and (probe is None or probe == self._probe_round):
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                self._transition(BreakerState.CLOSED, "探测请求全部成功")
+    
+    def record_failure(self) -> None:
+        """记录一次失败"""
+        self._count(failed=True)
+        self._consecutive_failures += 1
+        
+        if self._state == BreakerState.HALF_OPEN:
+            self._transition(BreakerState.OPEN, "探测请求失败")
+        elif self._state == BreakerState.CLOSED:
+            if self._consecutive_failures >= self.failure_threshold:
+                self._transition(BreakerState.OPEN, f"连续失败 {self._consecutive_failures} 次")
+            elif (
+                self._window_requests >= self.min_requests
+                and self._window_failures / self._window_requests >= self.error_rate_threshold
+            ):
+                self._transition(
+                    BreakerState.OPEN,
+                    f"错误率 {self._window_failures / self._window_requests:.0%}"
+                )
+    
+    def retry_after(self) -> int:
+        """距离进入半开状态的秒数（用于Retry-After响应头）"""
+        if self._state != BreakerState.OPEN:
+            return 1
+        remaining = self.open_seconds - (time.monotonic() - self._opened_at)
+        return max(1, int(remaining + 0.999))
+    
+    def force(self, state: BreakerState, reason: str = "手动操作") -> None:
+        """手动设置状态（管理接口使用）"""
+        self._transition(state, reason)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """当前状态、计数和最近的状态变更"""
+        self._expire()
+        state = self.state
+        return {
+            "state": state,
+            "consecutive_failures": self._consecutive_failures,
+            "window_requests": self._window_requests,
+            "window_failures": self._window_failures,
+            "rejected": self._rejected,
+            "retry_after": self.retry_after() if state == BreakerState.OPEN else None,
+            "transitions": list(self._transitions),
+        }
+    
+    def _transition(self, state: BreakerState, reason: str) -> None:
+        previous = self._state
+        self._state = state
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        
+        if state == BreakerState.OPEN:
+            self._opened_at = time.monotonic()
+        elif state == BreakerState.HALF_OPEN:
+            self._probe_round += 1
+        elif state == BreakerState.CLOSED:
+            self._consecutive_failures = 0
+            self._buckets.clear()
+            self._window_requests = 0
+            self._window_failures = 0
+        
+        self._transitions.append({
+            "from": previous,
+            "to": state,
+            "reason": reason,
+            "at": datetime.now().isoformat(),
+        })
+        logger.warning(f"熔断器 {self.name}: {previous.value} -> {state.value}（{reason}）")
+    
+    def _count(self, failed: bool) -> None:
+        second = int(time.monotonic())
+        self._expire(second)
+        if not self._buckets or self._buckets[-1][0] != second:
+            self._buckets.append([second, 0, 0])
+        self._buckets[-1][1] += 1
+        self._window_requests += 1
+        if failed:
+            self._buckets[-1][2] += 1
+            self._window_failures += 1
+    
+    def _expire(self, now: Optional[int] = None) -> None:
+        if now is None:
+            now = int(time.monotonic())
+        while self._buckets and self._buckets[0][0] <= now - self.window_seconds:
+            _, requests, failures = self._buckets.popleft()
+            self._window_requests -= requests
+            self._window_failures -= failures
+
+
+class CircuitBreakerRegistry:
+    """熔断器注册表 - 每个上游一个熔断器，可选地为每个密钥单独熔断"""
+    
+    def __init__(self):
+        self._upstreams: Dict[int, CircuitBreaker] = {}
+        self._keys: Dict[Tuple[int, int], CircuitBreaker] = {}
+    
+    def for_upstream(self, upstream: Any) -> Optional[CircuitBreaker]:
+        """获取上游的熔断器（上游未启用熔断时返回None）"""
+        if not upstream.enable_circuit_breaker:
+            return None
+        
+        breaker = self._upstreams.get(upstream.id)
+        if breaker is None:
+            breaker = self._upstreams[upstream.id] = self._create(upstream.name)
+        return breaker
+    
+    def for_key(self, upstream: Any, key_id: int) -> Optional[CircuitBreaker]:
+        """获取密钥的熔断器（未开启按密钥熔断时返回None）"""
+        if not upstream.enable_circuit_breaker or not settings.CIRCUIT_BREAKER_PER_KEY:
+            return None
+        
+        entry = (upstream.id, key_id)
+        breaker = self._keys.get(entry)
+        if breaker is None:
+            breaker = self._keys[entry] = self._create(f"{upstream.name}#{key_id}")
+        return breaker
+    
+    def get(self, upstream_id: int) -> Optional[CircuitBreaker]:
+        """按上游ID获取已创建的熔断器"""
+        return self._upstreams.get(upstream_id)
+    
+    def discard(self, upstream_id: int) -> None:
+        """上游删除时丢弃其熔断器"""
+        self._upstreams.pop(upstream_id, None)
+        for entry in [entry for entry in self._keys if entry[0] == upstream_id]:
+            del self._keys[entry]
+    
+    def stats(self) -> Dict[int, Dict[str, Any]]:
+        """各上游熔断器的状态（不含变更记录）"""
+        result = {}
+        for upstream_id, breaker in self._upstreams.items():
+            snapshot = breaker.snapshot()
+            snapshot.pop("transitions")
+            snapshot["name"] = breaker.name
+            snapshot["open_keys"] = [
+                key_id for (entry_upstream, key_id), key_breaker in self._keys.items()
+                if entry_upstream == upstream_id and key_breaker.state != BreakerState.CLOSED
+            ]
+            result[upstream_id] = snapshot
+        return result
+    
+    def _create(self, name: str) -> CircuitBreaker:
+        return CircuitBreaker(
+            name=name,
+            failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            error_rate_threshold=settings.CIRCUIT_BREAKER_ERROR_RATE,
+            min_requests=settings.CIRCUIT_BREAKER_MIN_REQUESTS,
+            window_seconds=settings.CIRCUIT_BREAKER_WINDOW_SECONDS,
+            open_seconds=settings.CIRCUIT_BREAKER_OPEN_SECONDS,
+            half_open_probes=settings.CIRCUIT_BREAKER_HALF_OPEN_PROBES
+        )
+
+
+circuit_breakers = CircuitBreakerRegistry()
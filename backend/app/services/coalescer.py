@@ -0,0 +1,227 @@
+from typing import Dict, Any, Optional, List, Mapping, AsyncIterator, Awaitable, Callable
+import asyncio
+import hashlib
+
+from app.core.exceptions import ProxyError
+from app.services.rule_engine import ProxyResponse
+from app.services.response_cache import normalize_body
+
+# 跟随者收到的响应带上该响应头
+COALESCED_HEADER = "X-Coalesced"
+
+# 流结束标记
+_END = object()
+
+
+class StreamFanout:
+    """
+    流式响应分发 - 从首个请求的流式响应读取数据块并分发给所有订阅者
+    
+    订阅者在流开始前一次性创建，每个订阅者一个有界队列：
+    最慢的订阅者会对上游读取形成背压，已断开或停滞超过 stall_timeout 秒的订阅者
+    会被移除，不再阻塞其他订阅者。源响应在分发结束后执行一次 finalize。
+    """
+    
+    def __init__(self, source: Any, subscribers: int, queue_size: int = 64, stall_timeout: float = 30):
+        """
+        Args:
+            source: 首个请求得到的流式响应
+            subscribers: 订阅者数量
+            queue_size: 每个订阅者缓冲的数据块数
+            stall_timeout: 订阅者队列持续满多少秒后将其移除
+        """
+        self.status_code = source.status_code
+        self.headers = source.headers
+        self._source = source
+        self._queues: List[asyncio.Queue] = [asyncio.Queue(maxsize=queue_size) for _ in range(subscribers)]
+        self._unclaimed = list(self._queues)
+        self._stall_timeout = stall_timeout
+        self._pump_task: Optional[asyncio.Task] = None
+    
+    def subscribe(self, coalesced: bool = False) -> "FanoutSubscriber":
+        """领取一个预先创建的订阅者"""
+        return FanoutSubscriber(self, self._unclaimed.pop(), coalesced)
+    
+    def start(self) -> None:
+        if self._pump_task is None:
+            self._pump_task = asyncio.create_task(self._pump())
+    
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        """订阅者结束（含客户端断开），清空其队列以免阻塞分发"""
+        if queue in self._queues:
+            self._queues.remove(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        
+        if self._pump_task is None and not self._queues:
+            self.start()
+    
+    async def _pump(self) -> None:
+        end: Any = _END
+        try:
+            if self._queues:
+                async for chunk in self._source.iter_bytes():
+                    for queue in list(self._queues):
+                        await self._deliver(queue, chunk)
+                    if not self._queues:
+                        break
+        except Exception as e:
+            end = e
+        finally:
+            for queue in list(self._queues):
+                await self._deliver(queue, end)
+            await self._source.finalize()
+    
+    async def _deliver(self, queue: asyncio.Queue, item: Any) -> None:
+        try:
+            queue.put_nowait(item)
+            return
+        except asyncio.QueueFull:
+            pass
+        
+        try:
+            await asyncio.wait_for(queue.put(item), timeout=self._stall_timeout)
+        except asyncio.TimeoutError:
+            self.unsubscribe(queue)
+
+
+class FanoutSubscriber:
+    """分发流的一个订阅者，与 StreamingProxyResponse 接口一致"""
+    
+    def __init__(self, fanout: StreamFanout, queue: asyncio.Queue, coalesced: bool):
+        self.status_code = fanout.status_code
+        self.headers = dict(fanout.headers)
+        if coalesced:
+            self.headers[COALESCED_HEADER] = "1"
+        self._fanout = fanout
+        self._queue = queue
+    
+    async def iter_bytes(self) -> AsyncIterator[bytes]:
+        self._fanout.start()
+        while True:
+            item = await self._queue.get()
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    
+    async def finalize(self) -> None:
+        self._fanout.unsubscribe(self._queue)
+
+
+class Flight:
+    """一组正在进行中的相同请求"""
+    
+    def __init__(self):
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.followers = 0
+        self.fanout: Optional[StreamFanout] = None
+
+
+class RequestCoalescer:
+    """
+    请求合并（single-flight）
+    
+    相同上游、方法、路径、请求体和指定请求头的请求同时进行时，只有第一个请求
+    真正发往上游，其余请求等待并共享它的结果（包括异常）；流式响应分发给所有请求。
+    """
+    
+    def __init__(self):
+        self._inflight: Dict[str, Flight] = {}
+        self._stats: Dict[int, Dict[str, int]] = {}
+    
+    def key_for(
+        self,
+        upstream: Any,
+        method: str,
+        path: str,
+        headers: Mapping[str, str],
+        body: Any
+    ) -> Optional[str]:
+        """
+        计算合并键
+        
+        Returns:
+            合并键；上游未启用合并或请求体为流式时返回None
+        """
+        if not upstream.enable_coalescing or not (body is None or isinstance(body, bytes)):
+            return None
+        
+        digest = hashlib.sha256(normalize_body(body))
+        lowered = {name.lower(): value for name, value in headers.items()}
+        for name in sorted(header.lower() for header in upstream.coalesce_headers or []):
+            digest.update(f"\n{name}:{lowered.get(name, '')}".encode())
+        return f"{upstream.id}:{method.upper()}:{path}:{digest.hexdigest()}"
+    
+    async def run(self, upstream_id: int, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行请求；已有相同请求进行中时等待其结果
+        
+        Args:
+            upstream_id: 上游ID（用于统计）
+            key: 合并键
+            call: 真正发送请求的协程函数
+        """
+        stats = self._stats.setdefault(upstream_id, {"leaders": 0, "saved": 0, "streams_fanned_out": 0})
+        
+        flight = self._inflight.get(key)
+        if flight is not None:
+            flight.followers += 1
+            stats["saved"] += 1
+            try:
+                result = await asyncio.shield(flight.future)
+            except asyncio.CancelledError:
+                if not flight.future.done():
+                    flight.followers -= 1
+                raise
+            return self._share(flight, result)
+        
+        flight = self._inflight[key] = Flight()
+        stats["leaders"] += 1
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            if flight.followers:
+                flight.future.set_exception(ProxyError("合并请求的首个请求已取消"))
+            raise
+        except BaseException as e:
+            if flight.followers:
+                flight.future.set_exception(e)
+            raise
+        finally:
+            del self._inflight[key]
+        
+        if flight.followers and not isinstance(result, ProxyResponse):
+            flight.fanout = StreamFanout(result, flight.followers + 1)
+            stats["streams_fanned_out"] += 1
+            flight.future.set_result(result)
+            return flight.fanout.subscribe()
+        
+        flight.future.set_result(result)
+        return result
+    
+    def stats(self) -> Dict[str, Any]:
+        """节省的上游调用次数和当前进行中的合并组数"""
+        return {
+            "in_flight": len(self._inflight),
+            "saved": sum(stats["saved"] for stats in self._stats.values()),
+            "upstreams": self._stats,
+        }
+    
+    def _share(self, flight: Flight, result: Any) -> Any:
+        if flight.fanout is not None:
+            return flight.fanout.subscribe(coalesced=True)
+        
+        headers = dict(result.headers)
+        headers[COALESCED_HEADER] = "1"
+        return ProxyResponse(
+            status_code=result.status_code,
+            headers=headers,
+            body=result.body,
+            latency_ms=result.latency_ms,
+            content=result.content
+        )
+
+
+request_coalescer = RequestCoalescer()
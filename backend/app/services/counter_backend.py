@@ -0,0 +1,593 @@
+from typing import Dict, Any, List, Optional, Tuple
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from hashlib import blake2b
+from multiprocessing import shared_memory, resource_tracker
+import asyncio
+import fcntl
+import logging
+import os
+import tempfile
+import time
+
+from app.core.config import settings
+from app.services.resp_client import RespClient, RespError
+from app.services.timer_wheel import TimerWheel
+
+logger = logging.getLogger(__name__)
+
+NS_PER_SECOND = 1_000_000_000
+
+
+class CounterBackend(ABC):
+    """
+    计数后端 - 频率限制和密钥配额共用的整数计数存储
+    
+    所有读写都在 transaction() 中进行：
+    
+        with backend.transaction() as counters:
+            if counters.get("a") < 10:
+                counters.incr("a", 1, ttl=60)
+    
+    同一事务内的操作对其他进程（或其他工作进程）是原子的。
+    ttl 为秒数，incr 和 set 时刷新，None 表示不过期。
+    """
+    
+    name = "base"
+    
+    def transaction(self) -> "CounterBackend":
+        return self
+    
+    def __enter__(self) -> "CounterBackend":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        pass
+    
+    def now_ns(self) -> int:
+        """计算时间窗口使用的时钟（同一后端的所有进程必须一致）"""
+        return time.monotonic_ns()
+    
+    @abstractmethod
+    def get(self, key: str) -> int:
+        """读取计数（不存在或已过期时为0）"""
+    
+    @abstractmethod
+    def incr(self, key: str, delta: int = 1, ttl: Optional[float] = None) -> int:
+        """增加计数并返回新值"""
+    
+    @abstractmethod
+    def set(self, key: str, value: int, ttl: Optional[float] = None) -> None:
+        """设置计数"""
+    
+    @abstractmethod
+    def setnx(self, key: str, value: int, ttl: Optional[float] = None) -> bool:
+        """键不存在时设置，返回是否设置成功"""
+    
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """删除键"""
+    
+    @property
+    def purge_backlog(self) -> int:
+        """已到期但尚未处理的键数"""
+        return 0
+    
+    def purge(self, budget: Optional[int] = None) -> int:
+        """清理已过期的键，返回清理数量"""
+        return 0
+    
+    async def purge_expired(self, batch_size: int = 1000) -> int:
+        """分批清理过期键，批次之间让出事件循环"""
+        purged = self.purge(batch_size)
+        while self.purge_backlog:
+            await asyncio.sleep(0)
+            purged += self.purge(batch_size)
+        return purged
+    
+    def start(self) -> None:
+        """启动后台任务（需要在事件循环中调用）"""
+    
+    async def close(self) -> None:
+        pass
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+# 估算内存时每个键除键名外的开销（字典槽位、链表节点和计数列表）
+ENTRY_OVERHEAD_BYTES = 320
+
+# 不参与 LRU 淘汰的键前缀：配额预留虽带过期时间，淘汰后会导致配额被超额预留
+PINNED_KEY_PREFIXES = ("quota:",)
+
+
+class LocalCounterBackend(CounterBackend):
+    """
+    进程内计数（单个工作进程）：事务内没有 await，在事件循环内天然原子
+    
+    带过期时间的键登记在分层时间轮中，清理只处理到期的键；续期只更新过期时间，
+    键到期出轮时再按新的过期时间重新登记。键数超过 max_keys 时按 LRU 淘汰带过期时间的键
+    （不过期的键和配额计数不参与淘汰，见 PINNED_KEY_PREFIXES）。
+    """
+    
+    name = "local"
+    
+    def __init__(self, max_keys: int = 0, tick_seconds: float = 1.0):
+        """
+        Args:
+            max_keys: 最多保存的键数，0 表示不限制
+            tick_seconds: 时间轮刻度（秒）
+        """
+        self.max_keys = max_keys
+        # 键 -> [值, 过期时间(ns)，0 表示不过期, 时间轮中登记的到期时间(ns)]
+        self._values: "OrderedDict[str, List[int]]" = OrderedDict()
+        self._wheel = TimerWheel(int(tick_seconds * NS_PER_SECOND), self.now_ns())
+        self._key_bytes = 0
+        self._stats = {"expired": 0, "evictions": 0}
+    
+    @property
+    def purge_backlog(self) -> int:
+        return len(self._wheel.ready)
+    
+    def get(self, key: str) -> int:
+        entry = self._live(key)
+        return entry[0] if entry is not None else 0
+    
+    def incr(self, key: str, delta: int = 1, ttl: Optional[float] = None) -> int:
+        entry = self._live(key)
+        if entry is None:
+            entry = self._insert(key)
+        entry[0] += delta
+        if ttl is not None:
+            self._expire_at(key, entry, self.now_ns() + int(ttl * NS_PER_SECOND))
+        return entry[0]
+    
+    def set(self, key: str, value: int, ttl: Optional[float] = None) -> None:
+        entry = self._live(key) or self._insert(key)
+        entry[0] = value
+        if ttl is not None:
+            self._expire_at(key, entry, self.now_ns() + int(ttl * NS_PER_SECOND))
+        else:
+            entry[1] = 0
+    
+    def setnx(self, key: str, value: int, ttl: Optional[float] = None) -> bool:
+        if self._live(key) is not None:
+            return False
+        self.set(key, value, ttl)
+        return True
+    
+    def delete(self, key: str) -> None:
+        if key in self._values:
+            self._remove(key)
+    
+    def purge(self, budget: Optional[int] = None) -> int:
+        """
+        清理到期的键
+        
+        Args:
+            budget: 本次最多处理的到期定时项数，剩余部分留到下次（见 purge_backlog）
+        """
+        now = self.now_ns()
+        self._wheel.advance(now)
+        ready = self._wheel.ready
+        purged = 0
+        processed = 0
+        while ready and (budget is None or processed < budget):
+            key, deadline = ready.popleft()
+            processed += 1
+            entry = self._values.get(key)
+            if entry is None or entry[2] != deadline:
+                continue
+            if entry[1] and entry[1] <= now:
+                self._remove(key)
+                purged += 1
+            elif entry[1]:
+                # 已续期：按新的过期时间重新登记
+                entry[2] = entry[1]
+                self._wheel.schedule(key, entry[1])
+            else:
+                entry[2] = 0
+        
+        self._stats["expired"] += purged
+        return purged
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            **self._stats,
+            "keys": len(self._values),
+            "max_keys": self.max_keys,
+            "timers": len(self._wheel),
+            "estimated_bytes": self._key_bytes + len(self._values) * ENTRY_OVERHEAD_BYTES,
+        }
+    
+    def _live(self, key: str) -> Optional[List[int]]:
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        if entry[1] and entry[1] <= self.now_ns():
+            self._remove(key)
+            self._stats["expired"] += 1
+            return None
+        self._values.move_to_end(key)
+        return entry
+    
+    def _insert(self, key: str) -> List[int]:
+        entry = self._values[key] = [0, 0, 0]
+        self._key_bytes += len(key)
+        if self.max_keys and len(self._values) > self.max_keys:
+            self._evict()
+        return entry
+    
+    def _remove(self, key: str) -> None:
+        del self._values[key]
+        self._key_bytes -= len(key)
+    
+    def _expire_at(self, key: str, entry: List[int], expires: int) -> None:
+        entry[1] = expires
+        # 已登记的到期时间不晚于新的过期时间时，出轮时再重新登记
+        if not entry[2] or expires < entry[2]:
+            entry[2] = expires
+            self._wheel.schedule(key, expires)
+    
+    def _evict(self) -> None:
+        """淘汰最久未访问的带过期时间的键（不过期的键和配额计数移到队尾跳过）"""
+        for _ in range(len(self._values)):
+            key, entry = next(iter(self._values.items()))
+            if entry[1] and not key.startswith(PINNED_KEY_PREFIXES):
+                self._remove(key)
+                self._stats["evictions"] += 1
+                return
+            self._values.move_to_end(key)
+
+
+# 共享内存槽位：键哈希、过期时间(ns)、值，各一个 int64
+SLOT_FIELDS = 3
+SLOT_BYTES = SLOT_FIELDS * 8
+
+
+class SharedMemoryCounterBackend(CounterBackend):
+    """
+    同机多进程共享计数 - multiprocessing.shared_memory 中的开放寻址哈希表
+    
+    每个槽位保存键的 64 位哈希、过期时间和值；过期槽位在插入时复用，
+    删除只把槽位标记为过期，以保持探测链完整。事务期间持有锁文件上的 flock，
+    同一事务内的多次读写只加锁一次。时钟为 CLOCK_MONOTONIC，同一主机的进程一致。
+    """
+    
+    name = "shared_memory"
+    
+    def __init__(self, shm_name: str, slots: int, max_probe: int = 32):
+        """
+        Args:
+            shm_name: 共享内存名称（所有工作进程相同）
+            slots: 槽位数量（所有工作进程相同）
+            max_probe: 线性探测的最大长度，超过时计数不落地（放行）
+        """
+        try:
+            self._shm = shared_memory.SharedMemory(name=shm_name, create=True, size=slots * SLOT_BYTES)
+        except FileExistsError:
+            self._shm = shared_memory.SharedMemory(name=shm_name)
+        # 共享内存由所有工作进程共用，不能在创建它的进程退出时被 resource_tracker 删除
+        resource_tracker.unregister(self._shm._name, "shared_memory")
+        
+        self.slots = min(slots, self._shm.size // SLOT_BYTES)
+        self.max_probe = min(max_probe, self.slots)
+        self._cells = self._shm.buf.cast("q")
+        self._lock_file = open(os.path.join(tempfile.gettempdir(), f"{shm_name}.lock"), "a+b")
+        self._depth = 0
+        self._stats = {"transactions": 0, "overflows": 0}
+    
+    def __enter__(self) -> "SharedMemoryCounterBackend":
+        if self._depth == 0:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            self._stats["transactions"] += 1
+        self._depth += 1
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+    
+    def get(self, key: str) -> int:
+        with self:
+            slot = self._find(key, create=False)
+            return self._cells[slot * SLOT_FIELDS + 2] if slot >= 0 else 0
+    
+    def incr(self, key: str, delta: int = 1, ttl: Optional[float] = None) -> int:
+        with self:
+            slot = self._find(key, create=True)
+            if slot < 0:
+                return delta
+            base = slot * SLOT_FIELDS
+            self._cells[base + 2] += delta
+            if ttl is not None:
+                self._cells[base + 1] = self.now_ns() + int(ttl * NS_PER_SECOND)
+            return self._cells[base + 2]
+    
+    def set(self, key: str, value: int, ttl: Optional[float] = None) -> None:
+        with self:
+            slot = self._find(key, create=True)
+            if slot < 0:
+                return
+            base = slot * SLOT_FIELDS
+            self._cells[base + 1] = self.now_ns() + int(ttl * NS_PER_SECOND) if ttl is not None else 0
+            self._cells[base + 2] = value
+    
+    def setnx(self, key: str, value: int, ttl: Optional[float] = None) -> bool:
+        with self:
+            if self._find(key, create=False) >= 0:
+                return False
+            self.set(key, value, ttl)
+            return True
+    
+    def delete(self, key: str) -> None:
+        with self:
+            slot = self._find(key, create=False)
+            if slot >= 0:
+                self._cells[slot * SLOT_FIELDS + 1] = 1
+    
+    async def close(self) -> None:
+        self._cells.release()
+        self._shm.close()
+        self._lock_file.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "slots": self.slots, **self._stats}
+    
+    def _find(self, key: str, create: bool) -> int:
+        """
+        查找键所在的槽位
+        
+        Args:
+            create: 不存在时是否占用一个空闲或过期槽位
+        
+        Returns:
+            槽位序号；不存在（或探测范围内没有可用槽位）时返回-1
+        """
+        cells = self._cells
+        hashed = int.from_bytes(blake2b(key.encode(), digest_size=8).digest(), "little", signed=True) or 1
+        now = self.now_ns()
+        start = (hashed & 0x7FFFFFFFFFFFFFFF) % self.slots
+        free = -1
+        
+        for probe in range(self.max_probe):
+            slot = (start + probe) % self.slots
+            base = slot * SLOT_FIELDS
+            stored = cells[base]
+            if stored == 0:
+                if free < 0:
+                    free = slot
+                break
+            expires = cells[base + 1]
+            if expires and expires <= now:
+                if stored == hashed:
+                    free = slot
+                    break
+                if free < 0:
+                    free = slot
+                continue
+            if stored == hashed:
+                return slot
+        
+        if not create:
+            return -1
+        if free < 0:
+            self._stats["overflows"] += 1
+            logger.warning(f"共享计数槽位不足，键 {key} 未计数")
+            return -1
+        
+        base = free * SLOT_FIELDS
+        cells[base] = hashed
+        cells[base + 1] = 0
+        cells[base + 2] = 0
+        return free
+
+
+class MirroredCounter:
+    """远程计数在本地的镜像：最近一次同步得到的总数 + 本地尚未同步的增量"""
+    
+    __slots__ = ("synced", "pending", "ttl_ms", "touched")
+    
+    def __init__(self):
+        self.synced = 0
+        self.pending = 0
+        self.ttl_ms: Optional[int] = None
+        self.touched = True
+
+
+class LeasedCounterBackend(CounterBackend):
+    """
+    跨主机共享计数 - 本地镜像 + Redis 协议服务端
+    
+    请求路径上只读写本地镜像，不等待网络。每个键在本地最多累积 lease_size 次
+    未同步的增量（本地租约），用完即触发一次提前同步，否则每 sync_interval 秒同步一次；
+    同步用一个 MULTI/EXEC 管道原子地提交所有增量并读回最近访问过的键的全局总数。
+    因此每个工作进程对同一个键最多超出 lease_size 次。时钟使用墙上时间，以便各主机对齐窗口。
+    """
+    
+    name = "redis"
+    
+    def __init__(self, client: RespClient, lease_size: int = 10, sync_interval: float = 0.1):
+        self.client = client
+        self.lease_size = max(1, lease_size)
+        self.sync_interval = sync_interval
+        self._mirror: Dict[str, MirroredCounter] = {}
+        # 需要在下次同步时写入的 SET/SETNX/DEL 命令
+        self._writes: Dict[str, Tuple] = {}
+        self._sync_task: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        # 同步串行执行，避免较早发出的 MGET 回复覆盖较新的总数
+        self._sync_lock = asyncio.Lock()
+        self._stats = {"syncs": 0, "early_syncs": 0, "sync_errors": 0}
+    
+    def now_ns(self) -> int:
+        return time.time_ns()
+    
+    def get(self, key: str) -> int:
+        entry = self._entry(key)
+        return entry.synced + entry.pending
+    
+    def incr(self, key: str, delta: int = 1, ttl: Optional[float] = None) -> int:
+        entry = self._entry(key)
+        entry.pending += delta
+        if ttl is not None:
+            entry.ttl_ms = int(ttl * 1000)
+        if abs(entry.pending) >= self.lease_size:
+            self._request_sync()
+        return entry.synced + entry.pending
+    
+    def set(self, key: str, value: int, ttl: Optional[float] = None) -> None:
+        entry = self._entry(key)
+        entry.synced, entry.pending = value, 0
+        self._writes[key] = ("SET", value, ttl)
+        self._request_sync()
+    
+    def setnx(self, key: str, value: int, ttl: Optional[float] = None) -> bool:
+        """
+        键不在本地镜像中时设置
+        
+        返回值只反映本地镜像：其他工作进程已设置该键时这里仍返回True，
+        服务端的 SET NX 不会覆盖已有的值，下次同步读回全局值后镜像随之更正
+        """
+        if key in self._mirror:
+            return False
+        entry = self._entry(key)
+        entry.synced = value
+        self._writes[key] = ("SETNX", value, ttl)
+        self._request_sync()
+        return True
+    
+    def delete(self, key: str) -> None:
+        self._mirror.pop(key, None)
+        self._writes[key] = ("DEL",)
+        self._request_sync()
+    
+    def purge(self, budget: Optional[int] = None) -> int:
+        """丢弃上次清理以来未被访问且没有未同步增量的镜像"""
+        idle = [
+            key for key, entry in self._mirror.items()
+            if not entry.touched and not entry.pending and key not in self._writes
+        ]
+        for key in idle:
+            del self._mirror[key]
+        for entry in self._mirror.values():
+            entry.touched = False
+        return len(idle)
+    
+    def start(self) -> None:
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._sync_loop())
+    
+    async def close(self) -> None:
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            self._loop_task = None
+        await self.sync()
+        await self.client.close()
+    
+    async def sync(self) -> None:
+        """提交本地增量和写命令，并刷新最近访问过的键（同一时刻只有一次同步在进行）"""
+        async with self._sync_lock:
+            await self._sync()
+    
+    async def _sync(self) -> None:
+        writes, self._writes = self._writes, {}
+        increments = {
+            key: (entry.pending, entry.ttl_ms)
+            for key, entry in self._mirror.items()
+            if entry.pending
+        }
+        for key in increments:
+            self._mirror[key].pending = 0
+        keys = [key for key, entry in self._mirror.items() if entry.touched or key in increments]
+        
+        commands: List[Tuple] = [("MULTI",)]
+        for key, write in writes.items():
+            if write[0] == "DEL":
+                commands.append(("DEL", key))
+                continue
+            command = ("SET", key, write[1]) + (("NX",) if write[0] == "SETNX" else ())
+            commands.append(command + (("PX", int(write[2] * 1000)) if write[2] is not None else ()))
+        for key, (delta, ttl_ms) in increments.items():
+            commands.append(("INCRBY", key, delta))
+            if ttl_ms is not None:
+                commands.append(("PEXPIRE", key, ttl_ms))
+        if keys:
+            commands.append(("MGET", *keys))
+        commands.append(("EXEC",))
+        
+        if len(commands) == 2:
+            return
+        
+        try:
+            replies = await self.client.pipeline(commands)
+            results = replies[-1]
+            if isinstance(results, RespError) or results is None:
+                raise results or RespError("EXEC aborted")
+        except Exception as e:
+            for key, (delta, ttl_ms) in increments.items():
+                entry = self._entry(key)
+                entry.pending += delta
+                entry.ttl_ms = entry.ttl_ms or ttl_ms
+            for key, write in writes.items():
+                self._writes.setdefault(key, write)
+            self._stats["sync_errors"] += 1
+            logger.warning(f"同步共享计数失败: {e}")
+            return
+        
+        self._stats["syncs"] += 1
+        if keys:
+            for key, value in zip(keys, results[-1]):
+                entry = self._mirror.get(key)
+                if entry is not None:
+                    entry.synced = int(value) if value is not None else 0
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            **self._stats,
+            "mirrored_keys": len(self._mirror),
+            "pending": sum(abs(entry.pending) for entry in self._mirror.values()),
+        }
+    
+    def _entry(self, key: str) -> MirroredCounter:
+        entry = self._mirror.get(key)
+        if entry is None:
+            entry = self._mirror[key] = MirroredCounter()
+        entry.touched = True
+        return entry
+    
+    def _request_sync(self) -> None:
+        """本地租约用完时尽快同步（已有同步进行中时不重复发起）"""
+        if self._sync_task is not None and not self._sync_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._stats["early_syncs"] += 1
+        self._sync_task = loop.create_task(self.sync())
+    
+    async def _sync_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            await self.sync()
+
+
+def create_counter_backend() -> CounterBackend:
+    """按 COUNTER_BACKEND 配置创建计数后端"""
+    if settings.COUNTER_BACKEND == "shared_memory":
+        return SharedMemoryCounterBackend(settings.COUNTER_SHM_NAME, settings.COUNTER_SHM_SLOTS)
+    if settings.COUNTER_BACKEND == "redis":
+        return LeasedCounterBackend(
+            RespClient(settings.COUNTER_REDIS_URL),
+            lease_size=settings.COUNTER_LEASE_SIZE,
+            sync_interval=settings.COUNTER_SYNC_INTERVAL_MS / 1000
+        )
+    return LocalCounterBackend(max_keys=settings.COUNTER_LOCAL_MAX_KEYS)
+
+
+counter_backend = create_counter_backend()
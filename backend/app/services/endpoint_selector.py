@@ -0,0 +1,239 @@
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+import asyncio
+import logging
+import random
+import time
+
+from app.core.config import settings
+from app.services.http_client import client_registry
+
+logger = logging.getLogger(__name__)
+
+# 没有延迟样本时假定的延迟（毫秒）
+DEFAULT_LATENCY_MS = 100.0
+
+# 慢启动期间的最小权重比例
+SLOW_START_FLOOR = 0.1
+
+
+class Endpoint:
+    """上游的一个地址及其运行状态"""
+    
+    def __init__(self, url: str, weight: int = 1):
+        self.url = url.rstrip("/")
+        self.weight = max(1, weight)
+        self.healthy = True
+        self.in_flight = 0
+        self.latency_ms: Optional[float] = None
+        self.failures = 0
+        self.successes = 0
+        self.recovered_at: Optional[float] = None
+    
+    def effective_weight(self, now: float) -> float:
+        """恢复后的慢启动期间按时间线性放大权重"""
+        if self.recovered_at is None:
+            return float(self.weight)
+        elapsed = now - self.recovered_at
+        if elapsed >= settings.ENDPOINT_SLOW_START_SECONDS:
+            self.recovered_at = None
+            return float(self.weight)
+        ramp = elapsed / settings.ENDPOINT_SLOW_START_SECONDS if settings.ENDPOINT_SLOW_START_SECONDS else 1
+        return self.weight * max(SLOW_START_FLOOR, ramp)
+    
+    def cost(self, now: float) -> float:
+        """负载代价：延迟 ×（进行中请求 + 1）/ 有效权重"""
+        latency = self.latency_ms if self.latency_ms is not None else DEFAULT_LATENCY_MS
+        return latency * (self.in_flight + 1) / self.effective_weight(now)
+    
+    def mark_failure(self) -> None:
+        """连续失败达到阈值时移出轮换"""
+        self.successes = 0
+        self.failures += 1
+        if self.healthy and self.failures >= settings.ENDPOINT_UNHEALTHY_THRESHOLD:
+            self.healthy = False
+            self.recovered_at = None
+            logger.warning(f"地址 {self.url} 连续失败 {self.failures} 次，移出轮换")
+    
+    def mark_success(self) -> None:
+        """不健康的地址连续成功达到阈值后恢复，并进入慢启动"""
+        self.failures = 0
+        if self.healthy:
+            return
+        self.successes += 1
+        if self.successes >= settings.ENDPOINT_HEALTHY_THRESHOLD:
+            self.healthy = True
+            self.successes = 0
+            self.recovered_at = time.monotonic()
+            logger.info(f"地址 {self.url} 已恢复，开始慢启动")
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "weight": self.weight,
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "latency_ms": round(self.latency_ms, 2) if self.latency_ms is not None else None,
+            "failures": self.failures,
+            "slow_start": self.recovered_at is not None,
+        }
+
+
+class EndpointSet:
+    """单个上游的地址集合"""
+    
+    def __init__(self, endpoints: List[Endpoint], fingerprint: Tuple):
+        self.endpoints = endpoints
+        self.fingerprint = fingerprint
+    
+    def select(self, exclude: Iterable[str] = ()) -> Endpoint:
+        """
+        Power of two choices：按权重随机取两个健康地址，选代价较低的一个
+        
+        没有健康地址时退回到全部地址（fail open）
+        """
+        if len(self.endpoints) == 1:
+            return self.endpoints[0]
+        
+        excluded = set(exclude)
+        candidates = [e for e in self.endpoints if e.healthy and e.url not in excluded]
+        if not candidates:
+            candidates = [e for e in self.endpoints if e.url not in excluded] or self.endpoints
+        if len(candidates) == 1:
+            return candidates[0]
+        
+        now = time.monotonic()
+        weights = [e.effective_weight(now) for e in candidates]
+        first, second = random.choices(candidates, weights=weights, k=2)
+        if first is second:
+            return first
+        return first if first.cost(now) <= second.cost(now) else second
+
+
+def endpoints_of(upstream: Any) -> List[Tuple[str, int]]:
+    """上游配置的地址列表（未配置 endpoints 时只有 base_url）"""
+    configured = [
+        (entry["url"], int(entry.get("weight") or 1))
+        for entry in (upstream.endpoints or [])
+        if entry.get("url")
+    ]
+    return configured or [(upstream.base_url, 1)]
+
+
+class EndpointSelector:
+    """
+    上游地址选择器 - 在上游的多个地址间做负载均衡
+    
+    按 P2C 在健康地址中选择延迟和负载较低的地址；请求的传输错误和后台主动
+    健康检查连续失败都会把地址移出轮换，健康检查连续成功后恢复并慢启动。
+    """
+    
+    def __init__(self):
+        self._sets: Dict[int, EndpointSet] = {}
+        self._stats = {"checks": 0, "check_failures": 0}
+    
+    def for_upstream(self, upstream: Any) -> EndpointSet:
+        """获取上游的地址集合（配置变化时重建，保留仍存在的地址的状态）"""
+        fingerprint = tuple(endpoints_of(upstream))
+        endpoint_set = self._sets.get(upstream.id)
+        if endpoint_set is not None and endpoint_set.fingerprint == fingerprint:
+            return endpoint_set
+        
+        previous = {e.url: e for e in endpoint_set.endpoints} if endpoint_set else {}
+        endpoints = []
+        for url, weight in fingerprint:
+            endpoint = previous.get(url.rstrip("/")) or Endpoint(url, weight)
+            endpoint.weight = max(1, weight)
+            endpoints.append(endpoint)
+        
+        endpoint_set = self._sets[upstream.id] = EndpointSet(endpoints, fingerprint)
+        return endpoint_set
+    
+    def select(self, upstream: Any, exclude: Iterable[str] = ()) -> Endpoint:
+        """为一次请求选择地址并计入进行中请求"""
+        endpoint = self.for_upstream(upstream).select(exclude)
+        endpoint.in_flight += 1
+        return endpoint
+    
+    def latency_ms(self, upstream: Any) -> Optional[float]:
+        """上游健康地址中最低的平滑延迟（没有样本时返回None）"""
+        samples = [
+            endpoint.latency_ms for endpoint in self.for_upstream(upstream).endpoints
+            if endpoint.healthy and endpoint.latency_ms is not None
+        ]
+        return min(samples) if samples else None
+    
+    def has_alternative(self, upstream: Any, endpoint: Endpoint) -> bool:
+        """上游是否还有其他地址可用"""
+        return any(other is not endpoint for other in self.for_upstream(upstream).endpoints)
+    
+    def release(self, endpoint: Endpoint) -> None:
+        """请求被取消时只减少进行中请求数"""
+        endpoint.in_flight = max(0, endpoint.in_flight - 1)
+    
+    def report(self, endpoint: Endpoint, latency_ms: float, failed: bool) -> None:
+        """
+        请求结束（收到响应头或传输错误）
+        
+        Args:
+            endpoint: select 返回的地址
+            latency_ms: 响应头延迟（毫秒）
+            failed: 是否为传输错误（上游返回的错误状态码不计入地址健康）
+        """
+        self.release(endpoint)
+        if failed:
+            endpoint.mark_failure()
+            return
+        
+        if endpoint.latency_ms is None:
+            endpoint.latency_ms = latency_ms
+        else:
+            endpoint.latency_ms += (latency_ms - endpoint.latency_ms) * settings.KEY_EWMA_ALPHA
+        if endpoint.healthy:
+            endpoint.failures = 0
+    
+    async def check_health(self, upstreams: Iterable[Any]) -> None:
+        """对配置了多个地址的上游做一轮主动健康检查"""
+        checks = []
+        for upstream in upstreams:
+            endpoint_set = self.for_upstream(upstream)
+            if len(endpoint_set.endpoints) > 1:
+                checks.extend(self._probe(upstream, endpoint) for endpoint in endpoint_set.endpoints)
+        
+        if checks:
+            await asyncio.gather(*checks)
+    
+    def discard(self, upstream_id: int) -> None:
+        """上游删除时丢弃其地址状态"""
+        self._sets.pop(upstream_id, None)
+    
+    def stats(self) -> Dict[str, Any]:
+        """各上游地址的健康状态、延迟和负载"""
+        return {
+            **self._stats,
+            "upstreams": {
+                upstream_id: [endpoint.snapshot() for endpoint in endpoint_set.endpoints]
+                for upstream_id, endpoint_set in self._sets.items()
+                if len(endpoint_set.endpoints) > 1
+            },
+        }
+    
+    async def _probe(self, upstream: Any, endpoint: Endpoint) -> None:
+        url = f"{endpoint.url}/{(upstream.health_check_path or '').lstrip('/')}"
+        client = client_registry.get_client(upstream)
+        self._stats["checks"] += 1
+        try:
+            response = await client.get(url, timeout=settings.ENDPOINT_HEALTH_CHECK_TIMEOUT_SECONDS)
+        except Exception as e:
+            self._stats["check_failures"] += 1
+            logger.debug(f"地址 {endpoint.url} 健康检查失败: {e}")
+            endpoint.mark_failure()
+            return
+        
+        if response.status_code >= 500:
+            self._stats["check_failures"] += 1
+            endpoint.mark_failure()
+        else:
+            endpoint.mark_success()
+
+
+endpoint_selector = EndpointSelector()
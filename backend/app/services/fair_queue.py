@@ -0,0 +1,207 @@
+from typing import Dict, Any, Optional, Mapping
+from collections import OrderedDict, deque
+import asyncio
+import math
+
+# 默认客户端（未启用公平排队时所有请求共用）
+DEFAULT_CLIENT = ""
+
+# 统计等待时间的分位数
+WAIT_PERCENTILES = (50, 95, 99)
+
+
+class ClientQueue:
+    """单个客户端的FIFO子队列、DRR差额和等待时间样本"""
+    
+    __slots__ = ("client_id", "weight", "priority", "waiters", "deficit", "waits", "admitted", "dropped")
+    
+    def __init__(self, client_id: str, weight: float, priority: int, max_samples: int):
+        self.client_id = client_id
+        self.weight = weight
+        self.priority = priority
+        self.waiters: deque = deque()
+        self.deficit = 0.0
+        self.waits: deque = deque(maxlen=max_samples)
+        self.admitted = 0
+        self.dropped = 0
+    
+    def snapshot(self) -> Dict[str, Any]:
+        ordered = sorted(self.waits)
+        snapshot = {
+            "weight": self.weight,
+            "priority": self.priority,
+            "queued": len(self.waiters),
+            "admitted": self.admitted,
+            "dropped": self.dropped,
+        }
+        for percentile in WAIT_PERCENTILES:
+            index = min(len(ordered) - 1, math.ceil(len(ordered) * percentile / 100) - 1)
+            snapshot[f"wait_p{percentile}_ms"] = round(ordered[index], 2) if ordered else None
+        return snapshot
+
+
+class FairQueue:
+    """
+    公平等待队列 - 按客户端分子队列的加权差额轮询（DRR）
+    
+    每个客户端一个FIFO子队列。同一优先级的有等待者的客户端轮流出队：
+    轮到某客户端时其差额增加 weight，每出队一个请求消耗 1，差额不足时轮到下一个客户端，
+    因此各客户端的出队速率与权重成正比，与各自排队的请求数无关。
+    高优先级的客户端总是先于低优先级出队。队列满时丢弃优先级最低、排队最多的客户端的最后一个请求，
+    而不是拒绝新到的其他客户端；新请求不会挤掉优先级更高的客户端。
+    """
+    
+    def __init__(self, max_clients: int = 256, max_samples: int = 500):
+        """
+        Args:
+            max_clients: 保留统计的客户端数上限（超出时丢弃最久没有请求的空闲客户端）
+            max_samples: 每个客户端保留的等待时间样本数
+        """
+        self.max_clients = max_clients
+        self.max_samples = max_samples
+        self._clients: "OrderedDict[str, ClientQueue]" = OrderedDict()
+        # 优先级 -> 有等待者的客户端轮转环
+        self._rings: Dict[int, deque] = {}
+        self._size = 0
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def push(self, client_id: str, waiter: asyncio.Future, weight: float = 1, priority: int = 0) -> None:
+        """将等待者加入客户端的子队列"""
+        queue = self._client(client_id, weight, priority)
+        if not queue.waiters:
+            queue.deficit = 0.0
+            self._rings.setdefault(queue.priority, deque()).append(queue)
+        queue.waiters.append(waiter)
+        self._size += 1
+    
+    def pop(self) -> Optional[asyncio.Future]:
+        """按优先级和DRR取出下一个未取消的等待者，队列为空时返回None"""
+        for priority in sorted(self._rings, reverse=True):
+            ring = self._rings[priority]
+            while ring:
+                queue = ring[0]
+                while queue.waiters and queue.waiters[0].done():
+                    queue.waiters.popleft()
+                    self._size -= 1
+                if not queue.waiters:
+                    ring.popleft()
+                    continue
+                
+                if queue.deficit < 1:
+                    queue.deficit += queue.weight
+                    if queue.deficit < 1:
+                        ring.rotate(-1)
+                        continue
+                
+                queue.deficit -= 1
+                waiter = queue.waiters.popleft()
+                self._size -= 1
+                queue.admitted += 1
+                if not queue.waiters:
+                    ring.popleft()
+                elif queue.deficit < 1:
+                    ring.rotate(-1)
+                return waiter
+            
+            del self._rings[priority]
+        return None
+    
+    def remove(self, client_id: str, waiter: asyncio.Future) -> None:
+        """移除放弃排队的等待者"""
+        queue = self._clients.get(client_id)
+        if queue is None:
+            return
+        try:
+            queue.waiters.remove(waiter)
+        except ValueError:
+            return
+        self._size -= 1
+        if not queue.waiters:
+            ring = self._rings.get(queue.priority)
+            if ring is not None and queue in ring:
+                ring.remove(queue)
+    
+    def drop_longest(self, client_id: str, priority: int = 0) -> Optional[asyncio.Future]:
+        """
+        队列已满时为优先级为 priority 的 client_id 腾出位置
+        
+        只挤出优先级不高于新请求的客户端：优先级最低的客户端中排队最多的一个，
+        同为最低优先级时还要比新请求的客户端排队更多
+        
+        Returns:
+            被挤出的等待者（该客户端的最后一个请求）；没有可挤出的客户端时返回None，由调用方拒绝新请求
+        """
+        own = self._clients.get(client_id)
+        own_depth = len(own.waiters) if own is not None else 0
+        candidates = [
+            queue for queue in self._clients.values()
+            if queue.waiters and queue is not own and queue.priority <= priority
+        ]
+        if not candidates:
+            return None
+        
+        longest = min(candidates, key=lambda queue: (queue.priority, -len(queue.waiters)))
+        if longest.priority == priority and len(longest.waiters) <= own_depth:
+            return None
+        
+        waiter = longest.waiters.pop()
+        self._size -= 1
+        longest.dropped += 1
+        if not longest.waiters:
+            self._rings[longest.priority].remove(longest)
+        return waiter
+    
+    def record_wait(self, client_id: str, waited_ms: float) -> None:
+        """记录一次出队（或直接放行）的等待时间"""
+        queue = self._clients.get(client_id)
+        if queue is not None:
+            queue.waits.append(waited_ms)
+    
+    def record_drop(self, client_id: str) -> None:
+        """记录一次因队列已满被拒绝的请求"""
+        queue = self._clients.get(client_id)
+        if queue is not None:
+            queue.dropped += 1
+    
+    def touch(self, client_id: str, weight: float = 1, priority: int = 0) -> None:
+        """登记直接放行（未排队）的客户端"""
+        self._client(client_id, weight, priority).admitted += 1
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各客户端的排队数、放行数和等待时间分位数"""
+        return {client_id: queue.snapshot() for client_id, queue in self._clients.items()}
+    
+    def _client(self, client_id: str, weight: float, priority: int) -> ClientQueue:
+        queue = self._clients.get(client_id)
+        if queue is None:
+            queue = self._clients[client_id] = ClientQueue(client_id, weight, priority, self.max_samples)
+            self._evict_idle()
+        else:
+            self._clients.move_to_end(client_id)
+            queue.weight = weight
+            if not queue.waiters:
+                queue.priority = priority
+        return queue
+    
+    def _evict_idle(self) -> None:
+        # 最后一个是刚登记的客户端，不参与淘汰
+        for client_id in list(self._clients)[:-1]:
+            if len(self._clients) <= self.max_clients:
+                return
+            if not self._clients[client_id].waiters:
+                del self._clients[client_id]
+
+
+def client_policy(upstream: Any, client_id: str) -> Mapping[str, Any]:
+    """
+    客户端的权重和优先级
+    
+    fair_queue_clients 中的 client 与客户端标识中 "=" 之后的部分（请求头的值或IP）比较
+    """
+    value = client_id.split("=", 1)[-1]
+    for entry in upstream.fair_queue_clients or []:
+        if entry.get("client") == value:
+            return {"weight": float(entry.get("weight") or 1), "priority": int(entry.get("priority") or 0)}
+    return {"weight": 1.0, "priority": 0}
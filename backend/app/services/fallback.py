@@ -0,0 +1,101 @@
+from typing import Dict, Any, List
+from dataclasses import dataclass, field
+import random
+
+from app.core.config import settings
+from app.core.exceptions import ProxyError, NoAvailableKeyError, CircuitOpenError
+from app.services.routing_cache import routing_cache
+from app.services.endpoint_selector import endpoint_selector
+
+# 由备用上游返回的响应带上该响应头（值为实际服务的上游名称）
+FALLBACK_HEADER = "X-Fallback-Upstream"
+
+
+@dataclass
+class FallbackTarget:
+    """降级链中的一个上游及切换到它时的路径和请求头映射"""
+    upstream: Any
+    path_map: Dict[str, str] = field(default_factory=dict)
+    set_headers: Dict[str, str] = field(default_factory=dict)
+    remove_headers: List[str] = field(default_factory=list)
+    
+    def rewrite_path(self, path: str) -> str:
+        """按最长匹配的前缀替换路径"""
+        normalized = "/" + path.lstrip("/")
+        for prefix in sorted(self.path_map, key=len, reverse=True):
+            if normalized.startswith("/" + prefix.lstrip("/")):
+                replaced = "/" + self.path_map[prefix].lstrip("/") + normalized[len("/" + prefix.lstrip("/")):]
+                return replaced.lstrip("/")
+        return path
+    
+    def rewrite_headers(self, headers: Dict[str, str]) -> Dict[str, str]:
+        """删除并覆盖请求头"""
+        removed = {name.lower() for name in self.remove_headers}
+        rewritten = {name: value for name, value in headers.items() if name.lower() not in removed}
+        rewritten.update(self.set_headers)
+        return rewritten
+
+
+class FallbackRouter:
+    """
+    上游降级链
+    
+    上游没有可用密钥、熔断器打开或隔离舱拒绝时，按配置顺序改用备用上游；
+    上游延迟超过 fallback_latency_budget_ms 时视为降级，直接跳到备用上游，
+    但仍按 FALLBACK_PROBE_RATIO 放行少量请求以便延迟恢复后切回。
+    """
+    
+    def __init__(self):
+        self._stats: Dict[int, Dict[str, int]] = {}
+    
+    def chain(self, upstream: Any) -> List[FallbackTarget]:
+        """上游自身及其启用的备用上游（只展开一层，忽略重复和自身）"""
+        targets = [FallbackTarget(upstream)]
+        seen = {upstream.id}
+        upstreams = routing_cache.snapshot.upstreams_by_id
+        
+        for entry in upstream.fallbacks or []:
+            fallback = upstreams.get(entry.get("upstream_id"))
+            if fallback is None or fallback.id in seen:
+                continue
+            seen.add(fallback.id)
+            targets.append(FallbackTarget(
+                upstream=fallback,
+                path_map=entry.get("path_map") or {},
+                set_headers=entry.get("set_headers") or {},
+                remove_headers=entry.get("remove_headers") or []
+            ))
+        return targets
+    
+    def is_degraded(self, upstream: Any) -> bool:
+        """上游延迟是否超过预算（按探测比例放行的请求不算降级）"""
+        budget = upstream.fallback_latency_budget_ms
+        if not budget:
+            return False
+        
+        latency = endpoint_selector.latency_ms(upstream)
+        if latency is None or latency <= budget:
+            return False
+        return random.random() >= settings.FALLBACK_PROBE_RATIO
+    
+    def reason_for(self, error: ProxyError) -> str:
+        if isinstance(error, NoAvailableKeyError):
+            return "no_keys"
+        if isinstance(error, CircuitOpenError):
+            return "circuit_open"
+        return "overloaded"
+    
+    def record(self, upstream_id: int, event: str) -> None:
+        """记录降级事件（no_keys / circuit_open / overloaded / latency / served_as_fallback）"""
+        stats = self._stats.setdefault(
+            upstream_id,
+            {"no_keys": 0, "circuit_open": 0, "overloaded": 0, "latency": 0, "served_as_fallback": 0}
+        )
+        stats[event] += 1
+    
+    def stats(self) -> Dict[int, Dict[str, int]]:
+        """各上游的降级次数（按原因）"""
+        return self._stats
+
+
+fallback_router = FallbackRouter()
@@ -0,0 +1,95 @@
+from typing import Dict, Any, Optional
+from collections import deque
+import math
+
+from app.core.config import settings
+
+# 可以安全地重复发送的HTTP方法
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# 每累计多少个新样本重新计算一次分位数阈值
+THRESHOLD_REFRESH_SAMPLES = 10
+
+
+class HedgeTracker:
+    """
+    对冲请求统计 - 记录各上游的响应头延迟并计算对冲阈值
+    
+    上游配置了 hedge_delay_ms 时使用固定阈值，否则使用最近样本的分位数
+    （样本不足时不对冲）；同时统计对冲次数和胜出情况，便于调整阈值。
+    """
+    
+    def __init__(self, max_samples: int = 200, min_samples: int = 20, percentile: float = 95):
+        self.max_samples = max_samples
+        self.min_samples = min_samples
+        self.percentile = percentile
+        self._samples: Dict[int, deque] = {}
+        self._thresholds: Dict[int, Optional[float]] = {}
+        self._new_samples: Dict[int, int] = {}
+        self._stats: Dict[int, Dict[str, int]] = {}
+    
+    def should_hedge(self, upstream: Any, method: str) -> bool:
+        """上游是否对该请求启用对冲（仅幂等方法）"""
+        return bool(upstream.enable_hedging) and method.upper() in IDEMPOTENT_METHODS
+    
+    def delay_for(self, upstream: Any) -> Optional[float]:
+        """
+        获取上游的对冲等待时间
+        
+        Returns:
+            等待秒数；没有固定阈值且样本不足时返回None
+        """
+        if upstream.hedge_delay_ms:
+            return upstream.hedge_delay_ms / 1000
+        
+        if upstream.id not in self._thresholds:
+            self._thresholds[upstream.id] = self._compute_threshold(upstream.id)
+        threshold = self._thresholds[upstream.id]
+        return threshold / 1000 if threshold is not None else None
+    
+    def record_latency(self, upstream_id: int, latency_ms: int) -> None:
+        """记录一次响应头延迟（毫秒）"""
+        samples = self._samples.get(upstream_id)
+        if samples is None:
+            samples = self._samples[upstream_id] = deque(maxlen=self.max_samples)
+        samples.append(latency_ms)
+        
+        new_samples = self._new_samples.get(upstream_id, 0) + 1
+        if new_samples >= THRESHOLD_REFRESH_SAMPLES or self._thresholds.get(upstream_id) is None:
+            self._thresholds.pop(upstream_id, None)
+            new_samples = 0
+        self._new_samples[upstream_id] = new_samples
+    
+    def record(self, upstream_id: int, event: str) -> None:
+        """记录对冲事件（hedged / hedge_wins / primary_wins / cancelled）"""
+        stats = self._stats.setdefault(
+            upstream_id,
+            {"hedged": 0, "hedge_wins": 0, "primary_wins": 0, "cancelled": 0}
+        )
+        stats[event] += 1
+    
+    def stats(self) -> Dict[int, Dict[str, Any]]:
+        """各上游的对冲计数和当前分位数阈值"""
+        return {
+            upstream_id: {
+                **stats,
+                "threshold_ms": self._compute_threshold(upstream_id),
+            }
+            for upstream_id, stats in self._stats.items()
+        }
+    
+    def _compute_threshold(self, upstream_id: int) -> Optional[float]:
+        samples = self._samples.get(upstream_id)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, math.ceil(len(ordered) * self.percentile / 100) - 1)
+        return float(ordered[index])
+
+
+hedge_tracker = HedgeTracker(
+    max_samples=settings.HEDGE_LATENCY_SAMPLES,
+    min_samples=settings.HEDGE_MIN_SAMPLES,
+    percentile=settings.HEDGE_PERCENTILE
+)
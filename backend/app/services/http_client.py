@@ -0,0 +1,110 @@
+from typing import Dict, Tuple, Set
+import asyncio
+import logging
+import httpx
+
+from app.models.upstream import Upstream
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamClientRegistry:
+    """上游HTTP客户端注册表 - 按上游复用长连接池"""
+    
+    def __init__(self):
+        self._clients: Dict[int, Tuple[tuple, httpx.AsyncClient]] = {}
+        self._retired: Set[httpx.AsyncClient] = set()
+        self._retiring: Set[asyncio.Task] = set()
+    
+    def get_client(self, upstream: Upstream) -> httpx.AsyncClient:
+        """
+        获取上游对应的HTTP客户端（懒创建，配置变更时重建）
+        
+        Args:
+            upstream: 上游API配置
+        
+        Returns:
+            该上游共享的AsyncClient
+        """
+        fingerprint = self._fingerprint(upstream)
+        entry = self._clients.get(upstream.id)
+        
+        if entry and entry[0] == fingerprint and not entry[1].is_closed:
+            return entry[1]
+        
+        client = self._build_client(upstream)
+        self._clients[upstream.id] = (fingerprint, client)
+        
+        if entry:
+            self._retire(entry[1], grace_seconds=upstream.timeout or 30)
+            logger.info(f"上游 {upstream.name} 配置已变更，重建连接池")
+        
+        return client
+    
+    def _fingerprint(self, upstream: Upstream) -> tuple:
+        """影响连接池的配置项"""
+        return (
+            upstream.connection_pool_size,
+            upstream.timeout,
+            upstream.connect_timeout,
+            upstream.pool_timeout,
+            upstream.keepalive_expiry,
+        )
+    
+    def _build_client(self, upstream: Upstream) -> httpx.AsyncClient:
+        """根据上游配置创建客户端"""
+        pool_size = upstream.connection_pool_size or 10
+        
+        limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=upstream.keepalive_expiry or 30
+        )
+        timeout = httpx.Timeout(
+            upstream.timeout or 30,
+            connect=upstream.connect_timeout or 10,
+            pool=upstream.pool_timeout or 10
+        )
+        
+        return httpx.AsyncClient(
+            limits=limits,
+            timeout=timeout,
+            follow_redirects=True
+        )
+    
+    def _retire(self, client: httpx.AsyncClient, grace_seconds: int) -> None:
+        """延迟关闭旧客户端，让进行中的请求正常结束"""
+        self._retired.add(client)
+        
+        async def close_later():
+            await asyncio.sleep(grace_seconds)
+            self._retired.discard(client)
+            await client.aclose()
+        
+        task = asyncio.create_task(close_later())
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+    
+    def discard(self, upstream_id: int) -> None:
+        """移除上游客户端（上游被删除时调用）"""
+        entry = self._clients.pop(upstream_id, None)
+        if entry:
+            self._retire(entry[1], grace_seconds=30)
+    
+    async def aclose(self) -> None:
+        """关闭所有客户端"""
+        for task in list(self._retiring):
+            task.cancel()
+        
+        clients = [client for _, client in self._clients.values()]
+        clients.extend(self._retired)
+        self._clients.clear()
+        self._retired.clear()
+        
+        for client in clients:
+            await client.aclose()
+        
+        logger.info(f"已关闭 {len(clients)} 个上游连接池")
+
+
+client_registry = UpstreamClientRegistry()
@@ -0,0 +1,197 @@
+from typing import Dict, Any, Optional, Mapping
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import logging
+import re
+import time
+
+from app.core.config import settings
+from app.services.key_pool import key_pools
+
+logger = logging.getLogger(__name__)
+
+# 按优先级排列的限流响应头（兼容常见上游的命名）
+REMAINING_HEADERS = (
+    "x-ratelimit-remaining",
+    "x-ratelimit-remaining-requests",
+    "ratelimit-remaining",
+    "anthropic-ratelimit-requests-remaining",
+)
+RESET_HEADERS = (
+    "x-ratelimit-reset",
+    "x-ratelimit-reset-requests",
+    "ratelimit-reset",
+    "anthropic-ratelimit-requests-reset",
+)
+
+# 大于该值的重置时间按Unix时间戳处理，否则按剩余秒数处理
+EPOCH_THRESHOLD = 1_000_000_000
+
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+@dataclass
+class RateLimitHint:
+    """从上游响应头解析出的限流信息"""
+    remaining: Optional[int] = None
+    reset_after: Optional[float] = None
+    retry_after: Optional[float] = None
+
+
+@dataclass
+class TokenBucket:
+    """单个密钥的剩余额度：由响应头校准，每次选中时本地扣减"""
+    tokens: int
+    reset_at: float
+
+
+def parse_reset(value: str) -> Optional[float]:
+    """
+    解析重置时间，返回距现在的秒数
+    
+    支持秒数（"30"）、Unix时间戳（"1700000000"）、
+    时长（"1m30s"、"250ms"）和ISO 8601时间（"2024-01-01T00:00:00Z"）
+    """
+    value = value.strip()
+    try:
+        number = float(value)
+    except ValueError:
+        pass
+    else:
+        if number > EPOCH_THRESHOLD:
+            return max(0.0, number - time.time())
+        return max(0.0, number)
+    
+    parts = DURATION_PATTERN.findall(value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        return sum(float(n) * DURATION_UNITS[u] for n, u in parts)
+    
+    try:
+        reset_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if reset_at.tzinfo is None:
+        reset_at = reset_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (reset_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def parse_retry_after(value: str) -> Optional[float]:
+    """解析Retry-After（秒数或HTTP日期）"""
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def parse_rate_limit_headers(headers: Mapping[str, str]) -> RateLimitHint:
+    """从响应头中提取剩余额度、重置时间和Retry-After"""
+    lowered = {name.lower(): value for name, value in headers.items()}
+    hint = RateLimitHint()
+    
+    for name in REMAINING_HEADERS:
+        if name in lowered:
+            try:
+                hint.remaining = int(float(lowered[name]))
+            except ValueError:
+                continue
+            break
+    
+    for name in RESET_HEADERS:
+        if name in lowered:
+            hint.reset_after = parse_reset(lowered[name])
+            if hint.reset_after is not None:
+                break
+    
+    if "retry-after" in lowered:
+        hint.retry_after = parse_retry_after(lowered["retry-after"])
+    
+    return hint
+
+
+class KeyPacer:
+    """
+    密钥节流器 - 按上游返回的限流响应头维护每个密钥的令牌桶
+    
+    额度用尽或收到429时暂停密钥，到重置时间后由密钥池自动放回，
+    避免持续向已被限流的密钥发送请求。
+    """
+    
+    def __init__(self):
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._stats = {"observed": 0, "suspensions": 0, "throttled_responses": 0}
+    
+    def observe(self, key: Any, status_code: int, headers: Mapping[str, str]) -> None:
+        """
+        根据上游响应校准密钥的令牌桶
+        
+        Args:
+            key: 使用的密钥
+            status_code: 响应状态码
+            headers: 响应头
+        """
+        if not settings.KEY_PACING_ENABLED:
+            return
+        
+        hint = parse_rate_limit_headers(headers)
+        now = time.monotonic()
+        
+        if status_code == 429 or hint.retry_after is not None:
+            self._stats["throttled_responses"] += 1
+            delay = hint.retry_after
+            if delay is None:
+                delay = hint.reset_after
+            if delay is None:
+                delay = settings.KEY_PACING_DEFAULT_COOLDOWN_SECONDS
+            self._buckets.pop(key.id, None)
+            self._suspend(key, delay)
+            return
+        
+        if hint.remaining is None:
+            return
+        
+        self._stats["observed"] += 1
+        reset_after = hint.reset_after
+        if reset_after is None:
+            reset_after = settings.KEY_PACING_DEFAULT_COOLDOWN_SECONDS
+        
+        self._buckets[key.id] = TokenBucket(tokens=hint.remaining, reset_at=now + reset_after)
+        if hint.remaining <= 0:
+            self._suspend(key, reset_after)
+    
+    def consume(self, key: Any) -> None:
+        """密钥被选中时扣减一个令牌，预计用尽时提前暂停到重置时间"""
+        bucket = self._buckets.get(key.id)
+        if bucket is None:
+            return
+        
+        now = time.monotonic()
+        if now >= bucket.reset_at:
+            del self._buckets[key.id]
+            return
+        
+        bucket.tokens -= 1
+        if bucket.tokens <= 0:
+            self._suspend(key, bucket.reset_at - now)
+    
+    def stats(self) -> Dict[str, Any]:
+        """运行指标"""
+        return {**self._stats, "tracked_keys": len(self._buckets)}
+    
+    def _suspend(self, key: Any, seconds: float) -> None:
+        self._stats["suspensions"] += 1
+        key_pools.suspend(key.upstream_id, key.id, seconds)
+        logger.info(f"密钥 {key.id} 额度耗尽，暂停 {seconds:.1f} 秒")
+
+
+key_pacer = KeyPacer()
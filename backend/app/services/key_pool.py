@@ -0,0 +1,382 @@
+from typing import Collection, Dict, List, Optional, Sequence, Tuple, Any
+import asyncio
+import random
+import time
+
+from app.core.config import settings
+from app.services.routing_cache import routing_cache, RoutingSnapshot
+from app.services.quota import quota_ledger
+from app.services.weighted_sampler import WeightedSampler
+
+# 不限额度的密钥在加权策略中的固定权重
+UNLIMITED_KEY_WEIGHT = 100
+
+
+def quota_available(key: Any) -> bool:
+    """检查密钥配额是否可用（以进程内配额账本为准）"""
+    return not quota_ledger.exhausted(key)
+
+
+def key_weight(key: Any) -> int:
+    """加权策略下的密钥权重：剩余配额越多权重越高"""
+    if not key.enable_quota or key.quota_total is None:
+        return UNLIMITED_KEY_WEIGHT
+    return max(1, key.quota_total - quota_ledger.used(key))
+
+
+class KeyPool:
+    """
+    单个上游的密钥池
+    
+    密钥按槽位存放在紧凑数组中，可用槽位单独维护一个数组，
+    增删均为O(1)（删除时与末尾交换），轮询游标在进程内全局共享。
+    每个槽位同时记录进行中的请求数以及延迟、错误率的指数加权平均（EWMA），
+    供负载感知的选择策略使用；加权策略的权重保存在树状数组中，按需增量更新。
+    各选择策略的 exclude 为不参与选择的密钥ID（如对冲请求需要换一个密钥）。
+    """
+    
+    def __init__(self, upstream_id: int, keys: Sequence[Any]):
+        self.upstream_id = upstream_id
+        self._keys: List[Any] = list(keys)
+        self._slots: Dict[int, int] = {key.id: slot for slot, key in enumerate(self._keys)}
+        self._available: List[int] = []
+        self._positions: List[int] = [-1] * len(self._keys)
+        self._cursor = -1
+        self._in_flight: List[int] = [0] * len(self._keys)
+        self._latency: List[float] = [0.0] * len(self._keys)
+        self._errors: List[float] = [0.0] * len(self._keys)
+        
+        for slot, key in enumerate(self._keys):
+            if quota_available(key):
+                self._add(slot)
+        
+        self._sampler = WeightedSampler([
+            key_weight(key) if self._positions[slot] >= 0 else 0
+            for slot, key in enumerate(self._keys)
+        ])
+    
+    def __len__(self) -> int:
+        return len(self._available)
+    
+    @property
+    def total(self) -> int:
+        return len(self._keys)
+    
+    def __contains__(self, key_id: int) -> bool:
+        slot = self._slots.get(key_id)
+        return slot is not None and self._positions[slot] >= 0
+    
+    def get(self, key_id: int) -> Optional[Any]:
+        """按ID获取密钥（无论是否可用）"""
+        slot = self._slots.get(key_id)
+        return self._keys[slot] if slot is not None else None
+    
+    def available_keys(self) -> List[Any]:
+        """当前可用的密钥列表（O(n)，仅用于管理和统计）"""
+        return [self._keys[slot] for slot in self._available]
+    
+    def next(self, exclude: Collection[int] = ()) -> Optional[Any]:
+        """轮询选择下一个可用密钥"""
+        for _ in range(len(self._available)):
+            self._cursor = (self._cursor + 1) % len(self._available)
+            key = self._keys[self._available[self._cursor]]
+            if key.id not in exclude:
+                return key
+        return None
+    
+    def random(self, exclude: Collection[int] = ()) -> Optional[Any]:
+        """随机选择一个可用密钥"""
+        candidates = self._candidates(exclude)
+        if not candidates:
+            return None
+        
+        return self._keys[random.choice(candidates)]
+    
+    def weighted(self, exclude: Collection[int] = ()) -> Optional[Any]:
+        """按剩余配额加权随机选择（O(log n)；抽中被排除的密钥时退化为随机选择）"""
+        slot = self._sampler.sample()
+        if slot is not None and self._keys[slot].id in exclude:
+            return self.random(exclude)
+        return self._keys[slot] if slot is not None else None
+    
+    def least_in_flight(self, exclude: Collection[int] = ()) -> Optional[Any]:
+        """选择进行中请求数最少的密钥（并列时从轮询游标之后开始取，避免总落在同一个密钥上）"""
+        count = len(self._available)
+        best_position = None
+        for step in range(1, count + 1):
+            position = (self._cursor + step) % count
+            if self._keys[self._available[position]].id in exclude:
+                continue
+            if (
+                best_position is None
+                or self._in_flight[self._available[position]]
+                < self._in_flight[self._available[best_position]]
+            ):
+                best_position = position
+        
+        if best_position is None:
+            return None
+        
+        self._cursor = best_position
+        return self._keys[self._available[best_position]]
+    
+    def lowest_cost(self, exclude: Collection[int] = ()) -> Optional[Any]:
+        """选择负载代价（EWMA延迟 × 进行中请求数 × 错误惩罚）最低的密钥"""
+        candidates = self._candidates(exclude)
+        if not candidates:
+            return None
+        
+        return self._keys[min(candidates, key=self._cost)]
+    
+    def p2c(self, exclude: Collection[int] = ()) -> Optional[Any]:
+        """二选一（power of two choices）：随机取两个密钥，选择负载代价较低的一个"""
+        candidates = self._candidates(exclude)
+        if not candidates:
+            return None
+        
+        if len(candidates) == 1:
+            return self._keys[candidates[0]]
+        
+        first, second = random.sample(candidates, 2)
+        return self._keys[first if self._cost(first) <= self._cost(second) else second]
+    
+    def _candidates(self, exclude: Collection[int]) -> List[int]:
+        """可用槽位（有排除项时才复制过滤，O(n)）"""
+        if not exclude:
+            return self._available
+        return [slot for slot in self._available if self._keys[slot].id not in exclude]
+    
+    def acquire(self, key_id: int) -> None:
+        """记录一次开始的请求"""
+        slot = self._slots.get(key_id)
+        if slot is not None:
+            self._in_flight[slot] += 1
+    
+    def report(self, key_id: int, latency_ms: Optional[int], failed: bool) -> None:
+        """
+        记录一次结束的请求并更新EWMA
+        
+        Args:
+            key_id: 密钥ID
+            latency_ms: 请求延迟（毫秒），为None时只更新错误率
+            failed: 是否失败（传输错误、429或5xx）
+        """
+        slot = self._slots.get(key_id)
+        if slot is None:
+            return
+        
+        alpha = settings.KEY_EWMA_ALPHA
+        self._in_flight[slot] = max(0, self._in_flight[slot] - 1)
+        if latency_ms is not None:
+            self._latency[slot] += alpha * (latency_ms - self._latency[slot])
+        self._errors[slot] += alpha * ((1.0 if failed else 0.0) - self._errors[slot])
+    
+    def load(self, key_id: int) -> Dict[str, float]:
+        """密钥的负载指标"""
+        slot = self._slots[key_id]
+        return {
+            "in_flight": self._in_flight[slot],
+            "latency_ms": round(self._latency[slot], 1),
+            "error_rate": round(self._errors[slot], 3),
+        }
+    
+    def mark_unavailable(self, key_id: int) -> bool:
+        """将密钥移出可用集合，返回是否发生变化"""
+        slot = self._slots.get(key_id)
+        if slot is None or self._positions[slot] < 0:
+            return False
+        
+        position = self._positions[slot]
+        last_slot = self._available.pop()
+        if last_slot != slot:
+            self._available[position] = last_slot
+            self._positions[last_slot] = position
+        self._positions[slot] = -1
+        self._sampler.update(slot, 0)
+        return True
+    
+    def mark_available(self, key_id: int) -> bool:
+        """将密钥放回可用集合，返回是否发生变化"""
+        slot = self._slots.get(key_id)
+        if slot is None or self._positions[slot] >= 0:
+            return False
+        
+        self._add(slot)
+        self._sampler.update(slot, key_weight(self._keys[slot]))
+        return True
+    
+    def refresh(self, key_id: int) -> None:
+        """密钥用量变化后更新其加权权重"""
+        slot = self._slots.get(key_id)
+        if slot is not None and self._positions[slot] >= 0:
+            self._sampler.update(slot, key_weight(self._keys[slot]))
+    
+    def update_key(self, key: Any) -> None:
+        """原地更新密钥数据（如配额变化），并按配额刷新可用状态"""
+        slot = self._slots.get(key.id)
+        if slot is None:
+            return
+        
+        self._keys[slot] = key
+        if quota_available(key):
+            self.mark_available(key.id)
+            self.refresh(key.id)
+        else:
+            self.mark_unavailable(key.id)
+    
+    def inherit(self, other: "KeyPool") -> None:
+        """沿用旧密钥池的游标和负载指标，避免快照重建后状态归零"""
+        if self._available:
+            self._cursor = other._cursor % len(self._available)
+        
+        for key_id, slot in self._slots.items():
+            old_slot = other._slots.get(key_id)
+            if old_slot is not None:
+                self._in_flight[slot] = other._in_flight[old_slot]
+                self._latency[slot] = other._latency[old_slot]
+                self._errors[slot] = other._errors[old_slot]
+    
+    def in_flight(self) -> int:
+        """进行中的请求总数"""
+        return sum(self._in_flight)
+    
+    def _cost(self, slot: int) -> float:
+        return (
+            (self._latency[slot] + 1.0)
+            * (self._in_flight[slot] + 1)
+            * (1.0 + settings.KEY_ERROR_PENALTY * self._errors[slot])
+        )
+    
+    def _add(self, slot: int) -> None:
+        self._positions[slot] = len(self._available)
+        self._available.append(slot)
+
+
+class KeyPoolRegistry:
+    """
+    进程级密钥池注册表 - 跟随路由快照惰性重建，状态变化时原地更新
+    
+    暂停的密钥（如上游限流）单独记录截止时间，密钥池重建后仍保持暂停，
+    到期后由事件循环定时器自动放回。
+    """
+    
+    def __init__(self):
+        self._pools: Dict[int, KeyPool] = {}
+        self._stale: Dict[int, KeyPool] = {}
+        self._snapshot: Optional[RoutingSnapshot] = None
+        self._suspended: Dict[Tuple[int, int], float] = {}
+        self._timers: Dict[Tuple[int, int], asyncio.TimerHandle] = {}
+    
+    def get(self, upstream_id: int) -> KeyPool:
+        """获取上游的密钥池（路由快照替换后自动重建）"""
+        snapshot = routing_cache.snapshot
+        if snapshot is not self._snapshot:
+            self._stale, self._pools = self._pools, {}
+            self._snapshot = snapshot
+        
+        pool = self._pools.get(upstream_id)
+        if pool is None:
+            pool = KeyPool(upstream_id, snapshot.active_keys(upstream_id))
+            stale = self._stale.pop(upstream_id, None)
+            if stale is not None:
+                pool.inherit(stale)
+            self._apply_suspensions(pool)
+            self._pools[upstream_id] = pool
+        
+        return pool
+    
+    def suspend(self, upstream_id: int, key_id: int, seconds: float) -> None:
+        """
+        暂停密钥一段时间，到期后自动放回密钥池
+        
+        Args:
+            upstream_id: 上游API ID
+            key_id: 密钥ID
+            seconds: 暂停秒数（已有更晚的截止时间时保持不变）
+        """
+        entry = (upstream_id, key_id)
+        deadline = time.monotonic() + max(0.0, seconds)
+        if self._suspended.get(entry, 0.0) >= deadline:
+            return
+        
+        self._suspended[entry] = deadline
+        self.get(upstream_id).mark_unavailable(key_id)
+        
+        timer = self._timers.pop(entry, None)
+        if timer is not None:
+            timer.cancel()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._timers[entry] = loop.call_later(max(0.0, seconds), self._resume, upstream_id, key_id)
+    
+    def is_suspended(self, upstream_id: int, key_id: int) -> bool:
+        """密钥是否处于暂停中"""
+        deadline = self._suspended.get((upstream_id, key_id))
+        return deadline is not None and deadline > time.monotonic()
+    
+    def next_resume_in(self, upstream_id: int) -> Optional[float]:
+        """上游最早恢复的暂停密钥还需等待的秒数，没有暂停密钥时返回None"""
+        deadlines = [
+            deadline for (entry_upstream, _), deadline in self._suspended.items()
+            if entry_upstream == upstream_id
+        ]
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - time.monotonic())
+    
+    def resume_due(self, upstream_id: int) -> None:
+        """放回已到期的暂停密钥（定时器未运行时由调用方主动触发）"""
+        now = time.monotonic()
+        for entry, deadline in list(self._suspended.items()):
+            if entry[0] == upstream_id and deadline <= now:
+                self._resume(*entry)
+    
+    def mark_unavailable(self, upstream_id: int, key_id: int) -> None:
+        """密钥被禁用、封禁或配额耗尽时立即移出密钥池"""
+        self.get(upstream_id).mark_unavailable(key_id)
+    
+    def mark_available(self, upstream_id: int, key_id: int) -> None:
+        """密钥恢复可用时放回密钥池"""
+        self.get(upstream_id).mark_available(key_id)
+    
+    def report(self, upstream_id: int, key_id: int, latency_ms: Optional[int], failed: bool) -> None:
+        """记录请求结果（更新进行中请求数和EWMA）"""
+        self.get(upstream_id).report(key_id, latency_ms, failed)
+    
+    def stats(self) -> Dict[int, Dict[str, int]]:
+        """各上游密钥池的可用/总/暂停密钥数及进行中请求数"""
+        suspended: Dict[int, int] = {}
+        for upstream_id, _ in self._suspended:
+            suspended[upstream_id] = suspended.get(upstream_id, 0) + 1
+        
+        return {
+            upstream_id: {
+                "available": len(pool),
+                "total": pool.total,
+                "suspended": suspended.get(upstream_id, 0),
+                "in_flight": pool.in_flight(),
+            }
+            for upstream_id, pool in self._pools.items()
+        }
+    
+    def _apply_suspensions(self, pool: KeyPool) -> None:
+        now = time.monotonic()
+        for (upstream_id, key_id), deadline in self._suspended.items():
+            if upstream_id == pool.upstream_id and deadline > now:
+                pool.mark_unavailable(key_id)
+    
+    def _resume(self, upstream_id: int, key_id: int) -> None:
+        entry = (upstream_id, key_id)
+        self._timers.pop(entry, None)
+        if self._suspended.pop(entry, None) is None:
+            return
+        
+        pool = self.get(upstream_id)
+        key = pool.get(key_id)
+        if key is not None and quota_available(key):
+            pool.mark_available(key_id)
+
+
+key_pools = KeyPoolRegistry()
@@ -1,131 +1,122 @@
-from typing import Optional, List
+from typing import Optional, Mapping, Collection
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from datetime import datetime
-import random
+import asyncio
 
-from app.models.api_key import APIKey, KeyStatus
-from app.models.upstream import Upstream
+from app.core.config import settings
+
+from app.models.api_key import APIKey
+from app.models.upstream import KeySelectionStrategy
+from app.services.key_pool import key_pools
+from app.services.quota import quota_ledger
+from app.services.key_pacing import key_pacer
+from app.services.rate_limiter import check_key_rate_limit
 
 
 class KeySelector:
-    """密钥选择器 - 实现智能密钥轮询和选择"""
+    """密钥选择器 - 实现智能密钥轮询和选择（状态保存在进程级密钥池中）"""
     
     def __init__(self, db: AsyncSession):
         self.db = db
-        self._last_selected_index = {}
     
     async def select_key(
         self,
         upstream_id: int,
-        strategy: str = "round_robin"
+        strategy: str = KeySelectionStrategy.ROUND_ROBIN,
+        exclude: Collection[int] = ()
     ) -> Optional[APIKey]:
         """
-        选择一个可用的API密钥
+        选择一个可用的API密钥，并为本次请求预留一次配额
+        
+        选中的密钥计入进行中请求数，请求结束后需调用 report_result；
+        超过自身频率限制的密钥会被暂停；所有密钥都因限流暂停时，最多等待 KEY_PACING_MAX_DEFER_MS 到最早恢复的密钥
         
         Args:
             upstream_id: 上游API ID
-            strategy: 选择策略 (round_robin, random, weighted)
+            strategy: 选择策略 (round_robin, random, weighted, least_in_flight, ewma, p2c)
+            exclude: 不参与选择的密钥ID（如对冲请求需要换一个密钥）
         
         Returns:
             可用的API密钥，如果没有可用密钥则返回None
         """
-        available_keys = await self._get_available_keys(upstream_id)
+        key = self._pick(upstream_id, strategy, exclude)
+        if key is not None:
+            return key
         
-        if not available_keys:
+        delay = key_pools.next_resume_in(upstream_id)
+        if delay is None or delay * 1000 > settings.KEY_PACING_MAX_DEFER_MS:
             return None
         
-        if strategy == "round_robin":
-            return self._round_robin_select(upstream_id, available_keys)
-        elif strategy == "random":
-            return self._random_select(available_keys)
-        elif strategy == "weighted":
-            return self._weighted_select(available_keys)
-        else:
-            return self._round_robin_select(upstream_id, available_keys)
+        await asyncio.sleep(delay)
+        key_pools.resume_due(upstream_id)
+        return self._pick(upstream_id, strategy, exclude)
     
-    async def _get_available_keys(self, upstream_id: int) -> List[APIKey]:
-        """获取所有可用的密钥（状态为ACTIVE且配额未用尽）"""
-        query = select(APIKey).where(
-            APIKey.upstream_id == upstream_id,
-            APIKey.status == KeyStatus.ACTIVE
-        )
+    def _pick(self, upstream_id: int, strategy: str, exclude: Collection[int] = ()) -> Optional[APIKey]:
+        """按策略选出一个可预留配额的密钥"""
+        pool = key_pools.get(upstream_id)
         
-        result = await self.db.execute(query)
-        keys = result.scalars().all()
-        
-        available = []
-        for key in keys:
-            if self._check_quota_available(key):
-                available.append(key)
+        for _ in range(len(pool)):
+            if strategy == KeySelectionStrategy.RANDOM:
+                key = pool.random(exclude)
+            elif strategy == KeySelectionStrategy.WEIGHTED:
+                key = pool.weighted(exclude)
+            elif strategy == KeySelectionStrategy.LEAST_IN_FLIGHT:
+                key = pool.least_in_flight(exclude)
+            elif strategy == KeySelectionStrategy.EWMA:
+                key = pool.lowest_cost(exclude)
+            elif strategy == KeySelectionStrategy.P2C:
+                key = pool.p2c(exclude)
+            else:
+                key = pool.next(exclude)
+            
+            if key is None:
+                return None
+            
+            if quota_ledger.reserve(key):
+                rate_limit = check_key_rate_limit(key)
+                if rate_limit is not None and not rate_limit.allowed:
+                    # 超过密钥自身的频率限制：暂停到窗口再次允许为止
+                    quota_ledger.release(key)
+                    key_pools.suspend(upstream_id, key.id, rate_limit.retry_after)
+                    continue
+                pool.acquire(key.id)
+                key_pacer.consume(key)
+                return key
+            
+            if quota_ledger.exhausted(key):
+                pool.mark_unavailable(key.id)
         
-        return available
+        return None
     
-    def _check_quota_available(self, key: APIKey) -> bool:
-        """检查密钥配额是否可用"""
-        if not key.enable_quota:
-            return True
-        
-        if key.quota_total is None:
-            return True
-        
-        if key.quota_used >= key.quota_total:
-            return False
+    def commit_usage(self, key: APIKey, reserved: bool = True) -> None:
+        """
+        提交一次密钥使用（收到上游响应时调用）
         
-        if key.quota_reset_at and datetime.now() >= key.quota_reset_at:
-            return True
+        仅更新进程内计数，由定时任务批量回写数据库；
+        配额刚好用尽时立即将密钥移出密钥池
         
-        return True
-    
-    def _round_robin_select(self, upstream_id: int, keys: List[APIKey]) -> APIKey:
-        """轮询选择策略"""
-        if upstream_id not in self._last_selected_index:
-            self._last_selected_index[upstream_id] = 0
+        Args:
+            reserved: 预留是否仍然有效（请求被取消、预留已释放时为False）
+        """
+        if quota_ledger.commit(key, reserved=reserved):
+            key_pools.mark_unavailable(key.upstream_id, key.id)
         else:
-            self._last_selected_index[upstream_id] = (
-                self._last_selected_index[upstream_id] + 1
-            ) % len(keys)
-        
-        return keys[self._last_selected_index[upstream_id]]
+            key_pools.get(key.upstream_id).refresh(key.id)
     
-    def _random_select(self, keys: List[APIKey]) -> APIKey:
-        """随机选择策略"""
-        return random.choice(keys)
+    def release_usage(self, key: APIKey) -> None:
+        """释放预留的配额（请求未到达上游时调用）"""
+        quota_ledger.release(key)
     
-    def _weighted_select(self, keys: List[APIKey]) -> APIKey:
-        """
-        加权选择策略
-        根据配额剩余量进行加权，剩余配额越多权重越高
-        """
-        weights = []
-        for key in keys:
-            if not key.enable_quota or key.quota_total is None:
-                weights.append(100)
-            else:
-                remaining = key.quota_total - key.quota_used
-                weight = max(1, remaining)
-                weights.append(weight)
-        
-        return random.choices(keys, weights=weights, k=1)[0]
+    def observe_response(self, key: APIKey, status_code: int, headers: Mapping[str, str]) -> None:
+        """根据上游限流响应头调整密钥节奏（收到响应头时调用）"""
+        key_pacer.observe(key, status_code, headers)
     
-    async def increment_usage(self, key_id: int) -> None:
-        """增加密钥使用次数"""
-        result = await self.db.execute(
-            select(APIKey).where(APIKey.id == key_id)
-        )
-        key = result.scalar_one_or_none()
+    def report_result(self, key: APIKey, latency_ms: Optional[int], failed: bool) -> None:
+        """
+        记录请求结果，供负载感知策略使用
         
-        if key and key.enable_quota:
-            key.quota_used += 1
-            key.last_used_at = datetime.now()
-            
-            if key.quota_total and key.quota_used >= key.quota_total:
-                if key.auto_disable_on_failure:
-                    key.status = KeyStatus.DISABLED
-                    if key.auto_enable_delay_hours:
-                        from datetime import timedelta
-                        key.auto_enable_at = datetime.now() + timedelta(
-                            hours=key.auto_enable_delay_hours
-                        )
-            
-            await self.db.commit()
+        Args:
+            key: 使用的密钥
+            latency_ms: 收到响应头的耗时（毫秒）
+            failed: 是否失败（传输错误、429或5xx）
+        """
+        key_pools.report(key.upstream_id, key.id, latency_ms, failed)
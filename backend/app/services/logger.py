@@ -1,9 +1,202 @@
 from typing import Dict, Any, Optional, List
+from collections import deque
 from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import datetime
+from sqlalchemy import insert
+import asyncio
+import logging
+import time
 
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
 from app.models.request_log import RequestLog
 
+logger = logging.getLogger(__name__)
+
+
+class OverflowPolicy:
+    """日志队列积压时的处理策略"""
+    BLOCK = "block"
+    DROP_BODIES = "drop_bodies"
+    SAMPLE = "sample"
+
+
+class RequestLogWriter:
+    """批量日志写入器 - 攒批后一次多行INSERT写入，避免逐条提交"""
+    
+    BODY_FIELDS = ("request_headers", "request_body", "response_headers", "response_body")
+    
+    def __init__(
+        self,
+        batch_size: int = 500,
+        flush_interval_ms: int = 200,
+        max_queue_size: int = 50000,
+        overflow_policy: str = OverflowPolicy.DROP_BODIES,
+        sample_rate: int = 10
+    ):
+        """
+        Args:
+            batch_size: 每批最多写入的行数
+            flush_interval_ms: 最长刷新间隔（毫秒）
+            max_queue_size: 队列容量上限，达到后丢弃记录（block策略下等待）
+            overflow_policy: 队列超过80%容量时的策略（block/drop_bodies/sample）
+            sample_rate: sample策略下每N条保留1条
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.soft_limit = int(max_queue_size * 0.8)
+        self.overflow_policy = overflow_policy
+        self.sample_rate = max(1, sample_rate)
+        self._queue: deque = deque()
+        self._wakeup = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._sample_counter = 0
+        self._stats = {
+            "enqueued": 0,
+            "written": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "dropped": 0,
+            "bodies_dropped": 0,
+            "sampled_out": 0,
+            "blocked": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+    
+    def start(self) -> None:
+        """启动后台刷新协程"""
+        if self.running:
+            return
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name="request-log-writer")
+        logger.info("批量日志写入器已启动")
+    
+    async def stop(self) -> None:
+        """停止并写入剩余日志（等待正在写入的批次完成，不取消，避免已出队的批次丢失）"""
+        if not self.running:
+            return
+        
+        self._stopping = True
+        self._wakeup.set()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        
+        while self._queue:
+            await self.flush()
+        logger.info("批量日志写入器已停止")
+    
+    async def enqueue(self, row: Dict[str, Any]) -> bool:
+        """
+        将一条日志放入队列
+        
+        Args:
+            row: request_logs 表的一行数据
+        
+        Returns:
+            是否被接收（被丢弃或采样掉时返回False）
+        """
+        depth = len(self._queue)
+        
+        if depth >= self.soft_limit:
+            if self.overflow_policy == OverflowPolicy.BLOCK:
+                while len(self._queue) >= self.max_queue_size:
+                    self._stats["blocked"] += 1
+                    self._wakeup.set()
+                    self._drained.clear()
+                    await self._drained.wait()
+            elif depth >= self.max_queue_size:
+                self._stats["dropped"] += 1
+                return False
+            elif self.overflow_policy == OverflowPolicy.SAMPLE:
+                self._sample_counter += 1
+                if self._sample_counter % self.sample_rate:
+                    self._stats["sampled_out"] += 1
+                    return False
+            else:
+                if any(row.get(name) is not None for name in self.BODY_FIELDS):
+                    self._stats["bodies_dropped"] += 1
+                    for name in self.BODY_FIELDS:
+                        row[name] = None
+        
+        self._queue.append(row)
+        self._stats["enqueued"] += 1
+        
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+        
+        return True
+    
+    async def flush(self) -> int:
+        """写入一批日志，返回写入行数"""
+        batch: List[Dict[str, Any]] = []
+        while self._queue and len(batch) < self.batch_size:
+            batch.append(self._queue.popleft())
+        
+        self._drained.set()
+        
+        if not batch:
+            return 0
+        
+        started = time.monotonic()
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(insert(RequestLog).values(batch))
+                await db.commit()
+        except Exception as e:
+            self._stats["flush_errors"] += 1
+            self._stats["dropped"] += len(batch)
+            logger.error(f"批量写入日志失败（{len(batch)} 条）: {e}")
+            return 0
+        
+        elapsed_ms = (time.monotonic() - started) * 1000
+        self._stats["written"] += len(batch)
+        self._stats["flushes"] += 1
+        self._stats["last_flush_ms"] = round(elapsed_ms, 2)
+        self._stats["max_flush_ms"] = round(max(self._stats["max_flush_ms"], elapsed_ms), 2)
+        self._stats["total_flush_ms"] += elapsed_ms
+        
+        return len(batch)
+    
+    def stats(self) -> Dict[str, Any]:
+        """运行指标（队列深度、刷新耗时、丢弃计数等）"""
+        stats = dict(self._stats)
+        flushes = stats.pop("total_flush_ms")
+        stats["avg_flush_ms"] = round(flushes / stats["flushes"], 2) if stats["flushes"] else 0
+        stats["queue_depth"] = len(self._queue)
+        stats["max_queue_size"] = self.max_queue_size
+        stats["overflow_policy"] = self.overflow_policy
+        return stats
+    
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            
+            while self._queue:
+                written = await self.flush()
+                if len(self._queue) < self.batch_size or not written:
+                    break
+
+
+request_log_writer = RequestLogWriter(
+    batch_size=settings.REQUEST_LOG_BATCH_SIZE,
+    flush_interval_ms=settings.REQUEST_LOG_FLUSH_INTERVAL_MS,
+    max_queue_size=settings.REQUEST_LOG_QUEUE_SIZE,
+    overflow_policy=settings.REQUEST_LOG_OVERFLOW_POLICY,
+    sample_rate=settings.REQUEST_LOG_SAMPLE_RATE
+)
+
 
 class RequestLogger:
     """请求日志记录器"""
@@ -26,10 +219,12 @@ class RequestLogger:
         client_ip: Optional[str] = None,
         error_message: Optional[str] = None,
         triggered_rules: Optional[List[int]] = None
-    ) -> RequestLog:
+    ) -> None:
         """
         记录请求日志
         
+        批量写入器运行时放入写入队列，否则直接写入当前会话
+        
         Args:
             upstream_id: 上游API ID
             api_key_id: 使用的API密钥ID
@@ -44,28 +239,26 @@ class RequestLogger:
             client_ip: 客户端IP
             error_message: 错误信息
             triggered_rules: 触发的规则ID列表
-        
-        Returns:
-            创建的日志记录
         """
-        log = RequestLog(
-            upstream_id=upstream_id,
-            api_key_id=api_key_id,
-            method=method,
-            path=path,
-            request_headers=request_headers,
-            request_body=request_body,
-            status_code=status_code,
-            response_headers=response_headers,
-            response_body=response_body,
-            latency_ms=latency_ms,
-            client_ip=client_ip,
-            error_message=error_message,
-            triggered_rules=triggered_rules or []
-        )
-        
-        self.db.add(log)
-        await self.db.commit()
-        await self.db.refresh(log)
+        row = {
+            "upstream_id": upstream_id,
+            "api_key_id": api_key_id,
+            "method": method,
+            "path": path,
+            "request_headers": request_headers,
+            "request_body": request_body,
+            "status_code": status_code,
+            "response_headers": response_headers,
+            "response_body": response_body,
+            "latency_ms": latency_ms,
+            "client_ip": client_ip,
+            "error_message": error_message,
+            "triggered_rules": triggered_rules or [],
+        }
         
-        return log
+        if request_log_writer.running:
+            await request_log_writer.enqueue(row)
+            return
+        
+        await self.db.execute(insert(RequestLog).values(row))
+        await self.db.commit()
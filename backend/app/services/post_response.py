@@ -0,0 +1,172 @@
+from typing import Dict, Any, Optional, List
+from dataclasses import dataclass, field
+import asyncio
+import logging
+import time
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.services.rule_engine import RuleEngine, ProxyResponse
+from app.services.logger import RequestLogger
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CompletionRecord:
+    """请求完成记录 - 响应返回后需要异步处理的最小信息"""
+    upstream_id: int
+    api_key_id: Optional[int]
+    method: str
+    path: str
+    client_ip: Optional[str]
+    latency_ms: Optional[int]
+    status_code: Optional[int] = None
+    response_headers: Optional[Dict[str, str]] = None
+    response_body: Optional[str] = None
+    request_headers: Optional[Dict[str, Any]] = None
+    request_body: Optional[str] = None
+    error_message: Optional[str] = None
+    log_response_body: bool = False
+    triggered_rules: List[int] = field(default_factory=list)
+    
+    @property
+    def succeeded(self) -> bool:
+        return self.error_message is None and self.status_code is not None
+
+
+class PostResponsePipeline:
+    """响应后处理管道 - 在后台完成规则评估和日志记录"""
+    
+    def __init__(self, max_queue_size: int = 10000, workers: int = 2):
+        self.max_queue_size = max_queue_size
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._stats = {
+            "submitted": 0,
+            "processed": 0,
+            "failed": 0,
+            "inline": 0,
+            "backpressure_waits": 0,
+            "backpressure_wait_ms": 0,
+        }
+    
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+    
+    def start(self) -> None:
+        """启动后台工作协程"""
+        if self.running:
+            return
+        
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"post-response-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"响应后处理管道已启动（{self.workers} 个工作协程）")
+    
+    async def submit(self, record: CompletionRecord) -> None:
+        """
+        提交完成记录；队列已满时等待（背压），管道未启动时直接处理
+        
+        Args:
+            record: 请求完成记录
+        """
+        self._stats["submitted"] += 1
+        
+        if not self.running:
+            self._stats["inline"] += 1
+            await self._process(record)
+            return
+        
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self._stats["backpressure_waits"] += 1
+            started = time.monotonic()
+            await self._queue.put(record)
+            self._stats["backpressure_wait_ms"] += int((time.monotonic() - started) * 1000)
+    
+    async def drain(self, timeout: float = 10.0) -> None:
+        """处理完队列中剩余记录后停止（应用关闭时调用）"""
+        if not self.running:
+            return
+        
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"响应后处理管道关闭超时，丢弃 {self._queue.qsize()} 条记录")
+        
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("响应后处理管道已停止")
+    
+    def stats(self) -> Dict[str, Any]:
+        """运行指标（队列深度、背压等待等）"""
+        return {
+            **self._stats,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue_size": self.max_queue_size,
+            "workers": len(self._tasks),
+        }
+    
+    async def _worker(self) -> None:
+        while True:
+            record = await self._queue.get()
+            try:
+                await self._process(record)
+            finally:
+                self._queue.task_done()
+    
+    async def _process(self, record: CompletionRecord) -> None:
+        """评估非同步规则并写入日志"""
+        try:
+            async with AsyncSessionLocal() as db:
+                triggered_rules = list(record.triggered_rules)
+                
+                if record.succeeded:
+                    response = ProxyResponse(
+                        status_code=record.status_code,
+                        headers=record.response_headers or {},
+                        body=record.response_body or "",
+                        latency_ms=record.latency_ms or 0
+                    )
+                    triggered_rules += await RuleEngine(db).evaluate_rules(
+                        record.upstream_id,
+                        record.api_key_id,
+                        response,
+                        synchronous=False
+                    )
+                
+                await RequestLogger(db).log_request(
+                    upstream_id=record.upstream_id,
+                    api_key_id=record.api_key_id,
+                    method=record.method,
+                    path=record.path,
+                    request_headers=record.request_headers,
+                    request_body=record.request_body,
+                    status_code=record.status_code,
+                    response_headers=record.response_headers if record.log_response_body else None,
+                    response_body=record.response_body if record.log_response_body else None,
+                    latency_ms=record.latency_ms,
+                    client_ip=record.client_ip,
+                    error_message=record.error_message,
+                    triggered_rules=triggered_rules
+                )
+            
+            self._stats["processed"] += 1
+            
+        except Exception as e:
+            self._stats["failed"] += 1
+            logger.error(f"响应后处理失败: {e}")
+
+
+post_response_pipeline = PostResponsePipeline(
+    max_queue_size=settings.POST_RESPONSE_QUEUE_SIZE,
+    workers=settings.POST_RESPONSE_WORKERS
+)
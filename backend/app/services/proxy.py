@@ -1,13 +1,100 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Union, List, Tuple, AsyncIterator, Callable, Awaitable
+import asyncio
 import httpx
 import time
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
 from app.models.upstream import Upstream
 from app.models.api_key import APIKey, KeyLocation
 from app.services.key_selector import KeySelector
 from app.services.rule_engine import RuleEngine, ProxyResponse
-from app.services.logger import RequestLogger
+from app.services.http_client import client_registry
+from app.services.request_body import RequestBody, StreamedRequestBody, body_for_log
+from app.services.post_response import post_response_pipeline, CompletionRecord
+from app.services.key_pool import key_pools
+from app.services.retry_budget import retry_budget
+from app.services.hedging import hedge_tracker
+from app.services.circuit_breaker import circuit_breakers, CircuitBreaker, BreakerState
+from app.services.bulkhead import bulkheads
+from app.services.fair_queue import client_policy
+from app.services.rate_limiter import client_identity
+from app.services.response_cache import response_cache, CachedResponse, CACHE_STATUS_HEADER
+from app.services.coalescer import request_coalescer, FanoutSubscriber
+from app.services.endpoint_selector import endpoint_selector
+from app.services.fallback import fallback_router, FALLBACK_HEADER
+from app.core.exceptions import ProxyError, NoAvailableKeyError, CircuitOpenError
+
+# 不透传给客户端的响应头（由网关重新计算或属于逐跳头）
+EXCLUDED_RESPONSE_HEADERS = {
+    "content-length",
+    "content-encoding",
+    "transfer-encoding",
+    "connection",
+    "keep-alive",
+}
+
+
+class StreamingProxyResponse:
+    """流式代理响应 - 边接收边转发，并保留有界副本供规则和日志使用"""
+    
+    def __init__(
+        self,
+        response: httpx.Response,
+        headers: Dict[str, str],
+        start_time: float,
+        on_complete: Callable[[ProxyResponse, Optional[str]], Awaitable[None]],
+        buffer_limit: int
+    ):
+        self.status_code = response.status_code
+        self.headers = headers
+        self._response = response
+        self._start_time = start_time
+        self._on_complete = on_complete
+        self._buffer_limit = buffer_limit
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+        self._error: Optional[str] = None
+        self._finish_callbacks: List[Callable[[], None]] = []
+    
+    def add_finish_callback(self, callback: Callable[[], None]) -> None:
+        """注册流结束后执行的回调（如释放隔离舱名额）"""
+        self._finish_callbacks.append(callback)
+    
+    async def iter_bytes(self) -> AsyncIterator[bytes]:
+        """逐块转发上游响应体"""
+        try:
+            async for chunk in self._response.aiter_bytes():
+                if self._buffered < self._buffer_limit:
+                    kept = chunk[:self._buffer_limit - self._buffered]
+                    self._buffer.append(kept)
+                    self._buffered += len(kept)
+                yield chunk
+        except Exception as e:
+            self._error = str(e)
+            raise
+        finally:
+            await self._response.aclose()
+    
+    async def finalize(self) -> None:
+        """流结束后（含客户端断开）释放连接并执行规则评估与日志记录"""
+        await self._response.aclose()
+        for callback in self._finish_callbacks:
+            callback()
+        self._finish_callbacks.clear()
+        
+        latency_ms = int((time.time() - self._start_time) * 1000)
+        body = b"".join(self._buffer).decode("utf-8", errors="replace")
+        
+        proxy_response = ProxyResponse(
+            status_code=self.status_code,
+            headers=dict(self._response.headers),
+            body=body,
+            latency_ms=latency_ms
+        )
+        
+        await self._on_complete(proxy_response, self._error)
 
 
 class ProxyService:
@@ -17,7 +104,6 @@ class ProxyService:
         self.db = db
         self.key_selector = KeySelector(db)
         self.rule_engine = RuleEngine(db)
-        self.logger = RequestLogger(db)
     
     async def forward_request(
         self,
@@ -25,98 +111,713 @@ class ProxyService:
         method: str,
         path: str,
         headers: Dict[str, str],
-        body: Optional[bytes],
+        body: RequestBody,
         client_ip: str
-    ) -> ProxyResponse:
+    ) -> Union[ProxyResponse, StreamingProxyResponse, FanoutSubscriber]:
         """
         转发HTTP请求到上游API
         
+        上游启用故障转移时，遇到配置的状态码或传输错误会立即换一个密钥重发，
+        触发的密钥进入冷却；尝试次数受上游配置和全局重试预算限制。
+        上游启用对冲时，幂等请求超过阈值仍未收到响应头会用另一个密钥并发重发。
+        上游熔断器打开时直接拒绝请求；上游配置了并发上限时，超出上限的请求
+        排队等待，队列已满或排队超时则拒绝。启用自适应并发时，
+        超时和429会收缩并发上限，延迟正常时逐步放宽。
+        上游启用响应缓存时，确定性请求优先返回缓存，命中时不选择密钥也不计量。
+        上游启用请求合并时，与进行中请求相同的请求直接共享其结果。
+        上游配置了降级链时，没有可用密钥、熔断或过载（以及延迟超过预算）
+        会按顺序改用备用上游，并按配置映射路径和请求头
+        
         Args:
             upstream: 上游API配置
             method: HTTP方法
             path: 请求路径
             headers: 请求头
-            body: 请求体
+            body: 请求体（字节或流式请求体）
             client_ip: 客户端IP
         
         Returns:
-            代理响应对象
+            代理响应对象；上游返回SSE/分块响应且上游启用流式转发时返回流式响应
+            （合并的请求返回分发流的订阅者）
+        
+        Raises:
+            NoAvailableKeyError: 上游没有可用的API密钥
+            CircuitOpenError: 上游熔断器处于打开状态
+            ServiceUnavailableError: 排队超时
+            TooManyRequestsError: 上游并发和等待队列已满
         """
-        api_key = await self.key_selector.select_key(upstream.id)
+        chain = fallback_router.chain(upstream)
+        for index, target in enumerate(chain):
+            is_last = index == len(chain) - 1
+            if not is_last and fallback_router.is_degraded(target.upstream):
+                fallback_router.record(target.upstream.id, "latency")
+                continue
+            
+            try:
+                result = await self._forward_upstream(
+                    target.upstream,
+                    method,
+                    target.rewrite_path(path),
+                    target.rewrite_headers(headers),
+                    body,
+                    client_ip
+                )
+            except ProxyError as e:
+                if is_last:
+                    raise
+                fallback_router.record(target.upstream.id, fallback_router.reason_for(e))
+                continue
+            
+            if index:
+                fallback_router.record(target.upstream.id, "served_as_fallback")
+                result.headers[FALLBACK_HEADER] = target.upstream.name
+            return result
+    
+    async def _forward_upstream(
+        self,
+        upstream: Upstream,
+        method: str,
+        path: str,
+        headers: Dict[str, str],
+        body: RequestBody,
+        client_ip: str
+    ) -> Union[ProxyResponse, StreamingProxyResponse, FanoutSubscriber]:
+        """向单个上游转发（不含降级），按配置合并相同请求"""
+        coalesce_key = request_coalescer.key_for(upstream, method, path, headers, body)
+        if coalesce_key is None:
+            return await self._serve(upstream, method, path, headers, body, client_ip)
         
-        if not api_key:
-            raise Exception("没有可用的API密钥")
+        return await request_coalescer.run(
+            upstream.id,
+            coalesce_key,
+            lambda: self._serve(upstream, method, path, headers, body, client_ip)
+        )
+    
+    async def _serve(
+        self,
+        upstream: Upstream,
+        method: str,
+        path: str,
+        headers: Dict[str, str],
+        body: RequestBody,
+        client_ip: str
+    ) -> Union[ProxyResponse, StreamingProxyResponse]:
+        """查找缓存，未命中时经熔断器和隔离舱转发"""
+        cache_key = response_cache.key_for(upstream, method, path, headers, body)
+        if cache_key is not None:
+            cached = await response_cache.get(upstream.id, cache_key, headers)
+            if cached is not None:
+                return self._cached_response(cached)
         
-        full_url = f"{upstream.base_url.rstrip('/')}/{path.lstrip('/')}"
+        breaker = circuit_breakers.for_upstream(upstream)
+        probe = breaker.acquire() if breaker is not None else 0
+        if probe is None:
+            raise CircuitOpenError(
+                f"上游API '{upstream.name}' 已熔断",
+                retry_after=breaker.retry_after()
+            )
         
-        modified_headers = self._prepare_headers(headers, api_key)
+        try:
+            result = await self._admit(upstream, method, path, headers, body, client_ip, breaker, probe)
+        finally:
+            if breaker is not None:
+                breaker.release(probe)
         
-        start_time = time.time()
+        if upstream.enable_response_cache:
+            if cache_key is not None and isinstance(result, ProxyResponse):
+                await response_cache.put(upstream, cache_key, result.status_code, result.headers, result.content)
+            result.headers[CACHE_STATUS_HEADER] = "MISS" if cache_key is not None else "BYPASS"
+        return result
+    
+    def _cached_response(self, cached: CachedResponse) -> ProxyResponse:
+        """将缓存条目转换为代理响应"""
+        headers = dict(cached.headers)
+        headers[CACHE_STATUS_HEADER] = "HIT"
+        headers["Age"] = str(int(time.time() - cached.stored_at))
+        return ProxyResponse(
+            status_code=cached.status_code,
+            headers=headers,
+            body=cached.content.decode("utf-8", errors="replace"),
+            latency_ms=0,
+            content=cached.content
+        )
+    
+    async def _admit(
+        self,
+        upstream: Upstream,
+        method: str,
+        path: str,
+        headers: Dict[str, str],
+        body: RequestBody,
+        client_ip: str,
+        breaker: Optional[CircuitBreaker],
+        probe: int = 0
+    ) -> Union[ProxyResponse, StreamingProxyResponse]:
+        """在上游隔离舱内转发请求；流式响应在流结束后才释放并发名额"""
+        bulkhead = bulkheads.for_upstream(upstream)
+        if bulkhead is None:
+            return await self._forward(upstream, method, path, headers, body, client_ip, breaker, probe)
         
+        if bulkhead.fair:
+            client_id = client_identity(upstream, headers, client_ip)
+            await bulkhead.acquire(client_id, **client_policy(upstream, client_id))
+        else:
+            await bulkhead.acquire()
         try:
-            response = await self._make_request(
-                method=method,
-                url=full_url,
-                headers=modified_headers,
-                body=body,
-                timeout=upstream.timeout,
-                retry_count=upstream.retry_count
-            )
+            result = await self._forward(upstream, method, path, headers, body, client_ip, breaker, probe)
+        except BaseException:
+            bulkhead.release()
+            raise
+        
+        if isinstance(result, StreamingProxyResponse):
+            result.add_finish_callback(bulkhead.release)
+        else:
+            bulkhead.release()
+        return result
+    
+    async def _forward(
+        self,
+        upstream: Upstream,
+        method: str,
+        path: str,
+        headers: Dict[str, str],
+        body: RequestBody,
+        client_ip: str,
+        breaker: Optional[CircuitBreaker],
+        probe: int = 0
+    ) -> Union[ProxyResponse, StreamingProxyResponse]:
+        """选择密钥和上游地址并发送请求，按故障转移策略换密钥（传输错误时同时换地址）重发"""
+        api_key = await self.key_selector.select_key(
+            upstream.id,
+            upstream.key_selection_strategy
+        )
+        
+        if not api_key:
+            raise NoAvailableKeyError(f"上游API '{upstream.name}' 没有可用的API密钥", retry_after=1)
+        
+        endpoint = endpoint_selector.select(upstream)
+        
+        failover_enabled = bool(upstream.enable_failover)
+        failover_codes = set(upstream.failover_status_codes or []) if failover_enabled else set()
+        attempts = 1 + ((upstream.failover_max_attempts or 0) if failover_enabled else 0)
+        retry_budget.record_request()
+        
+        for attempt in range(attempts):
+            can_failover = attempt < attempts - 1
+            start_time = time.time()
+            full_url = f"{endpoint.url}/{path.lstrip('/')}"
             
-            latency_ms = int((time.time() - start_time) * 1000)
+            try:
+                api_key, response = await self._dispatch(
+                    upstream, api_key, method, path, full_url, headers, body, client_ip,
+                    retry_count=0 if failover_enabled else None
+                )
+            except asyncio.CancelledError:
+                # 客户端断开：归还地址和密钥的进行中计数，不计入失败
+                endpoint_selector.release(endpoint)
+                self.key_selector.report_result(api_key, None, failed=False)
+                raise
+            except Exception as e:
+                latency_ms = int((time.time() - start_time) * 1000)
+                endpoint_selector.report(endpoint, latency_ms, failed=True)
+                self.key_selector.report_result(api_key, latency_ms, failed=True)
+                self._record_breaker(upstream, api_key, breaker, None, probe)
+                if isinstance(e, httpx.TimeoutException):
+                    bulkheads.record(upstream.id, latency_ms, dropped=True)
+                
+                await self._record_failure(
+                    upstream, api_key, method, path, headers, body,
+                    client_ip, latency_ms, str(e)
+                )
+                
+                # 多地址上游的传输错误归因于地址：换地址重发，密钥不冷却
+                multi_endpoint = endpoint_selector.has_alternative(upstream, endpoint)
+                next_key = (
+                    await self._failover_key(upstream, api_key, suspend=not multi_endpoint)
+                    if can_failover else None
+                )
+                if next_key is None:
+                    raise
+                api_key = next_key
+                endpoint = endpoint_selector.select(upstream, exclude=(endpoint.url,))
+                continue
             
-            proxy_response = ProxyResponse(
-                status_code=response.status_code,
-                headers=dict(response.headers),
-                body=response.text,
-                latency_ms=latency_ms
-            )
+            header_latency_ms = int((time.time() - start_time) * 1000)
+            endpoint_selector.report(endpoint, header_latency_ms, failed=False)
+            if upstream.enable_hedging:
+                hedge_tracker.record_latency(upstream.id, header_latency_ms)
+            self._record_breaker(upstream, api_key, breaker, response.status_code, probe)
+            if response.status_code < 500:
+                bulkheads.record(upstream.id, header_latency_ms, dropped=response.status_code == 429)
             
-            await self.key_selector.increment_usage(api_key.id)
+            if can_failover and response.status_code in failover_codes:
+                next_key = await self._failover_key(upstream, api_key)
+                if next_key is not None:
+                    try:
+                        await self._complete_response(
+                            upstream, api_key, method, path, headers, body, client_ip,
+                            response, start_time, header_latency_ms, allow_stream=False
+                        )
+                    except Exception:
+                        # 读取失败已在 _complete_response 中记录，继续换密钥重发
+                        pass
+                    api_key = next_key
+                    endpoint = endpoint_selector.select(upstream)
+                    continue
             
-            triggered_rules = await self.rule_engine.evaluate_rules(
-                upstream.id,
-                api_key.id,
-                proxy_response
+            return await self._complete_response(
+                upstream, api_key, method, path, headers, body, client_ip,
+                response, start_time, header_latency_ms
             )
+    
+    def _record_breaker(
+        self,
+        upstream: Upstream,
+        api_key: APIKey,
+        breaker: Optional[CircuitBreaker],
+        status_code: Optional[int],
+        probe: int = 0
+    ) -> None:
+        """
+        更新上游和密钥的熔断器
+        
+        上游熔断只统计传输错误和5xx；密钥熔断还统计429，打开时将密钥暂停到半开
+        
+        Args:
+            status_code: 响应状态码，传输错误时为None
+            probe: 上游熔断器 acquire 返回的探测轮次
+        """
+        if breaker is not None:
+            if status_code is None or status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success(probe)
+        
+        key_breaker = circuit_breakers.for_key(upstream, api_key.id)
+        if key_breaker is None:
+            return
+        
+        if status_code is None or self._is_failure_status(status_code):
+            key_breaker.record_failure()
+            if key_breaker.state == BreakerState.OPEN:
+                key_pools.suspend(upstream.id, api_key.id, key_breaker.retry_after())
+        else:
+            key_breaker.record_success()
+    
+    async def _dispatch(
+        self,
+        upstream: Upstream,
+        api_key: APIKey,
+        method: str,
+        path: str,
+        url: str,
+        headers: Dict[str, str],
+        body: RequestBody,
+        client_ip: str,
+        retry_count: Optional[int] = None
+    ) -> Tuple[APIKey, httpx.Response]:
+        """发送一次尝试；满足对冲条件时走对冲发送，返回实际使用的密钥和响应"""
+        delay = None
+        if hedge_tracker.should_hedge(upstream, method) and not isinstance(body, StreamedRequestBody):
+            delay = hedge_tracker.delay_for(upstream)
+        
+        if delay is None:
+            return api_key, await self._send(
+                upstream, api_key, method, url, headers, body, retry_count
+            )
+        
+        return await self._send_hedged(
+            upstream, api_key, method, path, url, headers, body, client_ip,
+            retry_count, delay
+        )
+    
+    async def _send_hedged(
+        self,
+        upstream: Upstream,
+        api_key: APIKey,
+        method: str,
+        path: str,
+        url: str,
+        headers: Dict[str, str],
+        body: RequestBody,
+        client_ip: str,
+        retry_count: Optional[int],
+        delay: float
+    ) -> Tuple[APIKey, httpx.Response]:
+        """
+        对冲发送：等待 delay 秒仍无响应头时，用另一个密钥再发一次，先返回者胜出
+        
+        落后的请求被取消；两次尝试都计入配额和日志。主请求和对冲请求都失败时抛出主请求的异常
+        """
+        start_time = time.time()
+        primary = asyncio.create_task(
+            self._send(upstream, api_key, method, url, headers, body, retry_count)
+        )
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return api_key, primary.result()
             
-            await self.logger.log_request(
-                upstream_id=upstream.id,
-                api_key_id=api_key.id,
-                method=method,
-                path=path,
-                request_headers=headers if upstream.log_request_body else None,
-                request_body=body.decode() if body and upstream.log_request_body else None,
-                status_code=response.status_code,
-                response_headers=dict(response.headers) if upstream.log_response_body else None,
-                response_body=response.text if upstream.log_response_body else None,
-                latency_ms=latency_ms,
-                client_ip=client_ip,
-                triggered_rules=triggered_rules
+            hedge_key = await self.key_selector.select_key(
+                upstream.id,
+                upstream.key_selection_strategy,
+                exclude={api_key.id}
             )
+            if hedge_key is None:
+                return api_key, await primary
             
-            return proxy_response
+            hedge_tracker.record(upstream.id, "hedged")
+            hedge = asyncio.create_task(
+                self._send(upstream, hedge_key, method, url, headers, body, retry_count)
+            )
+            tasks.append(hedge)
+            keys = {primary: api_key, hedge: hedge_key}
             
+            pending = {primary, hedge}
+            winner = None
+            primary_error = None
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    error = task.exception()
+                    if error is None and winner is None:
+                        winner = task
+                    elif error is None:
+                        await self._discard_hedge_loser(
+                            upstream, keys[task], method, path, headers, body,
+                            client_ip, start_time, task.result()
+                        )
+                    elif task is primary:
+                        primary_error = error
+                    else:
+                        await self._record_attempt_failure(
+                            upstream, keys[task], method, path, headers, body,
+                            client_ip, start_time, str(error)
+                        )
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            # 已结束的对冲请求已报告过结果；进行中的由这里归还进行中计数
+            if len(tasks) > 1 and not tasks[1].done():
+                self.key_selector.report_result(hedge_key, None, failed=False)
+            raise
+        
+        for task in pending:
+            task.cancel()
+            # 取消前刚好完成的一方仍会返回响应或异常，按实际结果处理
+            result = (await asyncio.gather(task, return_exceptions=True))[0]
+            if isinstance(result, asyncio.CancelledError):
+                hedge_tracker.record(upstream.id, "cancelled")
+                await self._discard_hedge_loser(
+                    upstream, keys[task], method, path, headers, body,
+                    client_ip, start_time, None
+                )
+            elif isinstance(result, BaseException):
+                await self._record_attempt_failure(
+                    upstream, keys[task], method, path, headers, body,
+                    client_ip, start_time, str(result)
+                )
+            else:
+                await self._discard_hedge_loser(
+                    upstream, keys[task], method, path, headers, body,
+                    client_ip, start_time, result
+                )
+        
+        if winner is None:
+            raise primary_error
+        
+        if primary_error is not None:
+            await self._record_attempt_failure(
+                upstream, api_key, method, path, headers, body,
+                client_ip, start_time, str(primary_error)
+            )
+        
+        hedge_tracker.record(upstream.id, "hedge_wins" if winner is hedge else "primary_wins")
+        return keys[winner], winner.result()
+    
+    async def _discard_hedge_loser(
+        self,
+        upstream: Upstream,
+        api_key: APIKey,
+        method: str,
+        path: str,
+        headers: Dict[str, str],
+        body: RequestBody,
+        client_ip: str,
+        start_time: float,
+        response: Optional[httpx.Response]
+    ) -> None:
+        """丢弃对冲中落后的一方：已发出的请求计入配额，并记录日志"""
+        latency_ms = int((time.time() - start_time) * 1000)
+        
+        if response is None:
+            # 请求已发出但被取消：_send 已释放预留，这里只计入已用量
+            self.key_selector.commit_usage(api_key, reserved=False)
+            self.key_selector.report_result(api_key, None, failed=False)
+            message = "对冲请求落后，已取消"
+        else:
+            await response.aclose()
+            self.key_selector.report_result(
+                api_key,
+                latency_ms,
+                failed=self._is_failure_status(response.status_code)
+            )
+            message = f"对冲请求落后，已丢弃响应（状态码 {response.status_code}）"
+        
+        await self._record_failure(
+            upstream, api_key, method, path, headers, body,
+            client_ip, latency_ms, message
+        )
+    
+    async def _record_attempt_failure(
+        self,
+        upstream: Upstream,
+        api_key: APIKey,
+        method: str,
+        path: str,
+        headers: Dict[str, str],
+        body: RequestBody,
+        client_ip: str,
+        start_time: float,
+        error_message: str
+    ) -> None:
+        """记录对冲中失败的一次尝试"""
+        latency_ms = int((time.time() - start_time) * 1000)
+        self.key_selector.report_result(api_key, latency_ms, failed=True)
+        await self._record_failure(
+            upstream, api_key, method, path, headers, body,
+            client_ip, latency_ms, error_message
+        )
+    
+    async def _send(
+        self,
+        upstream: Upstream,
+        api_key: APIKey,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        body: RequestBody,
+        retry_count: Optional[int] = None
+    ) -> httpx.Response:
+        """使用指定密钥发送请求；收到响应头时提交配额，失败或被取消时释放预留"""
+        try:
+            response = await self._make_request(
+                upstream=upstream,
+                method=method,
+                url=url,
+                headers=self._prepare_headers(headers, api_key),
+                body=body,
+                retry_count=retry_count
+            )
+        except BaseException:
+            # 客户端断开或对冲落后被取消时同样释放，否则预留要到过期才归还
+            self.key_selector.release_usage(api_key)
+            raise
+        
+        self.key_selector.commit_usage(api_key)
+        self.key_selector.observe_response(api_key, response.status_code, response.headers)
+        return response
+    
+    async def _failover_key(
+        self,
+        upstream: Upstream,
+        failed_key: APIKey,
+        suspend: bool = True
+    ) -> Optional[APIKey]:
+        """
+        让触发故障转移的密钥进入冷却，并选出另一个密钥
+        
+        Args:
+            suspend: 是否让失败的密钥进入冷却（故障归因于上游地址时不冷却）
+        
+        Returns:
+            新密钥；重试预算耗尽或没有其他可用密钥时返回None
+        """
+        if suspend:
+            key_pools.suspend(upstream.id, failed_key.id, upstream.failover_cooldown_seconds or 0)
+        
+        if not retry_budget.can_retry():
+            return None
+        
+        next_key = await self.key_selector.select_key(
+            upstream.id,
+            upstream.key_selection_strategy
+        )
+        if next_key is None:
+            return None
+        
+        retry_budget.record_retry()
+        return next_key
+    
+    async def _complete_response(
+        self,
+        upstream: Upstream,
+        api_key: APIKey,
+        method: str,
+        path: str,
+        headers: Dict[str, str],
+        body: RequestBody,
+        client_ip: str,
+        response: httpx.Response,
+        start_time: float,
+        header_latency_ms: int,
+        allow_stream: bool = True
+    ) -> Union[ProxyResponse, StreamingProxyResponse]:
+        """读取（或包装为流式）上游响应，并记录结果"""
+        if allow_stream and upstream.stream_response and self._is_streaming_response(response):
+            return self._stream_response(
+                upstream, api_key, method, path, headers, body,
+                client_ip, response, start_time, header_latency_ms
+            )
+        
+        try:
+            try:
+                await response.aread()
+            finally:
+                await response.aclose()
         except Exception as e:
             latency_ms = int((time.time() - start_time) * 1000)
+            self.key_selector.report_result(api_key, latency_ms, failed=True)
             
-            await self.logger.log_request(
-                upstream_id=upstream.id,
-                api_key_id=api_key.id,
-                method=method,
-                path=path,
-                request_headers=headers,
-                request_body=body.decode() if body else None,
-                status_code=None,
-                response_headers=None,
-                response_body=None,
-                latency_ms=latency_ms,
-                client_ip=client_ip,
-                error_message=str(e),
-                triggered_rules=[]
+            await self._record_failure(
+                upstream, api_key, method, path, headers, body,
+                client_ip, latency_ms, str(e)
             )
             
             raise
+        
+        latency_ms = int((time.time() - start_time) * 1000)
+        self.key_selector.report_result(
+            api_key,
+            header_latency_ms,
+            failed=self._is_failure_status(response.status_code)
+        )
+        
+        proxy_response = ProxyResponse(
+            status_code=response.status_code,
+            headers=self._filter_response_headers(response.headers),
+            body=response.text,
+            latency_ms=latency_ms,
+            content=response.content
+        )
+        
+        await self._record_response(
+            upstream, api_key, method, path, headers, body,
+            client_ip, proxy_response
+        )
+        
+        return proxy_response
+    
+    def _stream_response(
+        self,
+        upstream: Upstream,
+        api_key: APIKey,
+        method: str,
+        path: str,
+        headers: Dict[str, str],
+        body: RequestBody,
+        client_ip: str,
+        response: httpx.Response,
+        start_time: float,
+        header_latency_ms: int
+    ) -> StreamingProxyResponse:
+        """包装流式响应；流结束后在独立会话中完成规则和日志"""
+        async def on_complete(proxy_response: ProxyResponse, error: Optional[str]) -> None:
+            self.key_selector.report_result(
+                api_key,
+                header_latency_ms,
+                failed=bool(error) or self._is_failure_status(proxy_response.status_code)
+            )
+            
+            async with AsyncSessionLocal() as db:
+                service = ProxyService(db)
+                if error:
+                    await service._record_failure(
+                        upstream, api_key, method, path, headers, body,
+                        client_ip, proxy_response.latency_ms, error
+                    )
+                else:
+                    await service._record_response(
+                        upstream, api_key, method, path, headers, body,
+                        client_ip, proxy_response
+                    )
+        
+        return StreamingProxyResponse(
+            response=response,
+            headers=self._filter_response_headers(response.headers),
+            start_time=start_time,
+            on_complete=on_complete,
+            buffer_limit=settings.STREAM_TEE_BUFFER_BYTES
+        )
+    
+    async def _record_response(
+        self,
+        upstream: Upstream,
+        api_key: APIKey,
+        method: str,
+        path: str,
+        headers: Dict[str, str],
+        body: RequestBody,
+        client_ip: str,
+        proxy_response: ProxyResponse
+    ) -> None:
+        """
+        记录成功收到的上游响应
+        
+        同步规则在此立即评估（可影响下一次密钥选择），
+        计量、其余规则和日志交给响应后处理管道异步完成
+        """
+        triggered_rules = await self.rule_engine.evaluate_rules(
+            upstream.id,
+            api_key.id,
+            proxy_response,
+            synchronous=True
+        )
+        
+        await post_response_pipeline.submit(CompletionRecord(
+            upstream_id=upstream.id,
+            api_key_id=api_key.id,
+            method=method,
+            path=path,
+            client_ip=client_ip,
+            latency_ms=proxy_response.latency_ms,
+            status_code=proxy_response.status_code,
+            response_headers=proxy_response.headers,
+            response_body=proxy_response.body,
+            request_headers=headers if upstream.log_request_body else None,
+            request_body=(
+                body_for_log(body, settings.REQUEST_BODY_LOG_MAX_BYTES)
+                if upstream.log_request_body else None
+            ),
+            log_response_body=bool(upstream.log_response_body),
+            triggered_rules=triggered_rules
+        ))
+    
+    async def _record_failure(
+        self,
+        upstream: Upstream,
+        api_key: APIKey,
+        method: str,
+        path: str,
+        headers: Dict[str, str],
+        body: RequestBody,
+        client_ip: str,
+        latency_ms: int,
+        error_message: str
+    ) -> None:
+        """记录请求失败"""
+        await post_response_pipeline.submit(CompletionRecord(
+            upstream_id=upstream.id,
+            api_key_id=api_key.id,
+            method=method,
+            path=path,
+            client_ip=client_ip,
+            latency_ms=latency_ms,
+            request_headers=headers,
+            request_body=body_for_log(body, settings.REQUEST_BODY_LOG_MAX_BYTES),
+            error_message=error_message
+        ))
     
     def _prepare_headers(
         self,
@@ -134,35 +835,64 @@ class ProxyService:
         
         return headers
     
+    def _is_streaming_response(self, response: httpx.Response) -> bool:
+        """判断上游响应是否为SSE或无长度的分块响应"""
+        content_type = response.headers.get("content-type", "")
+        if content_type.startswith("text/event-stream"):
+            return True
+        
+        return (
+            "content-length" not in response.headers
+            and response.headers.get("transfer-encoding", "").lower() == "chunked"
+        )
+    
+    def _is_failure_status(self, status_code: int) -> bool:
+        """被限流或上游错误的响应计入密钥错误率"""
+        return status_code == 429 or status_code >= 500
+    
+    def _filter_response_headers(self, headers: httpx.Headers) -> Dict[str, str]:
+        """过滤逐跳头及需要网关重新计算的响应头"""
+        return {
+            name: value
+            for name, value in headers.items()
+            if name.lower() not in EXCLUDED_RESPONSE_HEADERS
+        }
+    
     async def _make_request(
         self,
+        upstream: Upstream,
         method: str,
         url: str,
         headers: Dict[str, str],
-        body: Optional[bytes],
-        timeout: int,
-        retry_count: int
+        body: RequestBody,
+        retry_count: Optional[int] = None
     ) -> httpx.Response:
-        """发送HTTP请求（支持重试）"""
+        """
+        发送HTTP请求（支持重试，复用上游连接池），收到响应头即返回
+        
+        retry_count 为None时使用上游配置的重试次数
+        """
         last_error = None
+        if retry_count is None:
+            retry_count = upstream.retry_count or 0
+        client = client_registry.get_client(upstream)
         
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            for attempt in range(retry_count + 1):
-                try:
-                    response = await client.request(
-                        method=method,
-                        url=url,
-                        headers=headers,
-                        content=body,
-                        follow_redirects=True
-                    )
-                    return response
-                    
-                except Exception as e:
-                    last_error = e
-                    if attempt < retry_count:
-                        await self._exponential_backoff(attempt)
-                    continue
+        for attempt in range(retry_count + 1):
+            try:
+                request = client.build_request(
+                    method=method,
+                    url=url,
+                    headers=headers,
+                    content=body
+                )
+                response = await client.send(request, stream=True)
+                return response
+                
+            except Exception as e:
+                last_error = e
+                if attempt < retry_count:
+                    await self._exponential_backoff(attempt)
+                continue
         
         raise last_error or Exception("请求失败")
     
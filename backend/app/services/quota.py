@@ -0,0 +1,222 @@
+from typing import Dict, Any, Optional, Mapping, Set
+from datetime import datetime, timedelta
+import logging
+
+from sqlalchemy import update, bindparam
+
+from app.core.database import AsyncSessionLocal
+from app.models.api_key import APIKey, KeyStatus
+from app.services.routing_cache import routing_cache
+from app.services.counter_backend import CounterBackend, LocalCounterBackend, counter_backend
+
+logger = logging.getLogger(__name__)
+
+api_keys_table = APIKey.__table__
+
+# 进程异常退出时遗留的预留最多保留的秒数（每次预留或释放时刷新）
+RESERVATION_TTL_SECONDS = 600
+
+
+def used_key(key_id: int) -> str:
+    return f"quota:{key_id}:used"
+
+
+def reserved_key(key_id: int) -> str:
+    return f"quota:{key_id}:reserved"
+
+
+class QuotaLedger:
+    """
+    配额账本 - 已用量和预留量保存在计数后端，定期批量回写数据库
+    
+    请求发出前先预留(reserve)，收到响应后提交(commit)，传输失败则释放(release)。
+    已用量 + 预留量不会超过 quota_total；多个工作进程共用同一计数后端时跨进程同样成立。
+    已用量首次访问时以数据库中的 quota_used 为初值；各进程只回写自己提交的增量，
+    按批次以 quota_used = quota_used + n 写回，无需加载行。
+    """
+    
+    def __init__(self, backend: Optional[CounterBackend] = None):
+        self.backend = backend or LocalCounterBackend()
+        self._pending: Dict[int, int] = {}
+        self._reserved: Dict[int, int] = {}
+        self._seen: Set[int] = set()
+        self._last_used: Dict[int, datetime] = {}
+        self._to_disable: Dict[int, Optional[datetime]] = {}
+        self._stats = {"flushes": 0, "flushed_keys": 0, "flush_errors": 0, "rejected": 0}
+    
+    def _seed(self, counters: CounterBackend, key: Any) -> None:
+        """共享计数中还没有该密钥时以数据库中的已用量为初值"""
+        counters.setnx(used_key(key.id), key.quota_used or 0)
+        self._seen.add(key.id)
+    
+    def used(self, key: Any) -> int:
+        """已用量（含未回写部分，不含预留）"""
+        with self.backend.transaction() as counters:
+            self._seed(counters, key)
+            return counters.get(used_key(key.id))
+    
+    def available(self, key: Any) -> bool:
+        """密钥是否还有未被使用或预留的配额"""
+        if not key.enable_quota or key.quota_total is None:
+            return True
+        with self.backend.transaction() as counters:
+            self._seed(counters, key)
+            return counters.get(used_key(key.id)) + counters.get(reserved_key(key.id)) < key.quota_total
+    
+    def exhausted(self, key: Any) -> bool:
+        """密钥配额是否已被实际用尽（不含预留）"""
+        if not key.enable_quota or key.quota_total is None:
+            return False
+        return self.used(key) >= key.quota_total
+    
+    def reserve(self, key: Any) -> bool:
+        """
+        为一次请求预留配额
+        
+        Returns:
+            是否预留成功（配额不足时返回False）
+        """
+        if not key.enable_quota:
+            return True
+        
+        with self.backend.transaction() as counters:
+            if not self.available(key):
+                self._stats["rejected"] += 1
+                return False
+            counters.incr(reserved_key(key.id), 1, ttl=RESERVATION_TTL_SECONDS)
+        
+        self._reserved[key.id] = self._reserved.get(key.id, 0) + 1
+        return True
+    
+    def commit(self, key: Any, reserved: bool = True) -> bool:
+        """
+        将预留转为实际使用
+        
+        Args:
+            reserved: 是否有对应的预留（预留已释放时为False，只累加已用量）
+        
+        Returns:
+            本次提交是否使配额刚好用尽
+        """
+        if not key.enable_quota:
+            return False
+        
+        with self.backend.transaction() as counters:
+            self._seed(counters, key)
+            if reserved:
+                self._release_reservation(counters, key)
+            used = counters.incr(used_key(key.id), 1)
+        
+        self._pending[key.id] = self._pending.get(key.id, 0) + 1
+        self._last_used[key.id] = datetime.now()
+        
+        if key.quota_total is not None and used == key.quota_total:
+            if key.auto_disable_on_failure:
+                self._to_disable[key.id] = (
+                    datetime.now() + timedelta(hours=key.auto_enable_delay_hours)
+                    if key.auto_enable_delay_hours else None
+                )
+            return True
+        
+        return False
+    
+    def release(self, key: Any) -> None:
+        """释放未使用的预留（请求未到达上游）"""
+        if not key.enable_quota:
+            return
+        
+        with self.backend.transaction() as counters:
+            self._release_reservation(counters, key)
+    
+    def reset(self, used: Mapping[int, int]) -> None:
+        """
+        将密钥的已用量设为数据库中的新值（数据库中的配额被重置或手动修改并提交后立即调用）
+        
+        直接写入共享计数而不是删除后重新取初值，避免其他请求以尚未刷新的路由快照中的旧已用量为初值；
+        本进程未回写的旧用量随之丢弃，不会叠加到新值上。进行中请求的预留保持不变。
+        """
+        with self.backend.transaction() as counters:
+            for key_id, value in used.items():
+                counters.set(used_key(key_id), value or 0)
+                self._seen.add(key_id)
+                self._pending.pop(key_id, None)
+                self._to_disable.pop(key_id, None)
+    
+    def _release_reservation(self, counters: CounterBackend, key: Any) -> None:
+        if counters.get(reserved_key(key.id)) > 0:
+            counters.incr(reserved_key(key.id), -1, ttl=RESERVATION_TTL_SECONDS)
+        if self._reserved.get(key.id):
+            self._reserved[key.id] -= 1
+    
+    async def flush(self) -> int:
+        """
+        将未回写的用量批量写入数据库
+        
+        Returns:
+            回写的密钥数量
+        """
+        deltas = [
+            {"key_id": key_id, "delta": delta, "used_at": self._last_used.get(key_id)}
+            for key_id, delta in self._pending.items()
+            if delta
+        ]
+        disables = [
+            {"key_id": key_id, "enable_at": enable_at}
+            for key_id, enable_at in self._to_disable.items()
+        ]
+        
+        if not deltas and not disables:
+            return 0
+        
+        for item in deltas:
+            self._pending[item["key_id"]] = 0
+        self._to_disable.clear()
+        
+        try:
+            async with AsyncSessionLocal() as db:
+                if deltas:
+                    await db.execute(
+                        update(api_keys_table)
+                        .where(api_keys_table.c.id == bindparam("key_id"))
+                        .values(
+                            quota_used=api_keys_table.c.quota_used + bindparam("delta"),
+                            last_used_at=bindparam("used_at")
+                        ),
+                        deltas
+                    )
+                if disables:
+                    await db.execute(
+                        update(api_keys_table)
+                        .where(api_keys_table.c.id == bindparam("key_id"))
+                        .values(status=KeyStatus.DISABLED, auto_enable_at=bindparam("enable_at")),
+                        disables
+                    )
+                await db.commit()
+                
+                if disables:
+                    await routing_cache.invalidate(db)
+                    
+        except Exception as e:
+            for item in deltas:
+                self._pending[item["key_id"]] = self._pending.get(item["key_id"], 0) + item["delta"]
+            for item in disables:
+                self._to_disable.setdefault(item["key_id"], item["enable_at"])
+            self._stats["flush_errors"] += 1
+            logger.error(f"回写密钥用量失败: {e}")
+            return 0
+        
+        self._stats["flushes"] += 1
+        self._stats["flushed_keys"] += len(deltas)
+        return len(deltas)
+    
+    def stats(self) -> Dict[str, Any]:
+        """运行指标"""
+        return {
+            **self._stats,
+            "tracked_keys": len(self._seen),
+            "pending_updates": sum(self._pending.values()),
+            "reserved": sum(self._reserved.values()),
+        }
+
+
+quota_ledger = QuotaLedger(counter_backend)
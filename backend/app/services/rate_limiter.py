@@ -1,18 +1,144 @@
-from typing import Dict, Optional
+from typing import Dict, Tuple, Optional, Iterable, List, Mapping, Any
 from datetime import datetime, timedelta
-import asyncio
-from collections import defaultdict
 import logging
+import math
+
+from app.core.config import settings
+from app.services.counter_backend import CounterBackend, LocalCounterBackend, counter_backend, NS_PER_SECOND
 
 logger = logging.getLogger(__name__)
 
+# 各级限制的窗口（名称, 秒）
+RATE_LIMIT_WINDOWS = (("minute", 60), ("hour", 3600), ("day", 86400))
+WINDOW_LABELS = {"minute": "分钟", "hour": "小时", "day": "日"}
+
+
+class WindowCounter:
+    """单个限制键在当前时刻的滑动窗口计数：当前窗口和上一个窗口的请求数"""
+    
+    __slots__ = ("key", "limit", "window_ns", "elapsed", "previous", "current", "counter_key")
+    
+    def __init__(self, key: str, limit: int, window_seconds: float, now: int, counters: CounterBackend):
+        self.key = key
+        self.limit = limit
+        self.window_ns = max(1, int(window_seconds * NS_PER_SECOND))
+        index, self.elapsed = divmod(now, self.window_ns)
+        self.counter_key = f"rl:{key}:{index}"
+        self.previous = counters.get(f"rl:{key}:{index - 1}")
+        self.current = counters.get(self.counter_key)
+    
+    def estimate(self) -> int:
+        """按上一个窗口在滑动窗口内剩余的比例折算请求数"""
+        return self.previous * (self.window_ns - self.elapsed) // self.window_ns + self.current
+    
+    def reset_after(self) -> float:
+        """距当前窗口结束的秒数"""
+        return (self.window_ns - self.elapsed) / NS_PER_SECOND
+    
+    def retry_after(self) -> float:
+        """折算请求数降到限制以下还需等待的秒数"""
+        if self.current >= self.limit or not self.previous:
+            return self.reset_after()
+        # previous * (window - t) / window + current < limit 时放行
+        target = self.window_ns - (self.limit - self.current) * self.window_ns // self.previous
+        return max(1, target - self.elapsed + 1) / NS_PER_SECOND
+
+
+class RateLimitDecision:
+    """一次批量检查的结果：放行时取剩余次数最少的窗口，拒绝时取需要等待最久的窗口"""
+    
+    __slots__ = ("allowed", "key", "limit", "remaining", "reset_after", "retry_after")
+    
+    def __init__(
+        self,
+        allowed: bool,
+        key: str,
+        limit: int,
+        remaining: int,
+        reset_after: float,
+        retry_after: float = 0.0
+    ):
+        self.allowed = allowed
+        self.key = key
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_after = reset_after
+        self.retry_after = retry_after
+    
+    def headers(self) -> Dict[str, str]:
+        """X-RateLimit-* 响应头（Reset 为距窗口结束的秒数），拒绝时附带 Retry-After"""
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_after)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
 
 class RateLimiter:
-    """频率限制器 - 基于滑动窗口算法"""
+    """
+    频率限制器 - 基于滑动窗口计数算法
+    
+    每个限制键只保存当前窗口和上一个窗口两个整数计数，检查和计数的代价与限制次数无关；
+    计数保存在计数后端中，多个工作进程共用同一后端时限制在进程间共享。
+    """
+    
+    def __init__(self, backend: Optional[CounterBackend] = None):
+        self.backend = backend or LocalCounterBackend()
+        self._stats = {"allowed": 0, "rejected": 0}
+    
+    def check_many(self, checks: Iterable[Tuple[str, int, float]]) -> Optional[RateLimitDecision]:
+        """
+        一次检查多个窗口：全部允许时才同时计入，任一窗口超限时都不计入
+        
+        所有窗口在计数后端的同一个事务中读取和计入
+        
+        Args:
+            checks: (限制键, 限制次数, 时间窗口秒数) 列表
+        
+        Returns:
+            检查结果；没有任何窗口时返回None
+        """
+        with self.backend.transaction() as counters:
+            now = self.backend.now_ns()
+            windows = [
+                WindowCounter(key, limit, window_seconds, now, counters)
+                for key, limit, window_seconds in checks
+            ]
+            if not windows:
+                return None
+            
+            rejected = [window for window in windows if window.estimate() >= window.limit]
+            if rejected:
+                self._stats["rejected"] += 1
+                window = max(rejected, key=WindowCounter.retry_after)
+                return RateLimitDecision(
+                    False, window.key, window.limit, 0,
+                    reset_after=window.reset_after(),
+                    retry_after=window.retry_after()
+                )
+            
+            for window in windows:
+                counters.incr(window.counter_key, 1, ttl=2 * window.window_ns / NS_PER_SECOND)
+        
+        self._stats["allowed"] += 1
+        window = min(windows, key=lambda window: window.limit - window.estimate())
+        return RateLimitDecision(
+            True, window.key, window.limit, max(0, window.limit - window.estimate() - 1),
+            reset_after=window.reset_after()
+        )
     
-    def __init__(self):
-        self._requests: Dict[str, list] = defaultdict(list)
-        self._lock = asyncio.Lock()
+    def hit(self, key: str, limit: int, window_seconds: float) -> Tuple[bool, int, float]:
+        """
+        检查并计入一次请求
+        
+        Returns:
+            (是否允许, 计入后的请求数, 距当前窗口结束的秒数)
+        """
+        decision = self.check_many([(key, limit, window_seconds)])
+        return decision.allowed, limit - decision.remaining, decision.reset_after
     
     async def check_rate_limit(
         self,
@@ -36,50 +162,36 @@ class RateLimiter:
                 "reset_at": datetime
             }
         """
-        async with self._lock:
-            now = datetime.now()
-            window_start = now - timedelta(seconds=window_seconds)
-            
-            self._requests[key] = [
-                req_time for req_time in self._requests[key]
-                if req_time > window_start
-            ]
-            
-            current_count = len(self._requests[key])
-            allowed = current_count < limit
-            
-            if allowed:
-                self._requests[key].append(now)
-            
-            reset_at = now + timedelta(seconds=window_seconds)
-            
-            return {
-                "allowed": allowed,
-                "current": current_count + (1 if allowed else 0),
-                "limit": limit,
-                "remaining": max(0, limit - current_count - (1 if allowed else 0)),
-                "reset_at": reset_at.isoformat()
-            }
+        allowed, current, reset_after = self.hit(key, limit, window_seconds)
+        return {
+            "allowed": allowed,
+            "current": current,
+            "limit": limit,
+            "remaining": max(0, limit - current),
+            "reset_at": (datetime.now() + timedelta(seconds=reset_after)).isoformat()
+        }
     
-    async def cleanup_old_entries(self, max_age_seconds: int = 3600):
-        """清理过期的请求记录"""
-        async with self._lock:
-            cutoff_time = datetime.now() - timedelta(seconds=max_age_seconds)
-            
-            for key in list(self._requests.keys()):
-                self._requests[key] = [
-                    req_time for req_time in self._requests[key]
-                    if req_time > cutoff_time
-                ]
-                
-                if not self._requests[key]:
-                    del self._requests[key]
-            
-            logger.info(f"Cleaned up rate limiter, active keys: {len(self._requests)}")
+    async def cleanup_old_entries(self, batch_size: int = settings.COUNTER_PURGE_BATCH_SIZE) -> int:
+        """
+        清理已过期的窗口计数
+        
+        计数后端只处理到期的键，并分批让出事件循环，代价与到期键数成正比而非全部键数
+        
+        Returns:
+            清理的键数
+        """
+        purged = await self.backend.purge_expired(batch_size)
+        if purged:
+            logger.debug(f"Cleaned up rate limiter, expired counters: {purged}")
+        return purged
+    
+    def stats(self) -> Dict[str, int]:
+        """放行和拒绝次数"""
+        return dict(self._stats)
 
 
 class RateLimitConfig:
-    """频率限制配置"""
+    """频率限制配置（限制次数为 0 或空表示该窗口不限制）"""
     
     def __init__(
         self,
@@ -92,9 +204,81 @@ class RateLimitConfig:
         self.requests_per_minute = requests_per_minute
         self.requests_per_hour = requests_per_hour
         self.requests_per_day = requests_per_day
+    
+    @classmethod
+    def for_upstream(cls, upstream: Any) -> "RateLimitConfig":
+        """上游整体的限制"""
+        return cls(
+            bool(upstream.enable_rate_limit),
+            upstream.rate_limit_per_minute,
+            upstream.rate_limit_per_hour,
+            upstream.rate_limit_per_day
+        )
+    
+    @classmethod
+    def for_client(cls, upstream: Any) -> "RateLimitConfig":
+        """上游对每个客户端的限制"""
+        return cls(
+            bool(upstream.enable_rate_limit),
+            upstream.client_rate_limit_per_minute,
+            upstream.client_rate_limit_per_hour,
+            upstream.client_rate_limit_per_day
+        )
+    
+    @classmethod
+    def for_key(cls, key: Any) -> "RateLimitConfig":
+        """单个API密钥的限制"""
+        return cls(True, key.rate_limit_per_minute, key.rate_limit_per_hour, key.rate_limit_per_day)
+    
+    def windows(self, base_key: str) -> List[Tuple[str, int, int]]:
+        """启用的窗口，作为 RateLimiter.check_many 的输入"""
+        if not self.enabled:
+            return []
+        limits = (self.requests_per_minute, self.requests_per_hour, self.requests_per_day)
+        return [
+            (f"{base_key}:{name}", limit, seconds)
+            for (name, seconds), limit in zip(RATE_LIMIT_WINDOWS, limits)
+            if limit
+        ]
 
 
-rate_limiter = RateLimiter()
+rate_limiter = RateLimiter(counter_backend)
+
+
+def client_identity(upstream: Any, headers: Mapping[str, str], client_ip: str) -> str:
+    """客户端标识：上游配置了 rate_limit_client_header 且请求带有该请求头时取其值，否则为客户端IP"""
+    header = upstream.rate_limit_client_header
+    if header:
+        value = headers.get(header) or headers.get(header.lower())
+        if value:
+            return f"{header.lower()}={value}"
+    return f"ip={client_ip}"
+
+
+def check_request_rate_limit(upstream: Any, client_id: str) -> Optional[RateLimitDecision]:
+    """
+    检查上游整体和客户端的频率限制（在选择密钥之前调用，不访问数据库）
+    
+    Returns:
+        检查结果；上游未启用频率限制时返回None
+    """
+    if not upstream.enable_rate_limit:
+        return None
+    
+    base_key = f"upstream:{upstream.id}"
+    return rate_limiter.check_many([
+        *RateLimitConfig.for_upstream(upstream).windows(base_key),
+        *RateLimitConfig.for_client(upstream).windows(f"{base_key}:client:{client_id}"),
+    ])
+
+
+def check_key_rate_limit(key: Any) -> Optional[RateLimitDecision]:
+    """检查API密钥的频率限制；密钥未配置限制时返回None"""
+    if not (key.rate_limit_per_minute or key.rate_limit_per_hour or key.rate_limit_per_day):
+        return None
+    return rate_limiter.check_many(
+        RateLimitConfig.for_key(key).windows(f"upstream:{key.upstream_id}:key:{key.id}")
+    )
 
 
 async def check_upstream_rate_limit(
@@ -103,7 +287,7 @@ async def check_upstream_rate_limit(
     config: Optional[RateLimitConfig] = None
 ) -> Dict[str, any]:
     """
-    检查上游API的频率限制
+    检查上游API的频率限制（分钟、小时、天三个窗口一次检查）
     
     Args:
         upstream_id: 上游ID
@@ -120,56 +304,26 @@ async def check_upstream_rate_limit(
         }
     
     key_suffix = f":key:{api_key_id}" if api_key_id else ""
-    base_key = f"upstream:{upstream_id}{key_suffix}"
-    
-    minute_result = await rate_limiter.check_rate_limit(
-        f"{base_key}:minute",
-        config.requests_per_minute,
-        60
-    )
-    
-    if not minute_result["allowed"]:
+    decision = rate_limiter.check_many(config.windows(f"upstream:{upstream_id}{key_suffix}"))
+    if decision is None:
         return {
-            "allowed": False,
-            "reason": "minute_limit_exceeded",
-            "message": f"超过每分钟请求限制（{config.requests_per_minute}次）",
-            "retry_after": 60,
-            "details": minute_result
-        }
-    
-    hour_result = await rate_limiter.check_rate_limit(
-        f"{base_key}:hour",
-        config.requests_per_hour,
-        3600
-    )
-    
-    if not hour_result["allowed"]:
-        return {
-            "allowed": False,
-            "reason": "hour_limit_exceeded",
-            "message": f"超过每小时请求限制（{config.requests_per_hour}次）",
-            "retry_after": 3600,
-            "details": hour_result
+            "allowed": True,
+            "message": "Rate limiting disabled"
         }
     
-    day_result = await rate_limiter.check_rate_limit(
-        f"{base_key}:day",
-        config.requests_per_day,
-        86400
-    )
-    
-    if not day_result["allowed"]:
+    if not decision.allowed:
+        window = decision.key.rsplit(":", 1)[-1]
         return {
             "allowed": False,
-            "reason": "day_limit_exceeded",
-            "message": f"超过每日请求限制（{config.requests_per_day}次）",
-            "retry_after": 86400,
-            "details": day_result
+            "reason": f"{window}_limit_exceeded",
+            "message": f"超过每{WINDOW_LABELS[window]}请求限制（{decision.limit}次）",
+            "retry_after": max(1, math.ceil(decision.retry_after)),
+            "headers": decision.headers()
         }
     
     return {
         "allowed": True,
-        "minute": minute_result,
-        "hour": hour_result,
-        "day": day_result
+        "limit": decision.limit,
+        "remaining": decision.remaining,
+        "headers": decision.headers()
     }
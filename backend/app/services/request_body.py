@@ -0,0 +1,100 @@
+from typing import AsyncIterator, Optional, Union
+from tempfile import SpooledTemporaryFile
+
+
+class StreamedRequestBody:
+    """流式请求体 - 将客户端上传流直接转发给上游，仅在需要时保留副本"""
+    
+    def __init__(
+        self,
+        source: AsyncIterator[bytes],
+        capture_limit: int = 0,
+        replayable: bool = False,
+        spool_max_memory: int = 1024 * 1024
+    ):
+        """
+        Args:
+            source: 客户端请求体字节流（如 request.stream()）
+            capture_limit: 为日志保留的最大字节数，0表示不保留
+            replayable: 是否需要支持重试重放（写入溢出到磁盘的临时文件）
+            spool_max_memory: 临时文件在内存中的最大字节数，超出后落盘
+        """
+        self._source = source
+        self._capture_limit = capture_limit
+        self._captured = bytearray()
+        self._spool = SpooledTemporaryFile(max_size=spool_max_memory) if replayable else None
+        self._exhausted = False
+        self.size = 0
+    
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self._iterate()
+    
+    async def _iterate(self) -> AsyncIterator[bytes]:
+        """先重放已落盘的部分，再继续读取客户端流"""
+        if self._spool is not None and self.size:
+            self._spool.seek(0)
+            while True:
+                chunk = self._spool.read(64 * 1024)
+                if not chunk:
+                    break
+                yield chunk
+            self._spool.seek(0, 2)
+        elif self.size:
+            raise RuntimeError("请求体已被消费且不可重放")
+        
+        if self._exhausted:
+            return
+        
+        async for chunk in self._source:
+            if not chunk:
+                continue
+            
+            self.size += len(chunk)
+            
+            if len(self._captured) < self._capture_limit:
+                self._captured.extend(chunk[:self._capture_limit - len(self._captured)])
+            
+            if self._spool is not None:
+                self._spool.write(chunk)
+            
+            yield chunk
+        
+        self._exhausted = True
+    
+    @property
+    def replayable(self) -> bool:
+        return self._spool is not None
+    
+    def preview(self) -> Optional[str]:
+        """返回为日志保留的请求体片段"""
+        if not self._captured:
+            return None
+        return self._captured.decode("utf-8", errors="replace")
+    
+    def close(self) -> None:
+        """释放临时文件"""
+        if self._spool is not None:
+            self._spool.close()
+
+
+RequestBody = Union[bytes, StreamedRequestBody, None]
+
+
+def body_for_log(body: RequestBody, limit: int) -> Optional[str]:
+    """
+    获取用于记录日志的请求体文本
+    
+    Args:
+        body: 原始请求体或流式请求体
+        limit: 最大记录字节数
+    
+    Returns:
+        截断后的请求体文本
+    """
+    if body is None:
+        return None
+    
+    if isinstance(body, StreamedRequestBody):
+        return body.preview()
+    
+    return body[:limit].decode("utf-8", errors="replace")
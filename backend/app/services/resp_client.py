@@ -0,0 +1,119 @@
+from typing import Any, List, Optional, Sequence, Union
+from urllib.parse import urlparse
+import asyncio
+
+
+class RespError(Exception):
+    """服务端返回的错误回复"""
+
+
+class RespClient:
+    """
+    Redis 协议（RESP2）客户端 - 只实现管道批量发送
+    
+    一次 pipeline 调用把所有命令写入同一个连接后再依次读取回复，
+    只需一次网络往返；配合 MULTI/EXEC 即可原子执行一组命令。
+    """
+    
+    def __init__(self, url: str, timeout: float = 2.0):
+        """
+        Args:
+            url: 形如 redis://[:password@]host[:port][/db]
+            timeout: 连接和读取超时（秒）
+        """
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+    
+    async def pipeline(self, commands: Sequence[Sequence[Union[str, int, bytes]]]) -> List[Any]:
+        """
+        批量发送命令
+        
+        Returns:
+            每条命令的回复；错误回复以 RespError 实例出现在对应位置
+        
+        Raises:
+            连接或读取失败时抛出 OSError / asyncio.TimeoutError，连接随之关闭
+        """
+        async with self._lock:
+            try:
+                if self._writer is None:
+                    await asyncio.wait_for(self._connect(), self.timeout)
+                self._writer.write(b"".join(encode_command(command) for command in commands))
+                await self._writer.drain()
+                return [
+                    await asyncio.wait_for(read_reply(self._reader), self.timeout)
+                    for _ in commands
+                ]
+            except BaseException:
+                await self._close()
+                raise
+    
+    async def close(self) -> None:
+        async with self._lock:
+            await self._close()
+    
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            self._writer.write(b"".join(encode_command(command) for command in setup))
+            for _ in setup:
+                reply = await read_reply(self._reader)
+                if isinstance(reply, RespError):
+                    raise reply
+    
+    async def _close(self) -> None:
+        writer, self._reader, self._writer = self._writer, None, None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+
+def encode_command(command: Sequence[Union[str, int, bytes]]) -> bytes:
+    """编码为 RESP 数组"""
+    parts = [b"*%d\r\n" % len(command)]
+    for arg in command:
+        data = arg if isinstance(arg, bytes) else str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    """读取一个 RESP 回复（批量字符串以 bytes 返回）"""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("连接已关闭")
+    
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode()
+    if kind == b"-":
+        return RespError(payload.decode())
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        length = int(payload)
+        if length < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise ConnectionError(f"无法解析的回复: {line!r}")
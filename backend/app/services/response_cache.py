@@ -0,0 +1,393 @@
+from typing import Dict, Any, Optional, Mapping
+from collections import OrderedDict
+from dataclasses import dataclass
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 响应头中标记缓存命中情况
+CACHE_STATUS_HEADER = "X-Cache-Status"
+
+CACHEABLE_METHODS = {"GET", "HEAD", "POST"}
+
+# 这些响应头只属于原始请求的客户端，不写入缓存
+UNCACHEABLE_HEADERS = {"set-cookie"}
+
+# 请求体包含这些字段时视为生成请求，只有显式 temperature=0 才可缓存
+GENERATION_FIELDS = ("messages", "prompt", "contents")
+
+
+@dataclass
+class CachedResponse:
+    """缓存的上游响应"""
+    upstream_id: int
+    status_code: int
+    headers: Dict[str, str]
+    content: bytes
+    stored_at: float
+    expires_at: float
+    
+    @property
+    def size(self) -> int:
+        return len(self.content)
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """解析Cache-Control头为 {指令: 值} 字典（指令名小写）"""
+    directives: Dict[str, Optional[str]] = {}
+    if not value:
+        return directives
+    
+    for part in value.split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+def normalize_body(body: Optional[bytes]) -> bytes:
+    """规范化请求体：JSON按键排序并去掉空白，其余原样返回"""
+    if not body:
+        return b""
+    try:
+        parsed = json.loads(body)
+    except ValueError:
+        return body
+    return json.dumps(parsed, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def is_deterministic(body: Optional[bytes]) -> bool:
+    """
+    POST请求是否可能返回确定的结果
+    
+    非流式的JSON请求中：生成请求（含 messages/prompt 等字段）需要 temperature=0，
+    其余请求（如 embeddings、moderations）总是可缓存
+    """
+    if not body:
+        return False
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return False
+    if not isinstance(payload, dict) or payload.get("stream"):
+        return False
+    
+    if "temperature" in payload:
+        return payload["temperature"] == 0
+    return not any(field in payload for field in GENERATION_FIELDS)
+
+
+class DiskCacheTier:
+    """
+    磁盘缓存层 - 基于SQLite（启用mmap读取），按最近访问时间淘汰
+    
+    所有操作都是同步的，调用方应通过线程池执行
+    """
+    
+    def __init__(self, path: str, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(f"PRAGMA mmap_size = {int(max_bytes)}")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, upstream_id INTEGER, status_code INTEGER, "
+            "headers TEXT, content BLOB, stored_at REAL, expires_at REAL, "
+            "size INTEGER, accessed_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_accessed ON entries (accessed_at)")
+        self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+        self._conn.commit()
+        self.bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT upstream_id, status_code, headers, content, stored_at, expires_at "
+                "FROM entries WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            
+            now = time.time()
+            if row[5] <= now:
+                self._delete(key)
+                return None
+            
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        
+        return CachedResponse(
+            upstream_id=row[0],
+            status_code=row[1],
+            headers=json.loads(row[2]),
+            content=row[3],
+            stored_at=row[4],
+            expires_at=row[5]
+        )
+    
+    def put(self, key: str, entry: CachedResponse) -> int:
+        """
+        写入缓存
+        
+        Returns:
+            为腾出空间淘汰的条目数
+        """
+        with self._lock:
+            self._delete(key)
+            self._conn.execute(
+                "INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key, entry.upstream_id, entry.status_code, json.dumps(entry.headers),
+                    entry.content, entry.stored_at, entry.expires_at, entry.size, time.time()
+                )
+            )
+            self.bytes += entry.size
+            
+            evicted = 0
+            if self.bytes > self.max_bytes:
+                self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+                while self.bytes > self.max_bytes:
+                    row = self._conn.execute(
+                        "SELECT key FROM entries ORDER BY accessed_at LIMIT 1"
+                    ).fetchone()
+                    if row is None:
+                        break
+                    self._delete(row[0])
+                    evicted += 1
+                self.bytes = self._conn.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()[0]
+            
+            self._conn.commit()
+            return evicted
+    
+    def invalidate(self, upstream_id: int) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE upstream_id = ?", (upstream_id,))
+            self._conn.commit()
+            self.bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+    
+    def _delete(self, key: str) -> None:
+        row = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self.bytes -= row[0]
+
+
+class ResponseCache:
+    """
+    上游响应缓存 - 内存LRU（按字节限制）+ 可选的SQLite磁盘层
+    
+    按 上游 + 方法 + 路径 + 规范化请求体哈希（及上游配置的 cache_vary_headers）缓存确定性请求的成功响应；
+    有效期取上游配置的TTL，上游响应的 Cache-Control max-age 更短时以其为准，
+    no-store/private/no-cache 的响应不缓存。命中时不经过密钥选择和额度计量。
+    """
+    
+    def __init__(self, memory_bytes: int, max_entry_bytes: int):
+        self.memory_bytes = memory_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._memory: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._memory_used = 0
+        self._disk: Optional[DiskCacheTier] = None
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "stores": 0,
+            "evictions": 0,
+        }
+        self._upstream_stats: Dict[int, Dict[str, int]] = {}
+    
+    def open_disk(self, path: str, max_bytes: int) -> None:
+        """启用磁盘缓存层"""
+        try:
+            self._disk = DiskCacheTier(path, max_bytes)
+        except sqlite3.Error as e:
+            logger.error(f"磁盘缓存打开失败，仅使用内存缓存: {e}")
+    
+    def close(self) -> None:
+        """关闭磁盘缓存层"""
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+    
+    def key_for(
+        self,
+        upstream: Any,
+        method: str,
+        path: str,
+        headers: Mapping[str, str],
+        body: Any
+    ) -> Optional[str]:
+        """
+        计算请求的缓存键
+        
+        Returns:
+            缓存键；上游未启用缓存或请求不可缓存时返回None
+        """
+        if not upstream.enable_response_cache:
+            return None
+        
+        method = method.upper()
+        cache_control = parse_cache_control(headers.get("cache-control"))
+        if (
+            method not in CACHEABLE_METHODS
+            or "no-store" in cache_control
+            or not (body is None or isinstance(body, bytes))
+            or (method == "POST" and not is_deterministic(body))
+        ):
+            self._count(upstream.id, "bypassed")
+            return None
+        
+        digest = hashlib.sha256(normalize_body(body))
+        lowered = {name.lower(): value for name, value in headers.items()}
+        for name in sorted(header.lower() for header in upstream.cache_vary_headers or []):
+            digest.update(f"\n{name}:{lowered.get(name, '')}".encode())
+        return f"{upstream.id}:{method}:{path}:{digest.hexdigest()}"
+    
+    async def get(self, upstream_id: int, key: str, headers: Mapping[str, str]) -> Optional[CachedResponse]:
+        """
+        查找缓存（先内存后磁盘，磁盘命中时提升到内存）
+        
+        请求带 Cache-Control: no-cache 时视为未命中，但响应仍会写入缓存
+        """
+        if "no-cache" in parse_cache_control(headers.get("cache-control")):
+            self._count(upstream_id, "misses")
+            return None
+        
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry.expires_at > time.time():
+                self._memory.move_to_end(key)
+                self._count(upstream_id, "memory_hits")
+                return entry
+            self._remove(key)
+        
+        if self._disk is not None:
+            entry = await asyncio.to_thread(self._disk.get, key)
+            if entry is not None:
+                self._store_memory(key, entry)
+                self._count(upstream_id, "disk_hits")
+                return entry
+        
+        self._count(upstream_id, "misses")
+        return None
+    
+    async def put(self, upstream: Any, key: str, status_code: int, headers: Dict[str, str], content: bytes) -> bool:
+        """
+        按响应的可缓存性写入缓存
+        
+        Returns:
+            是否写入
+        """
+        if status_code != 200 or len(content) > self.max_entry_bytes:
+            return False
+        
+        cache_control = parse_cache_control(
+            next((value for name, value in headers.items() if name.lower() == "cache-control"), None)
+        )
+        if {"no-store", "private", "no-cache"} & cache_control.keys():
+            return False
+        
+        ttl = float(upstream.cache_ttl_seconds or 0)
+        max_age = cache_control.get("s-maxage") or cache_control.get("max-age")
+        if max_age is not None:
+            try:
+                ttl = min(ttl, float(max_age))
+            except ValueError:
+                pass
+        if ttl <= 0:
+            return False
+        
+        now = time.time()
+        entry = CachedResponse(
+            upstream_id=upstream.id,
+            status_code=status_code,
+            headers={name: value for name, value in headers.items() if name.lower() not in UNCACHEABLE_HEADERS},
+            content=content,
+            stored_at=now,
+            expires_at=now + ttl
+        )
+        self._store_memory(key, entry)
+        if self._disk is not None:
+            self._stats["evictions"] += await asyncio.to_thread(self._disk.put, key, entry)
+        self._stats["stores"] += 1
+        return True
+    
+    async def invalidate(self, upstream_id: int) -> None:
+        """清除上游的全部缓存（上游配置变化或删除时调用）"""
+        for key in [key for key, entry in self._memory.items() if entry.upstream_id == upstream_id]:
+            self._remove(key)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.invalidate, upstream_id)
+        self._upstream_stats.pop(upstream_id, None)
+    
+    def stats(self) -> Dict[str, Any]:
+        """命中率、各层占用和各上游的命中计数"""
+        hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+        lookups = hits + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_used,
+            "disk_enabled": self._disk is not None,
+            "disk_bytes": self._disk.bytes if self._disk is not None else 0,
+            "upstreams": {
+                upstream_id: {
+                    **stats,
+                    "hit_ratio": (
+                        round(stats["hits"] / (stats["hits"] + stats["misses"]), 4)
+                        if stats["hits"] + stats["misses"] else None
+                    ),
+                }
+                for upstream_id, stats in self._upstream_stats.items()
+            },
+        }
+    
+    def _store_memory(self, key: str, entry: CachedResponse) -> None:
+        if entry.size > self.memory_bytes:
+            return
+        
+        self._remove(key)
+        self._memory[key] = entry
+        self._memory_used += entry.size
+        while self._memory_used > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= evicted.size
+            self._stats["evictions"] += 1
+    
+    def _remove(self, key: str) -> None:
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_used -= entry.size
+    
+    def _count(self, upstream_id: int, event: str) -> None:
+        self._stats[event] += 1
+        stats = self._upstream_stats.setdefault(upstream_id, {"hits": 0, "misses": 0, "bypassed": 0})
+        if event.endswith("hits"):
+            stats["hits"] += 1
+        else:
+            stats[event] += 1
+
+
+response_cache = ResponseCache(
+    memory_bytes=settings.RESPONSE_CACHE_MEMORY_BYTES,
+    max_entry_bytes=settings.RESPONSE_CACHE_MAX_ENTRY_BYTES
+)
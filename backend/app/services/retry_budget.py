@@ -0,0 +1,82 @@
+from typing import Dict, Any, List, Optional
+from collections import deque
+import time
+
+from app.core.config import settings
+
+
+class RetryBudget:
+    """
+    全局重试预算 - 限制重试在总请求中的占比，防止上游故障时形成重试风暴
+    
+    在滑动窗口内，允许的重试次数 = 请求数 × ratio + 每秒保底次数 × 窗口秒数；
+    计数按秒分桶，过期的桶在访问时丢弃。
+    """
+    
+    def __init__(self, ratio: float = 0.2, min_per_second: int = 10, window_seconds: int = 10):
+        """
+        Args:
+            ratio: 允许的重试占请求数的比例
+            min_per_second: 低流量时每秒保底允许的重试次数
+            window_seconds: 滑动窗口长度（秒）
+        """
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window_seconds = window_seconds
+        self._buckets: deque = deque()
+        self._requests = 0
+        self._retries = 0
+        self._stats = {"requests": 0, "retries": 0, "rejected": 0}
+    
+    def record_request(self) -> None:
+        """记录一次原始请求（存入预算）"""
+        self._bucket()[1] += 1
+        self._requests += 1
+        self._stats["requests"] += 1
+    
+    def can_retry(self) -> bool:
+        """当前窗口内是否还有重试预算（不扣减）"""
+        self._expire()
+        allowed = self._requests * self.ratio + self.min_per_second * self.window_seconds
+        if self._retries < allowed:
+            return True
+        
+        self._stats["rejected"] += 1
+        return False
+    
+    def record_retry(self) -> None:
+        """记录一次重试（扣减预算）"""
+        self._bucket()[2] += 1
+        self._retries += 1
+        self._stats["retries"] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """运行指标"""
+        self._expire()
+        return {
+            **self._stats,
+            "window_requests": self._requests,
+            "window_retries": self._retries,
+        }
+    
+    def _bucket(self) -> List[int]:
+        second = int(time.monotonic())
+        self._expire(second)
+        if not self._buckets or self._buckets[-1][0] != second:
+            self._buckets.append([second, 0, 0])
+        return self._buckets[-1]
+    
+    def _expire(self, now: Optional[int] = None) -> None:
+        if now is None:
+            now = int(time.monotonic())
+        while self._buckets and self._buckets[0][0] <= now - self.window_seconds:
+            _, requests, retries = self._buckets.popleft()
+            self._requests -= requests
+            self._retries -= retries
+
+
+retry_budget = RetryBudget(
+    ratio=settings.RETRY_BUDGET_RATIO,
+    min_per_second=settings.RETRY_BUDGET_MIN_PER_SECOND,
+    window_seconds=settings.RETRY_BUDGET_WINDOW_SECONDS
+)
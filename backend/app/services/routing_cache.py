@@ -0,0 +1,180 @@
+from typing import Dict, Tuple, Any
+from collections import namedtuple
+from dataclasses import dataclass, field
+import asyncio
+import copy
+import logging
+import re
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+
+from app.core.database import AsyncSessionLocal
+from app.models.upstream import Upstream
+from app.models.api_key import APIKey, KeyStatus
+from app.models.rule import Rule
+from app.models.header_config import HeaderConfig
+from app.models.config_version import ConfigVersion
+
+logger = logging.getLogger(__name__)
+
+
+def _record_type(model) -> type:
+    """为ORM模型生成只读记录类型（字段与表列一致）"""
+    return namedtuple(f"{model.__name__}Record", [c.key for c in model.__table__.columns])
+
+
+UpstreamRecord = _record_type(Upstream)
+APIKeyRecord = _record_type(APIKey)
+RuleRecord = _record_type(Rule)
+HeaderConfigRecord = _record_type(HeaderConfig)
+
+
+def _freeze(record_type: type, obj: Any):
+    """将ORM对象复制为只读记录"""
+    return record_type(*(getattr(obj, name) for name in record_type._fields))
+
+
+def compile_conditions(conditions: Dict[str, Any]) -> Dict[str, Any]:
+    """预编译规则条件中的正则表达式（结果存放在 _pattern 字段）"""
+    compiled = copy.deepcopy(conditions)
+    
+    def walk(node: Dict[str, Any]) -> None:
+        if node.get("operator") == "regex" and isinstance(node.get("value"), str):
+            try:
+                node["_pattern"] = re.compile(node["value"])
+            except re.error as e:
+                logger.warning(f"规则正则表达式无效: {node['value']} ({e})")
+        for sub_condition in node.get("conditions", []) or []:
+            if isinstance(sub_condition, dict):
+                walk(sub_condition)
+    
+    if isinstance(compiled, dict):
+        walk(compiled)
+    return compiled
+
+
+@dataclass(frozen=True)
+class RoutingSnapshot:
+    """路由快照 - 某一配置版本下的上游、密钥、规则和请求头配置"""
+    version: int
+    upstreams_by_name: Dict[str, Any] = field(default_factory=dict)
+    upstreams_by_id: Dict[int, Any] = field(default_factory=dict)
+    keys_by_upstream: Dict[int, Tuple[Any, ...]] = field(default_factory=dict)
+    rules_by_upstream: Dict[int, Tuple[Any, ...]] = field(default_factory=dict)
+    headers_by_upstream: Dict[int, Tuple[Any, ...]] = field(default_factory=dict)
+    
+    def get_upstream(self, name: str):
+        """按名称获取启用的上游"""
+        return self.upstreams_by_name.get(name)
+    
+    def active_keys(self, upstream_id: int) -> Tuple[Any, ...]:
+        """上游下状态为ACTIVE的密钥"""
+        return self.keys_by_upstream.get(upstream_id, ())
+    
+    def active_rules(self, upstream_id: int) -> Tuple[Any, ...]:
+        """上游下启用的规则（按优先级降序）"""
+        return self.rules_by_upstream.get(upstream_id, ())
+    
+    def header_configs(self, upstream_id: int) -> Tuple[Any, ...]:
+        """上游下启用的请求头配置（按优先级降序）"""
+        return self.headers_by_upstream.get(upstream_id, ())
+
+
+class RoutingCache:
+    """路由缓存 - 持有不可变路由快照，配置变更时原子替换"""
+    
+    def __init__(self):
+        self._snapshot = RoutingSnapshot(version=-1)
+        self._lock = asyncio.Lock()
+    
+    @property
+    def snapshot(self) -> RoutingSnapshot:
+        return self._snapshot
+    
+    async def load(self) -> RoutingSnapshot:
+        """从数据库重建快照并替换当前快照"""
+        async with self._lock:
+            async with AsyncSessionLocal() as db:
+                snapshot = await self._build(db)
+            self._snapshot = snapshot
+            logger.info(f"路由快照已加载，版本 {snapshot.version}")
+            return snapshot
+    
+    async def poll(self) -> None:
+        """检查数据库中的配置版本，变化时重新加载（用于多进程收敛）"""
+        async with AsyncSessionLocal() as db:
+            version = await self._read_version(db)
+        
+        if version != self._snapshot.version:
+            await self.load()
+    
+    async def invalidate(self, db: AsyncSession) -> None:
+        """
+        递增配置版本并重新加载快照（管理接口提交变更后调用）
+        
+        Args:
+            db: 数据库会话
+        """
+        # 版本行由 init_db 预置，这里只做原子递增
+        await db.execute(
+            update(ConfigVersion)
+            .where(ConfigVersion.id == 1)
+            .values(version=ConfigVersion.version + 1)
+        )
+        await db.commit()
+        
+        await self.load()
+    
+    async def _read_version(self, db: AsyncSession) -> int:
+        result = await db.execute(
+            select(ConfigVersion.version).where(ConfigVersion.id == 1)
+        )
+        return result.scalar_one_or_none() or 0
+    
+    async def _build(self, db: AsyncSession) -> RoutingSnapshot:
+        """读取配置表构建快照（先读版本号，保证数据不旧于版本）"""
+        version = await self._read_version(db)
+        
+        result = await db.execute(
+            select(Upstream).where(Upstream.is_enabled == True)
+        )
+        upstreams = [_freeze(UpstreamRecord, u) for u in result.scalars().all()]
+        
+        result = await db.execute(
+            select(APIKey).where(APIKey.status == KeyStatus.ACTIVE).order_by(APIKey.id)
+        )
+        keys: Dict[int, list] = {}
+        for key in result.scalars().all():
+            keys.setdefault(key.upstream_id, []).append(_freeze(APIKeyRecord, key))
+        
+        result = await db.execute(
+            select(Rule).where(Rule.is_enabled == True).order_by(Rule.priority.desc())
+        )
+        rules: Dict[int, list] = {}
+        for rule in result.scalars().all():
+            record = _freeze(RuleRecord, rule)._replace(
+                conditions=compile_conditions(rule.conditions or {})
+            )
+            rules.setdefault(rule.upstream_id, []).append(record)
+        
+        result = await db.execute(
+            select(HeaderConfig)
+            .where(HeaderConfig.is_enabled == True)
+            .order_by(HeaderConfig.priority.desc())
+        )
+        headers: Dict[int, list] = {}
+        for header in result.scalars().all():
+            headers.setdefault(header.upstream_id, []).append(_freeze(HeaderConfigRecord, header))
+        
+        return RoutingSnapshot(
+            version=version,
+            upstreams_by_name={u.name: u for u in upstreams},
+            upstreams_by_id={u.id: u for u in upstreams},
+            keys_by_upstream={k: tuple(v) for k, v in keys.items()},
+            rules_by_upstream={k: tuple(v) for k, v in rules.items()},
+            headers_by_upstream={k: tuple(v) for k, v in headers.items()},
+        )
+
+
+routing_cache = RoutingCache()
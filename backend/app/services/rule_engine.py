@@ -7,6 +7,8 @@ import json
 
 from app.models.rule import Rule
 from app.models.api_key import APIKey, KeyStatus
+from app.services.routing_cache import routing_cache
+from app.services.key_pool import key_pools
 
 
 class ProxyResponse:
@@ -16,12 +18,14 @@ class ProxyResponse:
         status_code: int,
         headers: Dict[str, str],
         body: str,
-        latency_ms: int
+        latency_ms: int,
+        content: Optional[bytes] = None
     ):
         self.status_code = status_code
         self.headers = headers
         self.body = body
         self.latency_ms = latency_ms
+        self.content = content if content is not None else body.encode()
 
 
 class RuleEngine:
@@ -35,11 +39,15 @@ class RuleEngine:
         self,
         upstream_id: int,
         api_key_id: int,
-        response: ProxyResponse
+        response: ProxyResponse,
+        synchronous: Optional[bool] = None
     ) -> List[int]:
         """
         评估所有规则
         
+        Args:
+            synchronous: 仅评估同步规则(True)/异步规则(False)，None表示全部
+        
         Returns:
             触发的规则ID列表
         """
@@ -47,6 +55,8 @@ class RuleEngine:
         triggered_rules = []
         
         for rule in rules:
+            if synchronous is not None and bool(rule.run_synchronously) != synchronous:
+                continue
             if await self._should_trigger(rule, api_key_id, response):
                 triggered_rules.append(rule.id)
                 await self._execute_actions(rule, api_key_id)
@@ -54,14 +64,8 @@ class RuleEngine:
         return triggered_rules
     
     async def _get_active_rules(self, upstream_id: int) -> List[Rule]:
-        """获取上游API的所有启用规则"""
-        result = await self.db.execute(
-            select(Rule).where(
-                Rule.upstream_id == upstream_id,
-                Rule.is_enabled == True
-            ).order_by(Rule.priority.desc())
-        )
-        return result.scalars().all()
+        """获取上游API的所有启用规则（来自路由快照）"""
+        return list(routing_cache.snapshot.active_rules(upstream_id))
     
     async def _should_trigger(
         self,
@@ -147,7 +151,7 @@ class RuleEngine:
         elif operator == "not_contains":
             return value not in response.body
         elif operator == "regex":
-            pattern = re.compile(value)
+            pattern = conditions.get("_pattern") or re.compile(value)
             return pattern.search(response.body) is not None
         
         return False
@@ -284,6 +288,7 @@ class RuleEngine:
         key = result.scalar_one_or_none()
         
         if key:
+            key_pools.mark_unavailable(key.upstream_id, key.id)
             key.status = KeyStatus.DISABLED
             
             if rule.auto_enable_delay_hours:
@@ -292,6 +297,7 @@ class RuleEngine:
                 )
             
             await self.db.commit()
+            await routing_cache.invalidate(self.db)
     
     async def _ban_key(self, api_key_id: int) -> None:
         """封禁密钥（永久禁用）"""
@@ -301,8 +307,10 @@ class RuleEngine:
         key = result.scalar_one_or_none()
         
         if key:
+            key_pools.mark_unavailable(key.upstream_id, key.id)
             key.status = KeyStatus.BANNED
             await self.db.commit()
+            await routing_cache.invalidate(self.db)
     
     async def _send_alert(self, rule: Rule, api_key_id: int) -> None:
         """发送告警（占位符，待实现通知系统）"""
@@ -10,6 +10,10 @@ from app.models.api_key import APIKey, KeyStatus
 from app.models.request_log import RequestLog
 from app.core.database import AsyncSessionLocal
 from app.core.config import settings
+from app.services.routing_cache import routing_cache
+from app.services.quota import quota_ledger
+from app.services.endpoint_selector import endpoint_selector
+from app.services.rate_limiter import rate_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -56,10 +60,44 @@ class TaskScheduler:
             name="清理旧日志",
             replace_existing=True
         )
+        
+        self.scheduler.add_job(
+            self._poll_routing_snapshot,
+            IntervalTrigger(seconds=settings.ROUTING_SNAPSHOT_POLL_SECONDS),
+            id="poll_routing_snapshot",
+            name="同步路由快照",
+            replace_existing=True
+        )
+        
+        self.scheduler.add_job(
+            self._flush_quota_usage,
+            IntervalTrigger(seconds=settings.QUOTA_FLUSH_INTERVAL_SECONDS),
+            id="flush_quota_usage",
+            name="回写密钥用量",
+            replace_existing=True
+        )
+        
+        self.scheduler.add_job(
+            self._purge_expired_counters,
+            IntervalTrigger(seconds=settings.COUNTER_PURGE_INTERVAL_SECONDS),
+            id="purge_expired_counters",
+            name="清理过期计数",
+            replace_existing=True
+        )
+        
+        self.scheduler.add_job(
+            self._check_endpoint_health,
+            IntervalTrigger(seconds=settings.ENDPOINT_HEALTH_CHECK_INTERVAL_SECONDS),
+            id="check_endpoint_health",
+            name="上游地址健康检查",
+            replace_existing=True
+        )
     
     async def _reset_daily_quota(self):
         """重置每日配额"""
         try:
+            await quota_ledger.flush()
+            
             async with AsyncSessionLocal() as db:
                 result = await db.execute(
                     select(APIKey).where(
@@ -74,6 +112,8 @@ class TaskScheduler:
                     key.quota_reset_at = datetime.now() + timedelta(days=1)
                 
                 await db.commit()
+                quota_ledger.reset({key.id: 0 for key in keys})
+                await routing_cache.invalidate(db)
                 logger.info(f"已重置 {len(keys)} 个密钥的配额")
                 
         except Exception as e:
@@ -82,6 +122,8 @@ class TaskScheduler:
     async def _auto_enable_keys(self):
         """自动启用密钥"""
         try:
+            await quota_ledger.flush()
+            
             async with AsyncSessionLocal() as db:
                 result = await db.execute(
                     select(APIKey).where(
@@ -98,6 +140,8 @@ class TaskScheduler:
                     key.quota_used = 0
                 
                 await db.commit()
+                quota_ledger.reset({key.id: 0 for key in keys})
+                await routing_cache.invalidate(db)
                 logger.info(f"已自动启用 {len(keys)} 个密钥")
                 
         except Exception as e:
@@ -124,6 +168,31 @@ class TaskScheduler:
                 
         except Exception as e:
             logger.error(f"清理日志失败: {e}")
+    
+    async def _poll_routing_snapshot(self):
+        """检查配置版本，同步其他进程提交的变更"""
+        try:
+            await routing_cache.poll()
+        except Exception as e:
+            logger.error(f"同步路由快照失败: {e}")
+    
+    async def _flush_quota_usage(self):
+        """将进程内累计的密钥用量批量写回数据库"""
+        await quota_ledger.flush()
+    
+    async def _purge_expired_counters(self):
+        """清理到期的频率限制窗口和配额预留计数"""
+        try:
+            await rate_limiter.cleanup_old_entries()
+        except Exception as e:
+            logger.error(f"清理过期计数失败: {e}")
+    
+    async def _check_endpoint_health(self):
+        """主动检查多地址上游的各个地址"""
+        try:
+            await endpoint_selector.check_health(routing_cache.snapshot.upstreams_by_id.values())
+        except Exception as e:
+            logger.error(f"上游地址健康检查失败: {e}")
 
 
 task_scheduler = TaskScheduler()
@@ -0,0 +1,84 @@
+from typing import Any, Deque, List, Tuple
+from collections import deque
+
+# 每层 64 个桶，4 层在 1 秒刻度下覆盖约 194 天
+SLOT_BITS = 6
+SLOTS = 1 << SLOT_BITS
+SLOT_MASK = SLOTS - 1
+LEVELS = 4
+
+
+class TimerWheel:
+    """
+    分层时间轮 - 按到期时间登记定时项，推进时只处理到期的桶
+    
+    第 L 层的一个桶覆盖 64^L 个刻度；高层的桶在低层转满一圈时下沉到低层，
+    因此登记和到期都是 O(1)，推进的代价只与经过的刻度数和到期项数有关。
+    到期项放入 ready 队列，由调用方分批处理。超出范围的到期时间放在最高层最远的桶，
+    下沉时重新登记。
+    """
+    
+    def __init__(self, tick_ns: int, now_ns: int):
+        """
+        Args:
+            tick_ns: 刻度长度（纳秒）
+            now_ns: 当前时间（纳秒）
+        """
+        self.tick_ns = tick_ns
+        self.ready: Deque[Tuple[Any, int]] = deque()
+        self._tick = now_ns // tick_ns
+        self._levels: List[List[List[Tuple[Any, int]]]] = [
+            [[] for _ in range(SLOTS)] for _ in range(LEVELS)
+        ]
+        self._size = 0
+    
+    def __len__(self) -> int:
+        """尚未到期的定时项数"""
+        return self._size
+    
+    def schedule(self, item: Any, deadline_ns: int) -> None:
+        """登记一个定时项（到期时间已过的项在下一个刻度到期）"""
+        tick = max(-(-deadline_ns // self.tick_ns), self._tick + 1)
+        self._place(item, deadline_ns, tick)
+        self._size += 1
+    
+    def advance(self, now_ns: int) -> None:
+        """推进到 now_ns，把到期的定时项放入 ready 队列"""
+        target = now_ns // self.tick_ns
+        if not self._size:
+            self._tick = max(self._tick, target)
+            return
+        
+        while self._tick < target and self._size:
+            self._tick += 1
+            tick = self._tick
+            for level in range(LEVELS - 1, 0, -1):
+                if tick & ((1 << (SLOT_BITS * level)) - 1) == 0:
+                    self._cascade(level, (tick >> (SLOT_BITS * level)) & SLOT_MASK)
+            
+            bucket = self._levels[0][tick & SLOT_MASK]
+            if bucket:
+                self._levels[0][tick & SLOT_MASK] = []
+                self._size -= len(bucket)
+                self.ready.extend(bucket)
+        
+        self._tick = max(self._tick, target)
+    
+    def _cascade(self, level: int, index: int) -> None:
+        bucket = self._levels[level][index]
+        if not bucket:
+            return
+        self._levels[level][index] = []
+        for item, deadline_ns in bucket:
+            self._place(item, deadline_ns, max(-(-deadline_ns // self.tick_ns), self._tick))
+    
+    def _place(self, item: Any, deadline_ns: int, tick: int) -> None:
+        for level in range(LEVELS):
+            shift = SLOT_BITS * level
+            if (tick >> shift) - (self._tick >> shift) < SLOTS:
+                self._levels[level][(tick >> shift) & SLOT_MASK].append((item, deadline_ns))
+                return
+        
+        # 超出时间轮范围：放在最高层最远的桶，下沉时重新登记
+        shift = SLOT_BITS * (LEVELS - 1)
+        self._levels[-1][((self._tick >> shift) + SLOTS - 1) & SLOT_MASK].append((item, deadline_ns))
@@ -0,0 +1,84 @@
+from typing import List, Optional, Sequence
+import random
+
+
+class WeightedSampler:
+    """
+    加权随机采样器 - 基于树状数组（Fenwick树）
+    
+    单个权重更新和一次采样均为O(log n)，不需要在每次选择时重建权重列表。
+    权重为非负整数，权重为0的位置不会被选中。
+    """
+    
+    def __init__(self, weights: Sequence[int] = ()):
+        self._size = len(weights)
+        self._weights: List[int] = [max(0, int(w)) for w in weights]
+        self._tree: List[int] = [0] + self._weights
+        
+        for i in range(1, self._size + 1):
+            parent = i + (i & -i)
+            if parent <= self._size:
+                self._tree[parent] += self._tree[i]
+        
+        self._top = 1 << (self._size.bit_length() - 1) if self._size else 0
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    @property
+    def total(self) -> int:
+        """所有权重之和"""
+        return self._prefix(self._size)
+    
+    def weight(self, index: int) -> int:
+        """获取某个位置的权重"""
+        return self._weights[index]
+    
+    def update(self, index: int, weight: int) -> None:
+        """
+        设置某个位置的权重
+        
+        Args:
+            index: 位置（从0开始）
+            weight: 新权重（负数按0处理）
+        """
+        weight = max(0, int(weight))
+        delta = weight - self._weights[index]
+        if not delta:
+            return
+        
+        self._weights[index] = weight
+        i = index + 1
+        while i <= self._size:
+            self._tree[i] += delta
+            i += i & -i
+    
+    def sample(self, rng: Optional[random.Random] = None) -> Optional[int]:
+        """
+        按权重随机选择一个位置
+        
+        Returns:
+            选中的位置，所有权重都为0时返回None
+        """
+        total = self.total
+        if total <= 0:
+            return None
+        
+        remaining = (rng or random).randrange(total)
+        position = 0
+        step = self._top
+        while step:
+            candidate = position + step
+            if candidate <= self._size and self._tree[candidate] <= remaining:
+                position = candidate
+                remaining -= self._tree[candidate]
+            step >>= 1
+        
+        return position
+    
+    def _prefix(self, count: int) -> int:
+        result = 0
+        while count > 0:
+            result += self._tree[count]
+            count -= count & -count
+        return result
@@ -0,0 +1,88 @@
+"""
+频率限制微基准：对比按请求时间列表过滤与滑动窗口计数，以及全量扫描清理与时间轮清理
+
+运行方式（在 backend 目录下）:
+    python -m benchmarks.bench_rate_limiter
+"""
+from datetime import datetime, timedelta
+import time
+
+from app.services.counter_backend import LocalCounterBackend, NS_PER_SECOND
+from app.services.rate_limiter import RateLimiter
+
+LIMITS = [100, 1_000, 10_000, 100_000]
+CHECKS = 2_000
+TRACKED_KEYS = [10_000, 100_000, 500_000]
+EXPIRED_KEYS = 1_000
+
+
+def bench_list(limit):
+    """旧实现：每次检查都过滤整个请求时间列表"""
+    requests = [datetime.now() for _ in range(limit - 1)]
+    started = time.perf_counter()
+    for _ in range(CHECKS):
+        now = datetime.now()
+        window_start = now - timedelta(seconds=86400)
+        requests = [req_time for req_time in requests if req_time > window_start]
+        if len(requests) < limit:
+            requests.append(now)
+    return (time.perf_counter() - started) / CHECKS
+
+
+def bench_window(limit):
+    """滑动窗口计数：O(1) 检查"""
+    limiter = RateLimiter()
+    limiter.hit("bench", limit, 86400)
+    limiter.backend.incr(f"rl:bench:{limiter.backend.now_ns() // (86400 * 10**9)}", limit - 2)
+    started = time.perf_counter()
+    for _ in range(CHECKS):
+        limiter.hit("bench", limit, 86400)
+    return (time.perf_counter() - started) / CHECKS
+
+
+def populate(keys):
+    """keys 个一小时后过期的键，其中 EXPIRED_KEYS 个 1 秒后过期"""
+    backend = LocalCounterBackend()
+    for index in range(keys):
+        backend.incr(f"rl:client:{index}", 1, ttl=1 if index < EXPIRED_KEYS else 3600)
+    return backend
+
+
+def bench_scan(keys):
+    """旧实现：逐个检查所有键"""
+    backend = populate(keys)
+    now = backend.now_ns() + 2 * NS_PER_SECOND
+    started = time.perf_counter()
+    expired = [key for key, entry in backend._values.items() if entry[1] and entry[1] <= now]
+    for key in expired:
+        backend._remove(key)
+    return time.perf_counter() - started
+
+
+def bench_wheel(keys):
+    """时间轮：只处理到期的键"""
+    backend = populate(keys)
+    clock = backend.now_ns() + 2 * NS_PER_SECOND
+    backend.now_ns = lambda: clock
+    started = time.perf_counter()
+    backend.purge()
+    return time.perf_counter() - started
+
+
+def main():
+    print(f"{'limit':>8} {'list (us/check)':>16} {'window (us/check)':>18} {'speedup':>8}")
+    for limit in LIMITS:
+        listed = bench_list(limit)
+        window = bench_window(limit)
+        print(f"{limit:>8} {listed * 1e6:>16.1f} {window * 1e6:>18.2f} {listed / window:>7.0f}x")
+    
+    print()
+    print(f"{'keys':>8} {'scan (ms/cleanup)':>18} {'wheel (ms/cleanup)':>19} {'speedup':>8}")
+    for keys in TRACKED_KEYS:
+        scan = bench_scan(keys)
+        wheel = bench_wheel(keys)
+        print(f"{keys:>8} {scan * 1e3:>18.2f} {wheel * 1e3:>19.2f} {scan / wheel:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+加权选择微基准：对比逐次重建权重列表 + random.choices 与树状数组采样
+
+运行方式（在 backend 目录下）:
+    python -m benchmarks.bench_weighted_sampler
+"""
+import random
+import time
+
+from app.services.weighted_sampler import WeightedSampler
+
+POOL_SIZES = [100, 1_000, 10_000, 50_000]
+PICKS = 2_000
+
+
+def bench_rebuild(weights):
+    """旧实现：每次选择都重建权重列表"""
+    keys = list(range(len(weights)))
+    started = time.perf_counter()
+    for _ in range(PICKS):
+        index = random.choices(keys, weights=[w for w in weights], k=1)[0]
+        weights[index] = max(1, weights[index] - 1)
+    return (time.perf_counter() - started) / PICKS
+
+
+def bench_fenwick(weights):
+    """树状数组：O(log n) 采样和更新"""
+    sampler = WeightedSampler(weights)
+    started = time.perf_counter()
+    for _ in range(PICKS):
+        index = sampler.sample()
+        sampler.update(index, max(1, sampler.weight(index) - 1))
+    return (time.perf_counter() - started) / PICKS
+
+
+def main():
+    print(f"{'keys':>8} {'rebuild (us/pick)':>18} {'fenwick (us/pick)':>18} {'speedup':>8}")
+    for size in POOL_SIZES:
+        weights = [random.randint(1, 1000) for _ in range(size)]
+        rebuild = bench_rebuild(list(weights))
+        fenwick = bench_fenwick(list(weights))
+        print(f"{size:>8} {rebuild * 1e6:>18.1f} {fenwick * 1e6:>18.1f} {rebuild / fenwick:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
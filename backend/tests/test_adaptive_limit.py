@@ -0,0 +1,29 @@
+import time
+
+from app.services.adaptive_limit import AdaptiveLimiter
+
+
+def test_grows_while_latency_is_stable_and_backs_off_on_drop():
+    """测试延迟稳定时加性增长，超时或429时乘性收缩"""
+    limiter = AdaptiveLimiter("test", initial_limit=4, max_limit=8, backoff_ratio=0.5)
+    for _ in range(40):
+        limiter.record(10, dropped=False, in_flight=limiter.limit)
+    assert limiter.limit == 8
+    
+    limiter.record(10, dropped=True, in_flight=8)
+    assert limiter.limit == 4
+    
+    # 收缩后一个平均延迟内的失败不再重复收缩
+    limiter.record(10, dropped=True, in_flight=4)
+    assert limiter.limit == 4
+    assert [entry["limit"] for entry in limiter.snapshot(with_history=True)["history"]][-1] == 4
+
+
+def test_latency_inflation_shrinks_limit():
+    """测试短期延迟超过基线时收缩"""
+    limiter = AdaptiveLimiter("test", initial_limit=10, backoff_ratio=0.5, latency_tolerance=2.0)
+    limiter.record(10, dropped=False, in_flight=0)
+    for _ in range(10):
+        limiter.record(100, dropped=False, in_flight=10)
+        time.sleep(0.002)
+    assert limiter.limit < 10
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from app.services.bulkhead import Bulkhead
+from app.core.exceptions import ServiceUnavailableError, TooManyRequestsError
+
+
+@pytest.mark.asyncio
+async def test_queues_in_fifo_order_and_sheds_when_full():
+    """测试超出并发的请求按FIFO排队，队列已满时拒绝"""
+    bulkhead = Bulkhead("test", limit=1, max_queue=2, queue_timeout=1)
+    await bulkhead.acquire()
+    
+    order = []
+    
+    async def waiter(name):
+        await bulkhead.acquire()
+        order.append(name)
+    
+    tasks = [asyncio.create_task(waiter(name)) for name in ("a", "b")]
+    await asyncio.sleep(0)
+    assert bulkhead.queue_depth == 2
+    
+    with pytest.raises(TooManyRequestsError):
+        await bulkhead.acquire()
+    
+    bulkhead.release()
+    await asyncio.sleep(0)
+    bulkhead.release()
+    await asyncio.gather(*tasks)
+    assert order == ["a", "b"]
+    assert bulkhead.active == 1
+    
+    bulkhead.release()
+    assert bulkhead.active == 0
+
+
+@pytest.mark.asyncio
+async def test_queue_timeout_raises_and_leaves_queue():
+    """测试排队超时返回503并离开队列"""
+    bulkhead = Bulkhead("test", limit=1, max_queue=5, queue_timeout=0.01)
+    await bulkhead.acquire()
+    
+    with pytest.raises(ServiceUnavailableError):
+        await bulkhead.acquire()
+    
+    assert bulkhead.queue_depth == 0
+    assert bulkhead.stats()["rejected_timeout"] == 1
+    bulkhead.release()
+    assert bulkhead.active == 0
@@ -0,0 +1,68 @@
+import time
+
+from app.services.circuit_breaker import CircuitBreaker, BreakerState
+
+
+def test_opens_after_consecutive_failures_and_recovers_through_probes():
+    """测试连续失败后打开，冷却后半开探测成功即关闭"""
+    breaker = CircuitBreaker("test", failure_threshold=3, open_seconds=0.05, half_open_probes=2)
+    for _ in range(3):
+        probe = breaker.acquire()
+        assert probe == 0
+        breaker.record_failure()
+        breaker.release(probe)
+    
+    assert breaker.state == BreakerState.OPEN
+    assert breaker.acquire() is None
+    
+    time.sleep(0.06)
+    probes = [breaker.acquire(), breaker.acquire()]
+    assert all(probes)
+    assert breaker.acquire() is None
+    assert breaker.state == BreakerState.HALF_OPEN
+    
+    for probe in probes:
+        breaker.record_success(probe)
+    assert breaker.state == BreakerState.CLOSED
+
+
+def test_half_open_failure_reopens():
+    """测试半开状态下探测失败重新打开"""
+    breaker = CircuitBreaker("test", failure_threshold=1, open_seconds=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.acquire()
+    breaker.record_failure()
+    assert breaker.state == BreakerState.OPEN
+
+
+def test_requests_admitted_before_trip_do_not_free_probe_slots():
+    """测试熔断前放行的请求和上一轮探测在半开状态下结束时不释放当前轮次的探测名额"""
+    breaker = CircuitBreaker("test", failure_threshold=1, open_seconds=0.01, half_open_probes=1)
+    long_request = breaker.acquire()
+    breaker.record_failure()
+    time.sleep(0.02)
+    
+    old_probe = breaker.acquire()
+    breaker.record_failure()
+    time.sleep(0.02)
+    
+    assert breaker.acquire()
+    breaker.release(long_request)
+    breaker.release(old_probe)
+    assert breaker.acquire() is None
+
+
+def test_only_probe_successes_close_half_open_breaker():
+    """测试半开状态下熔断前放行的请求成功不计入关闭条件，只有本轮探测成功才关闭"""
+    breaker = CircuitBreaker("test", failure_threshold=1, open_seconds=0.01, half_open_probes=1)
+    long_request = breaker.acquire()
+    breaker.record_failure()
+    time.sleep(0.02)
+    
+    probe = breaker.acquire()
+    breaker.record_success(long_request)
+    assert breaker.state == BreakerState.HALF_OPEN
+    
+    breaker.record_success(probe)
+    assert breaker.state == BreakerState.CLOSED
@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+
+from app.services.coalescer import RequestCoalescer, COALESCED_HEADER
+from app.services.rule_engine import ProxyResponse
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_requests_share_one_call():
+    """测试同时进行的相同请求只调用一次，失败也一并共享"""
+    coalescer = RequestCoalescer()
+    calls = 0
+    
+    async def call():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return ProxyResponse(status_code=200, headers={}, body="ok", latency_ms=10)
+    
+    results = await asyncio.gather(*[coalescer.run(1, "key", call) for _ in range(5)])
+    assert calls == 1
+    assert [r.body for r in results] == ["ok"] * 5
+    assert sum(COALESCED_HEADER in r.headers for r in results) == 4
+    
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+    
+    results = await asyncio.gather(*[coalescer.run(1, "key", failing) for _ in range(3)], return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert coalescer.stats()["saved"] == 6
@@ -0,0 +1,123 @@
+import asyncio
+import multiprocessing
+import os
+
+from app.services.counter_backend import SharedMemoryCounterBackend, LeasedCounterBackend
+from app.services.rate_limiter import RateLimiter
+from app.services.resp_client import RespClient, encode_command, read_reply
+
+
+def _hit_shared(name, count):
+    backend = SharedMemoryCounterBackend(name, 1024)
+    for _ in range(count):
+        with backend.transaction() as counters:
+            counters.incr("hits", 1, ttl=60)
+
+
+def test_shared_memory_counts_are_exact_across_processes():
+    """测试多个进程并发累加共享内存计数不丢失"""
+    name = f"test_counters_{os.getpid()}"
+    backend = SharedMemoryCounterBackend(name, 1024)
+    try:
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=_hit_shared, args=(name, 200)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        
+        assert backend.get("hits") == 800
+        assert backend.setnx("seed", 5) and not backend.setnx("seed", 9)
+        backend.delete("seed")
+        assert backend.get("seed") == 0
+    finally:
+        backend._shm.unlink()
+        asyncio.run(backend.close())
+
+
+class StandInServer:
+    """测试用的 Redis 协议服务端：只实现计数后端用到的命令"""
+    
+    def __init__(self):
+        self.values = {}
+    
+    async def handle(self, reader, writer):
+        queued = None
+        while True:
+            try:
+                command = await read_reply(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                break
+            name, args = command[0].decode().upper(), [arg.decode() for arg in command[1:]]
+            if name == "MULTI":
+                queued, reply = [], "OK"
+            elif name == "EXEC":
+                reply, queued = [self.execute(*queued_command) for queued_command in queued], None
+            elif queued is not None:
+                queued.append((name, args))
+                reply = "QUEUED"
+            else:
+                reply = self.execute(name, args)
+            writer.write(self.encode(reply))
+            await writer.drain()
+        writer.close()
+    
+    def execute(self, name, args):
+        if name == "INCRBY":
+            self.values[args[0]] = self.values.get(args[0], 0) + int(args[1])
+            return self.values[args[0]]
+        if name == "MGET":
+            return [str(self.values[key]).encode() if key in self.values else None for key in args]
+        if name == "SET":
+            if "NX" in args[2:] and args[0] in self.values:
+                return None
+            self.values[args[0]] = int(args[1])
+            return "OK"
+        if name == "DEL":
+            return int(self.values.pop(args[0], None) is not None)
+        return 1
+    
+    def encode(self, reply):
+        if isinstance(reply, list):
+            return b"*%d\r\n" % len(reply) + b"".join(self.encode(item) for item in reply)
+        if isinstance(reply, int):
+            return b":%d\r\n" % reply
+        if isinstance(reply, bytes):
+            return b"$%d\r\n%s\r\n" % (len(reply), reply)
+        if reply is None:
+            return b"$-1\r\n"
+        return b"+%s\r\n" % reply.encode()
+
+
+def test_leased_backend_shares_limits_between_workers():
+    """测试两个工作进程经 Redis 协议服务端同步后共享频率限制"""
+    async def scenario():
+        stand_in = StandInServer()
+        server = await asyncio.start_server(stand_in.handle, "127.0.0.1", 0)
+        url = f"redis://127.0.0.1:{server.sockets[0].getsockname()[1]}/0"
+        workers = [LeasedCounterBackend(RespClient(url), lease_size=5) for _ in range(2)]
+        limiters = [RateLimiter(backend) for backend in workers]
+        
+        allowed = 0
+        for _ in range(5):
+            for limiter in limiters:
+                for _ in range(3):
+                    allowed += limiter.check_many([("client:minute", 20, 60)]).allowed
+                await limiter.backend.sync()
+        
+        # 每个工作进程最多超出一个本地租约
+        assert 20 <= allowed <= 20 + 2 * 5
+        assert sum(stand_in.values.values()) == allowed
+        assert not limiters[0].check_many([("client:minute", 20, 60)]).allowed
+        
+        for backend in workers:
+            await backend.close()
+        server.close()
+        await server.wait_closed()
+    
+    asyncio.run(scenario())
+
+
+def test_encode_command():
+    """测试命令编码为 RESP 数组"""
+    assert encode_command(("INCRBY", "k", 2)) == b"*3\r\n$6\r\nINCRBY\r\n$1\r\nk\r\n$1\r\n2\r\n"
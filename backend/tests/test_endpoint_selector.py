@@ -0,0 +1,31 @@
+from types import SimpleNamespace
+
+from app.core.config import settings
+from app.services.endpoint_selector import EndpointSelector
+
+
+def make_upstream(endpoints):
+    return SimpleNamespace(id=1, base_url="http://primary", endpoints=endpoints, health_check_path="")
+
+
+def test_failing_endpoint_leaves_rotation_and_recovers_with_slow_start():
+    """测试连续失败的地址移出轮换，恢复后进入慢启动"""
+    selector = EndpointSelector()
+    upstream = make_upstream([{"url": "http://a", "weight": 1}, {"url": "http://b", "weight": 1}])
+    
+    for _ in range(settings.ENDPOINT_UNHEALTHY_THRESHOLD):
+        selector.report(selector.for_upstream(upstream).endpoints[1], 10, failed=True)
+    
+    assert {selector.select(upstream).url for _ in range(20)} == {"http://a"}
+    
+    endpoint_b = selector.for_upstream(upstream).endpoints[1]
+    for _ in range(settings.ENDPOINT_HEALTHY_THRESHOLD):
+        endpoint_b.mark_success()
+    assert endpoint_b.healthy
+    assert endpoint_b.snapshot()["slow_start"]
+
+
+def test_falls_back_to_base_url_without_endpoints():
+    """测试未配置多地址时使用 base_url"""
+    selector = EndpointSelector()
+    assert selector.select(make_upstream([])).url == "http://primary"
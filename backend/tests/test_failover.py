@@ -0,0 +1,121 @@
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.models.api_key import KeyLocation
+from app.services import proxy as proxy_module
+from app.services import key_selector as key_selector_module
+from app.services.key_pool import KeyPoolRegistry
+from app.services.proxy import ProxyService
+from app.services.retry_budget import RetryBudget
+from app.services.routing_cache import routing_cache, RoutingSnapshot
+
+UPSTREAM_ID = 9001
+
+
+def make_upstream(**overrides):
+    return SimpleNamespace(**{
+        "id": UPSTREAM_ID,
+        "name": "failover-test",
+        "base_url": "http://upstream",
+        "endpoints": [],
+        "key_selection_strategy": "round_robin",
+        "enable_failover": True,
+        "failover_status_codes": [429],
+        "failover_max_attempts": 2,
+        "failover_cooldown_seconds": 30,
+        "enable_hedging": False,
+        "enable_circuit_breaker": False,
+        "stream_response": False,
+        **overrides,
+    })
+
+
+def make_key(key_id):
+    return SimpleNamespace(
+        id=key_id,
+        upstream_id=UPSTREAM_ID,
+        key_value=f"sk-{key_id}",
+        value_prefix="",
+        location=KeyLocation.HEADER,
+        param_name="Authorization",
+        enable_quota=False,
+        quota_total=None,
+        quota_used=0,
+        quota_reset_at=None,
+        rate_limit_per_minute=0,
+        rate_limit_per_hour=0,
+        rate_limit_per_day=0,
+    )
+
+
+class RecordingProxy(ProxyService):
+    """不访问数据库、只记录每次尝试结果的代理服务"""
+    
+    def __init__(self):
+        super().__init__(db=None)
+        self.results = []
+    
+    async def _record_response(self, upstream, api_key, method, path, headers, body, client_ip, proxy_response):
+        self.results.append((api_key.id, proxy_response.status_code))
+    
+    async def _record_failure(self, upstream, api_key, method, path, headers, body, client_ip, latency_ms, message):
+        self.results.append((api_key.id, message))
+
+
+@pytest.fixture
+def key_pools(monkeypatch):
+    """每个测试使用独立的密钥池注册表，暂停状态不影响其他测试"""
+    registry = KeyPoolRegistry()
+    monkeypatch.setattr(proxy_module, "key_pools", registry)
+    monkeypatch.setattr(key_selector_module, "key_pools", registry)
+    return registry
+
+
+@pytest.fixture
+def upstream_calls(monkeypatch, key_pools):
+    """上游第一次返回429，之后返回200；记录每次请求使用的密钥"""
+    calls = []
+    
+    def handler(request):
+        calls.append(request.headers["authorization"])
+        return httpx.Response(429 if len(calls) == 1 else 200, json={"call": len(calls)})
+    
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    snapshot = RoutingSnapshot(version=-2, keys_by_upstream={UPSTREAM_ID: (make_key(1), make_key(2))})
+    monkeypatch.setattr(routing_cache, "_snapshot", snapshot)
+    monkeypatch.setattr(proxy_module.client_registry, "get_client", lambda upstream: client)
+    monkeypatch.setattr(proxy_module, "retry_budget", RetryBudget())
+    return calls
+
+
+async def forward(proxy, upstream):
+    return await proxy._forward(upstream, "GET", "/v1/models", {}, None, "127.0.0.1", None)
+
+
+@pytest.mark.asyncio
+async def test_429_fails_over_to_next_key_and_suspends_failed_key(upstream_calls, key_pools):
+    """测试上游返回429时让该密钥进入冷却，换另一个密钥重发并返回其响应"""
+    proxy = RecordingProxy()
+    response = await forward(proxy, make_upstream())
+    
+    assert response.status_code == 200
+    assert upstream_calls == ["sk-1", "sk-2"]
+    assert proxy.results == [(1, 429), (2, 200)]
+    assert key_pools.is_suspended(UPSTREAM_ID, 1)
+    assert not key_pools.is_suspended(UPSTREAM_ID, 2)
+    assert proxy_module.retry_budget.stats()["retries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_exhausted_retry_budget_returns_failed_response(monkeypatch, upstream_calls, key_pools):
+    """测试重试预算耗尽时不再换密钥，直接返回上游的429响应（密钥仍进入冷却）"""
+    monkeypatch.setattr(proxy_module, "retry_budget", RetryBudget(ratio=0, min_per_second=0))
+    proxy = RecordingProxy()
+    response = await forward(proxy, make_upstream())
+    
+    assert response.status_code == 429
+    assert upstream_calls == ["sk-1"]
+    assert key_pools.is_suspended(UPSTREAM_ID, 1)
+    assert proxy_module.retry_budget.stats()["rejected"] == 1
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from app.services.bulkhead import Bulkhead
+from app.services.fair_queue import FairQueue
+from app.core.exceptions import TooManyRequestsError
+
+
+@pytest.mark.asyncio
+async def test_weights_and_priorities_decide_dequeue_order():
+    """测试同一优先级按权重比例出队，高优先级先出队"""
+    queue = FairQueue()
+    loop = asyncio.get_running_loop()
+    names = {}
+    
+    for client, weight, priority, count in (("noisy", 1, 0, 6), ("paid", 2, 0, 6), ("admin", 1, 5, 2)):
+        for index in range(count):
+            waiter = loop.create_future()
+            names[waiter] = f"{client}{index}"
+            queue.push(client, waiter, weight, priority)
+    
+    order = []
+    while len(queue):
+        order.append(names[queue.pop()])
+    
+    assert order[:2] == ["admin0", "admin1"]
+    assert order[2:8] == ["noisy0", "paid0", "paid1", "noisy1", "paid2", "paid3"]
+    assert queue.pop() is None
+
+
+@pytest.mark.asyncio
+async def test_noisy_client_cannot_starve_quiet_client():
+    """测试排队多的客户端既不能阻塞其他客户端，队列满时也先被挤出"""
+    bulkhead = Bulkhead("test", limit=1, max_queue=4, queue_timeout=1, fair=True)
+    await bulkhead.acquire("noisy")
+    
+    order = []
+    
+    async def waiter(client):
+        await bulkhead.acquire(client)
+        order.append(client)
+        bulkhead.release()
+    
+    noisy = [asyncio.create_task(waiter("noisy")) for _ in range(4)]
+    await asyncio.sleep(0)
+    quiet = asyncio.create_task(waiter("quiet"))
+    await asyncio.sleep(0)
+    
+    # 队列已满：挤出 noisy 的最后一个请求而不是拒绝 quiet
+    assert bulkhead.queue_depth == 4
+    with pytest.raises(TooManyRequestsError):
+        await noisy[-1]
+    
+    bulkhead.release()
+    await asyncio.gather(quiet, *noisy[:-1])
+    assert order[:2] == ["noisy", "quiet"]
+    
+    clients = bulkhead.stats()["clients"]
+    assert clients["noisy"]["dropped"] == 1
+    assert clients["quiet"]["queued"] == 0
+    assert clients["quiet"]["wait_p99_ms"] is not None
+    assert bulkhead.active == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_never_evicts_higher_priority_clients():
+    """测试队列满时低优先级的新请求被拒绝，而高优先级的新请求挤掉最低优先级的请求"""
+    queue = FairQueue()
+    loop = asyncio.get_running_loop()
+    for _ in range(3):
+        queue.push("admin", loop.create_future(), priority=5)
+    assert queue.drop_longest("guest", priority=0) is None
+    
+    queue.push("batch", loop.create_future(), priority=0)
+    assert queue.drop_longest("batch", priority=0) is None
+    assert queue.drop_longest("vip", priority=3) is not None
+    assert queue.stats()["batch"]["dropped"] == 1
+    assert queue.drop_longest("vip", priority=3) is None
+    assert len(queue) == 3
@@ -0,0 +1,21 @@
+from types import SimpleNamespace
+
+from app.services.fallback import FallbackTarget
+
+
+def test_rewrites_path_by_longest_prefix_and_maps_headers():
+    """测试切换到备用上游时按最长前缀改写路径并映射请求头"""
+    target = FallbackTarget(
+        upstream=SimpleNamespace(id=2, name="backup"),
+        path_map={"/v1/": "/openai/v1/", "/v1/chat/": "/chat/"},
+        set_headers={"api-version": "2024-02-01"},
+        remove_headers=["X-Drop"]
+    )
+    
+    assert target.rewrite_path("v1/chat/completions") == "chat/completions"
+    assert target.rewrite_path("v1/embeddings") == "openai/v1/embeddings"
+    assert target.rewrite_path("v2/models") == "v2/models"
+    assert target.rewrite_headers({"x-drop": "1", "accept": "*/*"}) == {
+        "accept": "*/*",
+        "api-version": "2024-02-01",
+    }
@@ -0,0 +1,122 @@
+import asyncio
+from collections import namedtuple
+
+import pytest
+
+from app.services.key_pool import KeyPool
+from app.services.proxy import ProxyService
+
+Key = namedtuple("Key", "id enable_quota quota_total quota_used quota_reset_at")
+Upstream = namedtuple("Upstream", "id name key_selection_strategy")
+
+
+def make_keys(count):
+    return [Key(i + 1, False, None, 0, None) for i in range(count)]
+
+
+def test_strategies_skip_excluded_keys():
+    """测试对冲换密钥时各策略跳过被排除的密钥，即使它的负载代价最低"""
+    pool = KeyPool(1, make_keys(3))
+    for key_id, latency in ((1, 10), (2, 200), (3, 100)):
+        pool.acquire(key_id)
+        pool.report(key_id, latency, failed=False)
+    pool.acquire(1)
+    
+    assert pool.lowest_cost().id == 1
+    assert pool.lowest_cost(exclude={1}).id == 3
+    assert all(pool.p2c(exclude={1, 3}).id == 2 for _ in range(5))
+    assert pool.least_in_flight(exclude={2}).id == 3
+    assert {pool.next(exclude={1}).id for _ in range(4)} == {2, 3}
+    assert pool.random(exclude={1, 2, 3}) is None
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.closed = False
+    
+    async def aclose(self):
+        self.closed = True
+
+
+class FakeKeySelector:
+    """只记录调用的密钥选择器"""
+    
+    def __init__(self, hedge_key):
+        self.hedge_key = hedge_key
+        self.calls = []
+    
+    async def select_key(self, upstream_id, strategy, exclude=()):
+        return self.hedge_key
+    
+    def commit_usage(self, key, reserved=True):
+        self.calls.append(("commit", key.id, reserved))
+    
+    def report_result(self, key, latency_ms, failed):
+        self.calls.append(("report", key.id))
+
+
+class HedgingProxy(ProxyService):
+    """主请求按 sends 中的行为发送、不访问数据库的代理服务"""
+    
+    def __init__(self, sends, hedge_key):
+        super().__init__(db=None)
+        self.key_selector = FakeKeySelector(hedge_key)
+        self.sends = sends
+        self.failures = []
+    
+    async def _send(self, upstream, api_key, method, url, headers, body, retry_count=None):
+        return await self.sends[api_key.id]()
+    
+    async def _record_failure(self, upstream, api_key, method, path, headers, body, client_ip, latency_ms, message):
+        self.failures.append((api_key.id, message))
+
+
+async def send_hedged(proxy, primary_key):
+    return await proxy._send_hedged(
+        Upstream(1, "test", "ewma"), primary_key, "GET", "/x", "http://upstream/x",
+        {}, None, "127.0.0.1", None, delay=0.01
+    )
+
+
+@pytest.mark.asyncio
+async def test_hedge_wins_and_cancelled_primary_counts_usage_once():
+    """测试对冲请求先返回时取消主请求，主请求只计一次已用量（预留已在发送处释放）"""
+    primary_key, hedge_key = make_keys(2)
+    hedge_response = FakeResponse(200)
+    
+    async def slow():
+        await asyncio.sleep(1)
+    
+    async def fast():
+        return hedge_response
+    
+    proxy = HedgingProxy({1: slow, 2: fast}, hedge_key)
+    key, response = await send_hedged(proxy, primary_key)
+    
+    assert key is hedge_key and response is hedge_response
+    assert proxy.key_selector.calls == [("commit", 1, False), ("report", 1)]
+    assert [key_id for key_id, _ in proxy.failures] == [1]
+
+
+@pytest.mark.asyncio
+async def test_loser_finishing_during_cancel_is_closed_not_committed():
+    """测试落后一方在取消时刚好收到响应：关闭响应，不再重复提交配额"""
+    primary_key, hedge_key = make_keys(2)
+    late_response = FakeResponse(200)
+    
+    async def late():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            return late_response
+    
+    async def fast():
+        return FakeResponse(200)
+    
+    proxy = HedgingProxy({1: late, 2: fast}, hedge_key)
+    key, _ = await send_hedged(proxy, primary_key)
+    
+    assert key is hedge_key
+    assert late_response.closed
+    assert proxy.key_selector.calls == [("report", 1)]
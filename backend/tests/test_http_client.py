@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.http_client import UpstreamClientRegistry
+
+
+def make_upstream(**overrides):
+    return SimpleNamespace(**{
+        "id": 1,
+        "name": "test",
+        "connection_pool_size": 10,
+        "timeout": 30,
+        "connect_timeout": 10,
+        "pool_timeout": 10,
+        "keepalive_expiry": 30,
+        **overrides,
+    })
+
+
+@pytest.mark.asyncio
+async def test_client_is_reused_until_pool_config_changes():
+    """测试同一上游复用客户端，连接池配置变更时重建并延迟关闭旧客户端"""
+    registry = UpstreamClientRegistry()
+    upstream = make_upstream()
+    
+    client = registry.get_client(upstream)
+    assert registry.get_client(make_upstream(name="renamed")) is client
+    
+    rebuilt = registry.get_client(make_upstream(connection_pool_size=20))
+    assert rebuilt is not client
+    assert not client.is_closed
+    assert registry.get_client(make_upstream(connection_pool_size=20)) is rebuilt
+    
+    await registry.aclose()
+    assert client.is_closed and rebuilt.is_closed
+
+
+@pytest.mark.asyncio
+async def test_closed_client_is_replaced():
+    """测试已关闭的客户端不再被复用"""
+    registry = UpstreamClientRegistry()
+    client = registry.get_client(make_upstream())
+    await client.aclose()
+    
+    assert registry.get_client(make_upstream()) is not client
+    await registry.aclose()
@@ -0,0 +1,39 @@
+from collections import namedtuple
+
+from app.services.key_pacing import KeyPacer, parse_rate_limit_headers, parse_reset
+from app.services.key_pool import key_pools
+
+Key = namedtuple("Key", "id upstream_id")
+
+
+def test_parse_rate_limit_headers():
+    """测试解析常见格式的限流响应头"""
+    hint = parse_rate_limit_headers({
+        "X-RateLimit-Remaining": "0",
+        "X-RateLimit-Reset": "1m30s",
+        "Retry-After": "7",
+    })
+    assert hint.remaining == 0
+    assert hint.reset_after == 90
+    assert hint.retry_after == 7
+    
+    assert parse_reset("250ms") == 0.25
+    assert parse_reset("12") == 12
+    assert parse_reset("soon") is None
+
+
+def test_pacer_suspends_key_when_budget_runs_out():
+    """测试额度用尽和收到429时暂停密钥"""
+    pacer = KeyPacer()
+    key = Key(id=101, upstream_id=901)
+    
+    pacer.observe(key, 200, {"x-ratelimit-remaining": "2", "x-ratelimit-reset": "30"})
+    pacer.consume(key)
+    assert not key_pools.is_suspended(901, 101)
+    pacer.consume(key)
+    assert key_pools.is_suspended(901, 101)
+    
+    other = Key(id=102, upstream_id=901)
+    pacer.observe(other, 429, {})
+    assert key_pools.is_suspended(901, 102)
+    assert 0 < key_pools.next_resume_in(901) <= 30
@@ -0,0 +1,83 @@
+from collections import namedtuple
+
+from app.services.key_pool import KeyPool
+from app.services.quota import quota_ledger
+
+Key = namedtuple("Key", "id enable_quota quota_total quota_used quota_reset_at")
+
+
+def make_keys(count, **overrides):
+    return [
+        Key(**{
+            "id": i + 1,
+            "enable_quota": False,
+            "quota_total": None,
+            "quota_used": 0,
+            "quota_reset_at": None,
+            **overrides,
+        })
+        for i in range(count)
+    ]
+
+
+def test_round_robin_rotates_through_all_keys():
+    """测试轮询依次使用每个密钥"""
+    pool = KeyPool(1, make_keys(3))
+    picked = [pool.next().id for _ in range(6)]
+    assert picked == [1, 2, 3, 1, 2, 3]
+
+
+def test_mark_unavailable_and_available():
+    """测试密钥移出和放回可用集合"""
+    pool = KeyPool(1, make_keys(4))
+    assert pool.mark_unavailable(2)
+    assert not pool.mark_unavailable(2)
+    assert len(pool) == 3
+    assert 2 not in pool
+    assert {pool.next().id for _ in range(6)} == {1, 3, 4}
+    
+    assert pool.mark_available(2)
+    assert len(pool) == 4
+    assert {pool.next().id for _ in range(8)} == {1, 2, 3, 4}
+
+
+def test_exhausted_quota_keys_are_excluded():
+    """测试配额耗尽的密钥不进入可用集合"""
+    keys = make_keys(2, enable_quota=True, quota_total=10)
+    keys[0] = keys[0]._replace(quota_used=10)
+    quota_ledger.reset({1: 10, 2: 0})
+    pool = KeyPool(1, keys)
+    assert [key.id for key in pool.available_keys()] == [2]
+    
+    quota_ledger.reset({1: 0})
+    pool.update_key(keys[0]._replace(quota_used=0))
+    assert len(pool) == 2
+
+
+def test_least_in_flight_prefers_idle_keys():
+    """测试最少进行中请求策略避开繁忙密钥"""
+    pool = KeyPool(1, make_keys(3))
+    pool.acquire(1)
+    pool.acquire(2)
+    assert pool.least_in_flight().id == 3
+    
+    pool.report(1, 10, failed=False)
+    pool.acquire(3)
+    assert pool.least_in_flight().id == 1
+
+
+def test_cost_based_selection_avoids_slow_and_failing_keys():
+    """测试EWMA与二选一策略避开高延迟或高错误率的密钥"""
+    pool = KeyPool(1, make_keys(2))
+    for _ in range(5):
+        pool.acquire(1)
+        pool.report(1, 200, failed=False)
+        pool.acquire(2)
+        pool.report(2, 50, failed=False)
+    assert pool.lowest_cost().id == 2
+    assert all(pool.p2c().id == 2 for _ in range(10))
+    
+    for _ in range(5):
+        pool.acquire(2)
+        pool.report(2, 50, failed=True)
+    assert pool.lowest_cost().id == 1
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from app.services.post_response import PostResponsePipeline, CompletionRecord
+
+
+class RecordingPipeline(PostResponsePipeline):
+    """不访问数据库、只记录处理顺序的管道"""
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.processed = []
+    
+    async def _process(self, record):
+        await asyncio.sleep(0.01)
+        self.processed.append(record.path)
+
+
+def make_record(path, **overrides):
+    return CompletionRecord(upstream_id=1, api_key_id=1, method="GET", path=path, client_ip=None, latency_ms=5, **overrides)
+
+
+@pytest.mark.asyncio
+async def test_processes_inline_when_not_started():
+    """测试管道未启动时直接在调用方处理"""
+    pipeline = RecordingPipeline()
+    await pipeline.submit(make_record("/a"))
+    
+    assert pipeline.processed == ["/a"]
+    assert pipeline.stats()["inline"] == 1
+
+
+@pytest.mark.asyncio
+async def test_full_queue_applies_backpressure_and_drain_finishes_all():
+    """测试队列已满时提交方等待而不是丢弃，关闭时处理完剩余记录"""
+    pipeline = RecordingPipeline(max_queue_size=1, workers=1)
+    pipeline.start()
+    
+    for index in range(4):
+        await pipeline.submit(make_record(f"/{index}"))
+    await pipeline.drain()
+    
+    assert pipeline.processed == ["/0", "/1", "/2", "/3"]
+    stats = pipeline.stats()
+    assert stats["backpressure_waits"] > 0
+    assert stats["workers"] == 0 and not pipeline.running
+
+
+def test_record_success_requires_status_and_no_error():
+    """测试只有收到响应且没有错误的记录才评估规则"""
+    assert make_record("/a", status_code=200).succeeded
+    assert not make_record("/a").succeeded
+    assert not make_record("/a", status_code=200, error_message="对冲请求落后").succeeded
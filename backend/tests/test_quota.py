@@ -0,0 +1,65 @@
+from collections import namedtuple
+
+from app.services.quota import QuotaLedger
+
+Key = namedtuple(
+    "Key",
+    "id enable_quota quota_total quota_used auto_disable_on_failure auto_enable_delay_hours"
+)
+
+
+def make_key(**overrides):
+    return Key(**{
+        "id": 1,
+        "enable_quota": True,
+        "quota_total": 3,
+        "quota_used": 1,
+        "auto_disable_on_failure": True,
+        "auto_enable_delay_hours": None,
+        **overrides,
+    })
+
+
+def test_reservations_never_exceed_quota():
+    """测试预留加已用量不会超过配额"""
+    ledger = QuotaLedger()
+    key = make_key()
+    
+    assert ledger.reserve(key)
+    assert ledger.reserve(key)
+    assert not ledger.reserve(key)
+    
+    ledger.release(key)
+    assert ledger.reserve(key)
+    assert ledger.stats()["rejected"] == 1
+
+
+def test_commit_reports_exhaustion_and_queues_disable():
+    """测试提交用尽配额时返回True并等待回写禁用状态"""
+    ledger = QuotaLedger()
+    key = make_key()
+    
+    ledger.reserve(key)
+    ledger.reserve(key)
+    assert not ledger.commit(key)
+    assert ledger.commit(key)
+    assert ledger.exhausted(key)
+    assert ledger.stats()["pending_updates"] == 2
+    assert ledger._to_disable == {1: None}
+    
+    ledger.reset({1: 0})
+    assert not ledger.exhausted(key)
+
+
+def test_reset_ignores_stale_snapshot_and_pending_usage():
+    """测试重置后即使以旧快照访问也从新值计数，重置前未回写的用量被丢弃"""
+    ledger = QuotaLedger()
+    stale = make_key(quota_used=3)
+    
+    ledger.reserve(make_key())
+    ledger.commit(make_key())
+    ledger.reset({1: 0})
+    
+    assert not ledger.exhausted(stale)
+    assert ledger.used(stale) == 0
+    assert ledger.stats()["pending_updates"] == 0
@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+from app.services.rate_limiter import RateLimiter
+
+
+def test_rejects_over_limit_and_reports_remaining():
+    """测试超过限制后拒绝，并返回剩余次数"""
+    limiter = RateLimiter()
+    results = [asyncio.run(limiter.check_rate_limit("k", 3, 60)) for _ in range(4)]
+    
+    assert [r["allowed"] for r in results] == [True, True, True, False]
+    assert [r["remaining"] for r in results] == [2, 1, 0, 0]
+    assert results[-1]["current"] == 3
+
+
+def test_previous_window_decays_as_window_slides():
+    """测试上一个窗口的请求数随窗口滑动按比例折算"""
+    limiter = RateLimiter()
+    window = 0.2
+    # 对齐到窗口起点附近，保证请求都落在同一个窗口
+    time.sleep(window - time.monotonic() % window)
+    for _ in range(4):
+        assert limiter.hit("k", 4, window)[0]
+    assert not limiter.hit("k", 4, window)[0]
+    
+    # 进入下一个窗口的后半段，上一个窗口的 4 次请求最多折算为 2 次
+    time.sleep(window + window * 0.6 - time.monotonic() % window)
+    allowed = [limiter.hit("k", 4, window)[0] for _ in range(4)]
+    assert allowed[:2] == [True, True]
+    assert not allowed[-1]
+    
+    # 两个窗口后计数完全清零
+    time.sleep(window * 2)
+    assert all(limiter.hit("k", 4, window)[0] for _ in range(4))
+
+
+def test_batched_check_charges_all_windows_only_when_all_allow():
+    """测试批量检查任一窗口超限时不计入其他窗口，并返回对应响应头"""
+    limiter = RateLimiter()
+    checks = [("client:minute", 2, 60), ("upstream:minute", 5, 60)]
+    
+    first = limiter.check_many(checks)
+    assert first.allowed and first.key == "client:minute" and first.remaining == 1
+    limiter.check_many(checks)
+    
+    rejected = limiter.check_many(checks)
+    assert not rejected.allowed
+    assert rejected.headers()["X-RateLimit-Limit"] == "2"
+    assert int(rejected.headers()["Retry-After"]) >= 1
+    
+    # 被拒绝的请求没有计入上游窗口
+    assert limiter.check_many([("upstream:minute", 5, 60)]).remaining == 2
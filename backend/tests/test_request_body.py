@@ -0,0 +1,45 @@
+import pytest
+
+from app.services.request_body import StreamedRequestBody, body_for_log
+
+
+async def chunks(*parts):
+    for part in parts:
+        yield part
+
+
+async def read(body):
+    return b"".join([chunk async for chunk in body])
+
+
+@pytest.mark.asyncio
+async def test_replayable_body_resends_same_bytes():
+    """测试可重放的请求体第二次读取时得到相同的字节（超出内存上限时落盘）"""
+    body = StreamedRequestBody(chunks(b"abc", b"", b"def" * 10), replayable=True, spool_max_memory=8)
+    
+    first = await read(body)
+    assert first == b"abc" + b"def" * 10
+    assert await read(body) == first
+    assert body.size == len(first)
+    body.close()
+
+
+@pytest.mark.asyncio
+async def test_non_replayable_body_cannot_be_read_twice():
+    """测试不可重放的请求体被消费后再次读取时报错"""
+    body = StreamedRequestBody(chunks(b"abc"))
+    assert await read(body) == b"abc"
+    
+    with pytest.raises(RuntimeError):
+        await read(body)
+
+
+@pytest.mark.asyncio
+async def test_capture_stops_at_limit():
+    """测试为日志保留的片段截断在 capture_limit 处，转发的内容不受影响"""
+    body = StreamedRequestBody(chunks(b"hello ", b"world"), capture_limit=8)
+    
+    assert await read(body) == b"hello world"
+    assert body.preview() == "hello wo"
+    assert body_for_log(body, 1024) == "hello wo"
+    assert StreamedRequestBody(chunks(b"x")).preview() is None
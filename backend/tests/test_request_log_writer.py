@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from app.services import logger as log_module
+from app.services.logger import RequestLogWriter, OverflowPolicy
+
+
+class FakeInsert:
+    def values(self, rows):
+        return list(rows)
+
+
+class FakeSession:
+    """不访问数据库、只记录每次写入批次的会话"""
+    
+    def __init__(self, batches, delay):
+        self.batches = batches
+        self.delay = delay
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc):
+        return False
+    
+    async def execute(self, rows):
+        await asyncio.sleep(self.delay)
+        self.batches.append(rows)
+    
+    async def commit(self):
+        pass
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """返回已写入的批次列表"""
+    written = []
+    monkeypatch.setattr(log_module, "insert", lambda model: FakeInsert())
+    monkeypatch.setattr(log_module, "AsyncSessionLocal", lambda: FakeSession(written, 0))
+    return written
+
+
+def make_row(index):
+    return {"path": f"/{index}", "request_body": "body", "response_body": "body"}
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_written_at_once_and_remainder_on_timer(batches):
+    """测试攒满 batch_size 立即写入，不足一批的剩余部分在刷新间隔到期时写入"""
+    writer = RequestLogWriter(batch_size=4, flush_interval_ms=50)
+    writer.start()
+    
+    for index in range(6):
+        await writer.enqueue(make_row(index))
+    await asyncio.sleep(0.01)
+    assert [len(batch) for batch in batches] == [4]
+    
+    await asyncio.sleep(0.08)
+    assert [len(batch) for batch in batches] == [4, 2]
+    assert writer.stats()["written"] == 6
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_drop_bodies_over_soft_limit_and_drop_at_capacity(batches):
+    """测试超过80%软上限时drop_bodies策略去掉请求体和响应体，达到容量上限时丢弃"""
+    writer = RequestLogWriter(batch_size=100, max_queue_size=10)
+    
+    accepted = [await writer.enqueue(make_row(index)) for index in range(12)]
+    
+    assert accepted == [True] * 10 + [False] * 2
+    stats = writer.stats()
+    assert stats["bodies_dropped"] == 2 and stats["dropped"] == 2
+    
+    await writer.flush()
+    rows = batches[0]
+    assert rows[7]["request_body"] == "body"
+    assert rows[8]["request_body"] is None and rows[9]["response_body"] is None
+
+
+@pytest.mark.asyncio
+async def test_sample_keeps_one_in_n_over_soft_limit(batches):
+    """测试超过软上限时sample策略每N条保留1条"""
+    writer = RequestLogWriter(batch_size=100, max_queue_size=100, overflow_policy=OverflowPolicy.SAMPLE, sample_rate=3)
+    
+    accepted = [await writer.enqueue(make_row(index)) for index in range(89)]
+    
+    assert all(accepted[:80])
+    assert accepted[80:] == [False, False, True] * 3
+    assert writer.stats()["sampled_out"] == 6
+
+
+@pytest.mark.asyncio
+async def test_block_waits_for_room_instead_of_dropping(batches):
+    """测试block策略在队列满时等待刷新腾出空间，不丢弃记录"""
+    writer = RequestLogWriter(batch_size=2, flush_interval_ms=1000, max_queue_size=4, overflow_policy=OverflowPolicy.BLOCK)
+    writer.start()
+    
+    for index in range(10):
+        assert await writer.enqueue(make_row(index))
+    await writer.stop()
+    
+    stats = writer.stats()
+    assert stats["blocked"] > 0 and stats["dropped"] == 0
+    assert [row["path"] for batch in batches for row in batch] == [f"/{index}" for index in range(10)]
+
+
+@pytest.mark.asyncio
+async def test_stop_waits_for_in_flight_batch_and_drains_queue(monkeypatch, batches):
+    """测试停止时等待正在写入的批次完成，并写入队列中的剩余日志"""
+    monkeypatch.setattr(log_module, "AsyncSessionLocal", lambda: FakeSession(batches, 0.02))
+    writer = RequestLogWriter(batch_size=5, flush_interval_ms=1000)
+    writer.start()
+    
+    for index in range(12):
+        await writer.enqueue(make_row(index))
+    await asyncio.sleep(0.005)
+    await writer.stop()
+    
+    assert [len(batch) for batch in batches] == [5, 5, 2]
+    assert writer.stats()["dropped"] == 0 and not writer.running
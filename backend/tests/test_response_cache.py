@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.response_cache import ResponseCache, is_deterministic, normalize_body
+
+
+def test_normalized_body_ignores_key_order_and_whitespace():
+    """测试JSON请求体规范化后键顺序和空白不影响缓存键"""
+    assert normalize_body(b'{"b": 1, "a": [1, 2]}') == normalize_body(b'{"a":[1,2],"b":1}')
+    assert is_deterministic(b'{"input": "text"}')
+    assert is_deterministic(b'{"messages": [], "temperature": 0}')
+    assert not is_deterministic(b'{"messages": []}')
+    assert not is_deterministic(b'{"input": "text", "stream": true}')
+
+
+@pytest.mark.asyncio
+async def test_memory_tier_evicts_least_recently_used_by_bytes():
+    """测试内存层按字节上限淘汰最久未使用的条目，并遵循 Cache-Control"""
+    cache = ResponseCache(memory_bytes=10, max_entry_bytes=10)
+    upstream = SimpleNamespace(id=1, cache_ttl_seconds=60)
+    
+    assert await cache.put(upstream, "a", 200, {}, b"aaaa")
+    assert await cache.put(upstream, "b", 200, {}, b"bbbb")
+    assert await cache.get(1, "a", {}) is not None
+    assert await cache.put(upstream, "c", 200, {}, b"cccc")
+    
+    assert await cache.get(1, "b", {}) is None
+    assert await cache.get(1, "a", {}) is not None
+    assert not await cache.put(upstream, "d", 200, {"Cache-Control": "no-store"}, b"d")
+    assert not await cache.put(upstream, "e", 500, {}, b"e")
+
+
+@pytest.mark.asyncio
+async def test_vary_headers_split_key_and_set_cookie_is_not_stored():
+    """测试 cache_vary_headers 中的请求头参与缓存键，Set-Cookie 不写入缓存"""
+    cache = ResponseCache(memory_bytes=1024, max_entry_bytes=1024)
+    upstream = SimpleNamespace(id=1, enable_response_cache=True, cache_ttl_seconds=60, cache_vary_headers=["Accept-Language"])
+    
+    def key(headers):
+        return cache.key_for(upstream, "get", "/v1/models", headers, None)
+    
+    assert key({"accept-language": "en"}) == key({"Accept-Language": "en", "X-Trace-Id": "1"})
+    assert key({"accept-language": "en"}) != key({"accept-language": "zh"})
+    assert key({}) != key({"accept-language": "en"})
+    
+    assert await cache.put(upstream, "k", 200, {"Content-Type": "application/json", "Set-Cookie": "session=1"}, b"{}")
+    entry = await cache.get(1, "k", {})
+    assert entry.headers == {"Content-Type": "application/json"}
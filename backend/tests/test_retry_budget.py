@@ -0,0 +1,15 @@
+from app.services.retry_budget import RetryBudget
+
+
+def test_retries_limited_to_ratio_of_requests():
+    """测试重试次数不超过请求数的固定比例"""
+    budget = RetryBudget(ratio=0.2, min_per_second=0, window_seconds=10)
+    for _ in range(10):
+        budget.record_request()
+    
+    assert budget.can_retry()
+    budget.record_retry()
+    assert budget.can_retry()
+    budget.record_retry()
+    assert not budget.can_retry()
+    assert budget.stats()["rejected"] == 1
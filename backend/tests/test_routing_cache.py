@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from app.core import database
+from app.models import Upstream, APIKey, Rule, HeaderConfig
+from app.models.api_key import KeyStatus
+from app.services import routing_cache as routing_cache_module
+from app.services.routing_cache import RoutingCache
+
+
+@pytest_asyncio.fixture
+async def session_factory(monkeypatch, tmp_path):
+    """基于临时SQLite文件的会话工厂，经 init_db 建表并预置版本行"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'routing.db'}")
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(routing_cache_module, "AsyncSessionLocal", factory)
+    await database.init_db()
+    yield factory
+    await engine.dispose()
+
+
+async def seed(factory):
+    async with factory() as db:
+        upstream = Upstream(name="openai", base_url="https://api.example.com")
+        disabled = Upstream(name="legacy", base_url="https://old.example.com", is_enabled=False)
+        db.add_all([upstream, disabled])
+        await db.flush()
+        db.add_all([
+            APIKey(upstream_id=upstream.id, name="a", key_value="sk-a"),
+            APIKey(upstream_id=upstream.id, name="b", key_value="sk-b", status=KeyStatus.DISABLED),
+            Rule(upstream_id=upstream.id, name="low", conditions={}, actions=[], priority=1),
+            Rule(
+                upstream_id=upstream.id,
+                name="high",
+                conditions={"field": "response_body", "operator": "regex", "value": "quota"},
+                actions=[],
+                priority=9
+            ),
+            HeaderConfig(upstream_id=upstream.id, header_name="X-Test", static_value="1"),
+        ])
+        await db.commit()
+        return upstream.id
+
+
+@pytest.mark.asyncio
+async def test_snapshot_contains_only_enabled_config(session_factory):
+    """测试快照只包含启用的上游和ACTIVE密钥，规则按优先级排序并预编译正则"""
+    upstream_id = await seed(session_factory)
+    snapshot = await RoutingCache().load()
+    
+    assert snapshot.version == 0
+    assert snapshot.get_upstream("openai").id == upstream_id
+    assert snapshot.get_upstream("legacy") is None
+    assert [key.name for key in snapshot.active_keys(upstream_id)] == ["a"]
+    
+    rules = snapshot.active_rules(upstream_id)
+    assert [rule.name for rule in rules] == ["high", "low"]
+    assert rules[0].conditions["_pattern"].search("quota exceeded")
+    assert [header.header_name for header in snapshot.header_configs(upstream_id)] == ["X-Test"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_invalidations_each_bump_version(session_factory):
+    """测试重复启动不会重复预置版本行，并发失效时每次都递增版本号"""
+    await database.init_db()
+    cache = RoutingCache()
+    await cache.load()
+    
+    async def invalidate():
+        async with session_factory() as db:
+            await cache.invalidate(db)
+    
+    await asyncio.gather(invalidate(), invalidate())
+    assert cache.snapshot.version == 2
+
+
+@pytest.mark.asyncio
+async def test_poll_reloads_when_another_worker_bumps_version(session_factory):
+    """测试其他进程递增版本后轮询重新加载快照，版本未变时保持原快照"""
+    upstream_id = await seed(session_factory)
+    worker, other_worker = RoutingCache(), RoutingCache()
+    await worker.load()
+    await other_worker.load()
+    
+    unchanged = worker.snapshot
+    await worker.poll()
+    assert worker.snapshot is unchanged
+    
+    async with session_factory() as db:
+        upstream = await db.get(Upstream, upstream_id)
+        upstream.name = "renamed"
+        await db.commit()
+        await other_worker.invalidate(db)
+    
+    await worker.poll()
+    assert worker.snapshot is not unchanged
+    assert worker.snapshot.version == 1
+    assert worker.snapshot.get_upstream("renamed").id == upstream_id
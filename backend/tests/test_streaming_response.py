@@ -0,0 +1,65 @@
+import time
+
+import httpx
+import pytest
+
+from app.services.proxy import StreamingProxyResponse
+
+
+async def chunks(*parts, error=None):
+    for part in parts:
+        yield part
+    if error is not None:
+        raise error
+
+
+def make_stream(content, buffer_limit):
+    completed = []
+    released = []
+    
+    async def on_complete(proxy_response, error):
+        completed.append((proxy_response, error))
+    
+    stream = StreamingProxyResponse(
+        httpx.Response(200, headers={"content-type": "text/event-stream"}, content=content),
+        headers={"content-type": "text/event-stream"},
+        start_time=time.time(),
+        on_complete=on_complete,
+        buffer_limit=buffer_limit
+    )
+    stream.add_finish_callback(lambda: released.append(True))
+    return stream, completed, released
+
+
+@pytest.mark.asyncio
+async def test_forwards_every_chunk_and_keeps_bounded_copy():
+    """测试逐块转发完整响应体，只为规则和日志保留 buffer_limit 字节"""
+    stream, completed, released = make_stream(chunks(b"data: 1\n\n", b"data: 2\n\n"), buffer_limit=12)
+    
+    forwarded = [chunk async for chunk in stream.iter_bytes()]
+    assert b"".join(forwarded) == b"data: 1\n\ndata: 2\n\n"
+    
+    await stream.finalize()
+    proxy_response, error = completed[0]
+    assert proxy_response.body == "data: 1\n\ndat"
+    assert error is None
+    assert released == [True]
+
+
+@pytest.mark.asyncio
+async def test_upstream_error_mid_stream_is_reported_on_finalize():
+    """测试上游中途断开时异常继续抛给客户端，结束回调仍执行并带上错误信息"""
+    stream, completed, released = make_stream(
+        chunks(b"partial", error=httpx.ReadError("connection reset")),
+        buffer_limit=1024
+    )
+    
+    with pytest.raises(httpx.ReadError):
+        async for _ in stream.iter_bytes():
+            pass
+    
+    await stream.finalize()
+    proxy_response, error = completed[0]
+    assert proxy_response.body == "partial"
+    assert error == "connection reset"
+    assert released == [True]
@@ -0,0 +1,66 @@
+import random
+import time
+
+from app.services.counter_backend import LocalCounterBackend, NS_PER_SECOND
+from app.services.timer_wheel import TimerWheel
+
+
+def test_items_fire_on_first_advance_past_deadline_across_levels():
+    """测试各层定时项都在越过到期时间的第一次推进时到期，且不会提前"""
+    wheel = TimerWheel(tick_ns=1, now_ns=0)
+    deadlines = {item: random.randint(1, 300_000) for item in range(2000)}
+    for item, deadline in deadlines.items():
+        wheel.schedule(item, deadline)
+    
+    now = 0
+    fired = {}
+    while len(wheel):
+        now += random.randint(1, 500)
+        wheel.advance(now)
+        while wheel.ready:
+            item, deadline = wheel.ready.popleft()
+            assert deadline <= now
+            fired[item] = now
+    
+    assert fired.keys() == deadlines.keys()
+    assert all(fired[item] - deadlines[item] < 500 for item in fired)
+
+
+def test_local_backend_expires_renewed_keys_lazily_and_evicts_lru():
+    """测试续期的键到期出轮后重新登记，超过键数上限时淘汰最久未访问的过期键"""
+    clock = [time.monotonic_ns()]
+    backend = LocalCounterBackend(max_keys=3)
+    backend.now_ns = lambda: clock[0]
+    
+    backend.set("quota", 5)
+    backend.incr("a", 1, ttl=10)
+    backend.incr("b", 1, ttl=10)
+    clock[0] += 8 * NS_PER_SECOND
+    backend.incr("a", 1, ttl=10)
+    
+    clock[0] += 3 * NS_PER_SECOND
+    assert backend.purge() == 1
+    assert backend.get("a") == 2 and backend.get("b") == 0
+    
+    backend.incr("c", 1, ttl=10)
+    backend.incr("d", 1, ttl=10)
+    stats = backend.stats()
+    assert stats["keys"] == 3 and stats["evictions"] == 1
+    assert backend.get("quota") == 5 and backend.get("a") == 0
+    
+    clock[0] += 20 * NS_PER_SECOND
+    purged = backend.purge(budget=1)
+    assert backend.purge_backlog
+    assert purged + backend.purge() == 2
+    assert backend.stats()["keys"] == 1
+
+
+def test_local_backend_never_evicts_quota_reservations():
+    """测试键数超过上限时不淘汰带过期时间的配额预留"""
+    backend = LocalCounterBackend(max_keys=2)
+    backend.incr("quota:1:reserved", 1, ttl=600)
+    backend.incr("rl:a:0", 1, ttl=60)
+    backend.incr("rl:b:0", 1, ttl=60)
+    
+    assert backend.get("quota:1:reserved") == 1
+    assert backend.get("rl:a:0") == 0
@@ -0,0 +1,29 @@
+import random
+
+from app.services.weighted_sampler import WeightedSampler
+
+
+def test_sampling_follows_weights():
+    """测试采样频率与权重成比例，权重为0的位置不会被选中"""
+    sampler = WeightedSampler([1, 0, 3])
+    rng = random.Random(42)
+    counts = [0, 0, 0]
+    for _ in range(4000):
+        counts[sampler.sample(rng)] += 1
+    
+    assert counts[1] == 0
+    assert 2.5 < counts[2] / counts[0] < 3.5
+
+
+def test_update_changes_total_and_distribution():
+    """测试更新权重后总和与采样结果同步变化"""
+    sampler = WeightedSampler([5, 5, 5, 5, 5])
+    assert sampler.total == 25
+    
+    for index in range(4):
+        sampler.update(index, 0)
+    assert sampler.total == 5
+    assert sampler.sample() == 4
+    
+    sampler.update(4, 0)
+    assert sampler.sample() is None
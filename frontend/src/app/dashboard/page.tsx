@@ -3,7 +3,7 @@
 import { useEffect, useState } from "react"
 import { Layout } from "@/components/Layout"
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/Card"
-import { dashboardApi, logsApi } from "@/lib/api"
+import { dashboardApi, logsApi, upstreamsApi } from "@/lib/api"
 
 interface Stats {
   today_requests: number
@@ -13,6 +13,29 @@ interface Stats {
   average_latency_ms: number
 }
 
+interface BreakerStatus {
+  name: string
+  state: "closed" | "open" | "half_open"
+  consecutive_failures: number
+  window_requests: number
+  window_failures: number
+  rejected: number
+  retry_after: number | null
+  open_keys: number[]
+}
+
+interface CacheStats {
+  memory_hits: number
+  disk_hits: number
+  misses: number
+  bypassed: number
+  hit_ratio: number | null
+  memory_entries: number
+  memory_bytes: number
+  disk_enabled: boolean
+  disk_bytes: number
+}
+
 interface RecentRequest {
   id: number
   method: string
@@ -25,6 +48,8 @@ interface RecentRequest {
 export default function DashboardPage() {
   const [stats, setStats] = useState<Stats | null>(null)
   const [recentRequests, setRecentRequests] = useState<RecentRequest[]>([])
+  const [breakers, setBreakers] = useState<Record<string, BreakerStatus>>({})
+  const [cache, setCache] = useState<CacheStats | null>(null)
   const [loading, setLoading] = useState(true)
 
   useEffect(() => {
@@ -35,12 +60,15 @@ export default function DashboardPage() {
 
   const loadData = async () => {
     try {
-      const [statsRes, realtimeRes] = await Promise.all([
+      const [statsRes, realtimeRes, runtimeRes] = await Promise.all([
         dashboardApi.stats(),
-        dashboardApi.realtime(10)
+        dashboardApi.realtime(10),
+        dashboardApi.runtime()
       ])
       setStats(statsRes.data)
       setRecentRequests(realtimeRes.data.recent_requests)
+      setBreakers(runtimeRes.data.circuit_breakers || {})
+      setCache(runtimeRes.data.response_cache || null)
       setLoading(false)
     } catch (error) {
       console.error("加载数据失败:", error)
@@ -48,6 +76,21 @@ export default function DashboardPage() {
     }
   }
 
+  const resetBreaker = async (upstreamId: string) => {
+    try {
+      await upstreamsApi.setBreaker(Number(upstreamId), "reset")
+      loadData()
+    } catch (error) {
+      console.error("重置熔断器失败:", error)
+    }
+  }
+
+  const breakerLabels: Record<BreakerStatus["state"], { text: string; color: string }> = {
+    closed: { text: "正常", color: "bg-green-100 text-green-800" },
+    half_open: { text: "探测中", color: "bg-yellow-100 text-yellow-800" },
+    open: { text: "已熔断", color: "bg-red-100 text-red-800" },
+  }
+
   const getStatusColor = (statusCode: number | null) => {
     if (!statusCode) return "bg-gray-100 text-gray-800"
     if (statusCode >= 200 && statusCode < 300) return "bg-green-100 text-green-800"
@@ -200,6 +243,97 @@ export default function DashboardPage() {
           </CardContent>
         </Card>
 
+        {/* 熔断器状态 */}
+        {Object.keys(breakers).length > 0 && (
+          <Card>
+            <CardHeader>
+              <CardTitle>熔断器</CardTitle>
+            </CardHeader>
+            <CardContent>
+              <div className="overflow-x-auto">
+                <table className="w-full">
+                  <thead>
+                    <tr className="border-b border-gray-200">
+                      <th className="text-left py-3 px-4 text-sm font-medium text-gray-700">上游</th>
+                      <th className="text-left py-3 px-4 text-sm font-medium text-gray-700">状态</th>
+                      <th className="text-left py-3 px-4 text-sm font-medium text-gray-700">窗口失败/请求</th>
+                      <th className="text-left py-3 px-4 text-sm font-medium text-gray-700">已拒绝</th>
+                      <th className="text-left py-3 px-4 text-sm font-medium text-gray-700">操作</th>
+                    </tr>
+                  </thead>
+                  <tbody>
+                    {Object.entries(breakers).map(([upstreamId, breaker]) => (
+                      <tr key={upstreamId} className="border-b border-gray-100 hover:bg-gray-50">
+                        <td className="py-3 px-4 text-sm text-gray-900">{breaker.name}</td>
+                        <td className="py-3 px-4">
+                          <span className={`inline-flex items-center px-2.5 py-0.5 rounded text-xs font-medium ${breakerLabels[breaker.state].color}`}>
+                            {breakerLabels[breaker.state].text}
+                            {breaker.retry_after ? `（${breaker.retry_after}秒后探测）` : ""}
+                          </span>
+                        </td>
+                        <td className="py-3 px-4 text-sm text-gray-900">
+                          {breaker.window_failures} / {breaker.window_requests}
+                        </td>
+                        <td className="py-3 px-4 text-sm text-gray-900">{breaker.rejected}</td>
+                        <td className="py-3 px-4">
+                          {breaker.state !== "closed" && (
+                            <button
+                              onClick={() => resetBreaker(upstreamId)}
+                              className="text-sm text-blue-600 hover:text-blue-800"
+                            >
+                              重置
+                            </button>
+                          )}
+                        </td>
+                      </tr>
+                    ))}
+                  </tbody>
+                </table>
+              </div>
+            </CardContent>
+          </Card>
+        )}
+
+        {/* 响应缓存 */}
+        {cache && cache.memory_hits + cache.disk_hits + cache.misses > 0 && (
+          <Card>
+            <CardHeader>
+              <CardTitle>响应缓存</CardTitle>
+            </CardHeader>
+            <CardContent>
+              <div className="grid grid-cols-2 md:grid-cols-4 gap-4 text-sm">
+                <div>
+                  <div className="text-gray-500">命中率</div>
+                  <div className="text-2xl font-bold text-gray-900">
+                    {((cache.hit_ratio || 0) * 100).toFixed(1)}%
+                  </div>
+                </div>
+                <div>
+                  <div className="text-gray-500">命中（内存 / 磁盘）</div>
+                  <div className="text-2xl font-bold text-gray-900">
+                    {cache.memory_hits} / {cache.disk_hits}
+                  </div>
+                </div>
+                <div>
+                  <div className="text-gray-500">未命中 / 跳过</div>
+                  <div className="text-2xl font-bold text-gray-900">
+                    {cache.misses} / {cache.bypassed}
+                  </div>
+                </div>
+                <div>
+                  <div className="text-gray-500">内存占用</div>
+                  <div className="text-2xl font-bold text-gray-900">
+                    {(cache.memory_bytes / 1024 / 1024).toFixed(1)} MB
+                  </div>
+                  <p className="text-gray-500 mt-1">
+                    {cache.memory_entries} 条{cache.disk_enabled ? `，磁盘 ${(cache.disk_bytes / 1024 / 1024).toFixed(1)} MB` : ""}
+                  </p>
+                </div>
+              </div>
+            </CardContent>
+          </Card>
+        )}
+
         {/* 快速操作 */}
         <Card>
           <CardHeader>
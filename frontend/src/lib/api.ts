@@ -15,6 +15,8 @@ export const upstreamsApi = {
   create: (data: any) => apiClient.post('/api/admin/upstreams', data),
   update: (id: number, data: any) => apiClient.put(`/api/admin/upstreams/${id}`, data),
   delete: (id: number) => apiClient.delete(`/api/admin/upstreams/${id}`),
+  breaker: (id: number) => apiClient.get(`/api/admin/upstreams/${id}/breaker`),
+  setBreaker: (id: number, action: 'reset' | 'open') => apiClient.post(`/api/admin/upstreams/${id}/breaker/${action}`),
 }
 
 export const keysApi = {
@@ -52,6 +54,7 @@ export const logsApi = {
 export const dashboardApi = {
   stats: () => apiClient.get('/api/admin/dashboard/stats'),
   realtime: (limit?: number) => apiClient.get('/api/admin/dashboard/realtime', { params: { limit } }),
+  runtime: () => apiClient.get('/api/admin/dashboard/runtime'),
 }
 
 export * from '@/types'
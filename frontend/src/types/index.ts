@@ -1,3 +1,30 @@
+export enum KeySelectionStrategy {
+  ROUND_ROBIN = "round_robin",
+  RANDOM = "random",
+  WEIGHTED = "weighted",
+  LEAST_IN_FLIGHT = "least_in_flight",
+  EWMA = "ewma",
+  P2C = "p2c"
+}
+
+export interface UpstreamEndpoint {
+  url: string
+  weight: number
+}
+
+export interface UpstreamFallback {
+  upstream_id: number
+  path_map: Record<string, string>
+  set_headers: Record<string, string>
+  remove_headers: string[]
+}
+
+export interface FairQueueClient {
+  client: string
+  weight: number
+  priority: number
+}
+
 export interface Upstream {
   id: number
   name: string
@@ -7,8 +34,44 @@ export interface Upstream {
   timeout: number
   retry_count: number
   connection_pool_size: number
+  connect_timeout: number
+  pool_timeout: number
+  keepalive_expiry: number
   log_request_body: boolean
   log_response_body: boolean
+  stream_response: boolean
+  stream_request_body: boolean
+  key_selection_strategy: KeySelectionStrategy
+  enable_failover: boolean
+  failover_status_codes: number[]
+  failover_max_attempts: number
+  failover_cooldown_seconds: number
+  enable_hedging: boolean
+  hedge_delay_ms: number
+  enable_circuit_breaker: boolean
+  max_concurrency: number
+  max_queue_size: number
+  queue_timeout_ms: number
+  enable_adaptive_concurrency: boolean
+  enable_fair_queue: boolean
+  fair_queue_clients: FairQueueClient[]
+  enable_response_cache: boolean
+  cache_ttl_seconds: number
+  cache_vary_headers: string[]
+  enable_coalescing: boolean
+  coalesce_headers: string[]
+  endpoints: UpstreamEndpoint[]
+  health_check_path: string
+  fallbacks: UpstreamFallback[]
+  fallback_latency_budget_ms: number
+  enable_rate_limit: boolean
+  rate_limit_per_minute: number
+  rate_limit_per_hour: number
+  rate_limit_per_day: number
+  client_rate_limit_per_minute: number
+  client_rate_limit_per_hour: number
+  client_rate_limit_per_day: number
+  rate_limit_client_header: string
   tags: string[]
   is_enabled: boolean
   created_at: string
@@ -40,6 +103,9 @@ export interface APIKey {
   quota_total?: number
   quota_used: number
   quota_reset_at?: string
+  rate_limit_per_minute?: number
+  rate_limit_per_hour?: number
+  rate_limit_per_day?: number
   auto_disable_on_failure: boolean
   auto_enable_delay_hours?: number
   auto_enable_at?: string
@@ -82,6 +148,7 @@ export interface Rule {
   time_window_seconds?: number
   cooldown_seconds: number
   priority: number
+  run_synchronously: boolean
   is_enabled: boolean
   created_at: string
   updated_at?: string